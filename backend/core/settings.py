@@ -35,6 +35,21 @@ ALLOWED_HOSTS = [
 
 PROGRAM_ID = os.getenv("PROGRAM_ID", "3Jy5qUaaAQMKVUehh4cLncAAYVgf1XELnt1RhNJGe8ZD")
 RPC_WS_URL = os.getenv("RPC_WS_URL", "wss://api.devnet.solana.com")
+# Comma separated; more than one URL runs the listener in multi-endpoint fan-in mode
+RPC_WS_URLS = [url.strip() for url in os.getenv("RPC_WS_URLS", RPC_WS_URL).split(",") if url.strip()]
+RPC_HTTP_URL = os.getenv("RPC_HTTP_URL", RPC_WS_URL.replace("wss://", "https://").replace("ws://", "http://"))
+# Comma separated, tried in order (hedged) when fetching token metadata
+IPFS_GATEWAYS = [
+    url.strip() for url in os.getenv(
+        "IPFS_GATEWAYS",
+        "https://ipfs.io/ipfs/,https://cloudflare-ipfs.com/ipfs/,https://gateway.pinata.cloud/ipfs/"
+    ).split(",") if url.strip()
+]
+# Listener metrics (Prometheus text on /metrics, JSON on /metrics.json); 0 disables
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9108))
+# Decoded events are spooled here until their Celery publish succeeds
+LISTENER_SPOOL_DIR = os.getenv("LISTENER_SPOOL_DIR", str(BASE_DIR / "spool"))
 
 # Application definition
 INSTALLED_APPS = [
@@ -129,6 +144,33 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+# Trade batches are split by mint over trades.0 .. trades.N-1, each consumed by
+# a single worker so trades on one coin apply in order (1 = default queue only,
+# for deployments without the trades.N workers; docker-compose sets 4)
+TRADE_PARTITIONS = int(os.getenv("TRADE_PARTITIONS", 1))
+# Trades that arrive before their coin are parked in Redis this long (seconds)
+# waiting for the create to commit
+PARKED_TRADE_TTL = int(os.getenv("PARKED_TRADE_TTL", 3600))
+# Width of the per-coin trade buckets behind the rolling 5m/1h/24h coin stats
+MARKET_STATS_BUCKET_SECONDS = int(os.getenv("MARKET_STATS_BUCKET_SECONDS", 60))
+# Monthly partitions of Trade/TraderHistory/CoinHistory (manage_partitions):
+# months created ahead, full months kept before a partition is exported to
+# PARTITION_ARCHIVE_DIR and dropped (0 = never archive)
+PARTITION_PREMAKE_MONTHS = int(os.getenv("PARTITION_PREMAKE_MONTHS", 3))
+PARTITION_RETENTION_MONTHS = int(os.getenv("PARTITION_RETENTION_MONTHS", 0))
+PARTITION_ARCHIVE_DIR = os.getenv("PARTITION_ARCHIVE_DIR", str(BASE_DIR / "archive"))
+CELERY_BEAT_SCHEDULE = {
+    # Age the rolling stats of coins that stopped trading
+    'refresh-market-stats': {
+        'task': 'systems.tasks.refresh_market_stats',
+        'schedule': 60.0,
+    },
+    # Keep partitions created ahead and apply the archival policy
+    'maintain-partitions': {
+        'task': 'systems.tasks.maintain_partitions',
+        'schedule': 24 * 3600.0,
+    },
+}
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
@@ -1,16 +1,68 @@
-from systems.models import Coin, CoinDRCScore, DeveloperScore, Trade, UserCoinHoldings
+from systems.models import Coin, CoinDRCScore, DeveloperScore, TraderScore, Trade, SolanaUser
+from django.contrib.auth.hashers import make_password
 from django.db import transaction
 # from django.db.models import F
-from collections import defaultdict
 from typing import List
-from .trade_utils import apply_holdings_deltas, bulk_update_holders_counts, bulk_update_coin_totals
+from systems.utils.parking import take_parked, release_or_requeue
+from systems.utils.keys import raw_pubkey
+from .trade_utils import holdings_deltas, apply_holdings_deltas, bulk_update_holders_counts, bulk_update_coin_totals
 # from systems.tasks import recalc_trader_scores_task  # celery tasks
 # from .utils.broadcast import broadcast_coin_created, broadcast_trade_created
 
 # signal
-def handle_coin_post_create(coins: List[Coin]):
+def handle_users_post_create(wallets):
+    """
+    Mimics the create_user_scores post_save signal for bulk-created users.
+    """
+    if not wallets:
+        return
+    TraderScore.objects.bulk_create(
+        [TraderScore(trader_id=wallet) for wallet in wallets], ignore_conflicts=True, batch_size=500
+    )
+    DeveloperScore.objects.bulk_create(
+        [DeveloperScore(developer_id=wallet) for wallet in wallets], ignore_conflicts=True, batch_size=500
+    )
+
+def provision_wallets(wallets) -> set:
+    """
+    Create every wallet in `wallets` that has no SolanaUser yet (on-chain
+    activity before connect_wallet), with its trader/developer scores.
+    One SELECT plus, only when something is missing, three
+    INSERT ... ON CONFLICT DO NOTHING; safe against concurrent batches
+    and connect_wallet creating the same user.
+
+    Returns:
+        The wallets that were missing
+    """
+    wallets = {wallet for wallet in wallets if wallet}
+    if not wallets:
+        return set()
+    missing = wallets - set(
+        SolanaUser.objects.filter(wallet_address__in=wallets).values_list('wallet_address', flat=True)
+    )
+    if not missing:
+        return missing
+
+    with transaction.atomic():
+        SolanaUser.objects.bulk_create(
+            [
+                SolanaUser(wallet_address=wallet, wallet_address_raw=raw_pubkey(wallet), password=make_password(None))
+                for wallet in missing
+            ],
+            ignore_conflicts=True,
+            batch_size=500,
+        )
+        handle_users_post_create(missing)
+    return missing
+
+def handle_coin_post_create(coins: List[Coin], release_trades=None):
     """
     Mimics post_save signal behavior for bulk-created coins.
+
+    Trades that arrived before these coins were parked (systems.utils.parking);
+    they are released here, in arrival order, to `release_trades`
+    (default: published to the trade partition queues). If that fails they
+    are parked again and the error propagates to the caller's retry.
     """
     if not coins:
         return
@@ -23,7 +75,15 @@ def handle_coin_post_create(coins: List[Coin]):
     creator_ids = {coin.creator_id for coin in coins}
     DeveloperScore.objects.filter(developer_id__in=creator_ids, is_active=False).update(is_active=True)
 
-    # 3. Optionally broadcast in bulk (optional)
+    # 3. Release trades that were waiting for these coins
+    released = take_parked([coin.address for coin in coins])
+    if released:
+        if release_trades is None:
+            from systems.tasks import publish_trades_batch  # tasks imports this module
+            release_trades = publish_trades_batch
+        release_or_requeue(released, release_trades)
+
+    # 4. Optionally broadcast in bulk (optional)
     # for coin in coins:
     #     broadcast_coin_created(coin)
 
@@ -34,7 +94,7 @@ def handle_trades_post_create(created_trades: List[Trade]):
                     ensure you pass the persisted ones or their (user_id, coin_id, coin_amount, sol_amount)).
     This will:
       - compute holdings deltas per (user, coin)
-      - bulk-create/update/delete holdings
+      - upsert holdings in one statement, delete the ones emptied
       - update Coin.total_held and Coin.holders_count atomically
       - schedule score recalculation tasks (via transaction.on_commit)
     """
@@ -43,43 +103,16 @@ def handle_trades_post_create(created_trades: List[Trade]):
         return
 
     # Build holdings deltas: (user_id, coin_id) -> delta_coin_amount
-    holdings_deltas = defaultdict(float)
-    for t in created_trades:
-        user_id = t.user_id
-        coin_id = t.coin_id
-        delta = t.coin_amount if t.trade_type in ('BUY', 'COIN_CREATE') else -t.coin_amount
-        holdings_deltas[(user_id, coin_id)] += delta
-
-    # Compute bulk apply plan
-    plan = apply_holdings_deltas(holdings_deltas)
+    deltas = holdings_deltas((t.user_id, t.coin_id, t.trade_type, t.coin_amount) for t in created_trades)
 
     # Perform DB updates in a single atomic block
     with transaction.atomic():
-        # Create new holdings
-        if plan['to_create']:
-            UserCoinHoldings.objects.bulk_create(plan['to_create'], ignore_conflicts=True, batch_size=500)
-
-        # Bulk update existing holdings
-        if plan['to_update']:
-            UserCoinHoldings.objects.bulk_update(plan['to_update'], ['amount_held'], batch_size=500)
-
-        # Delete holdings where new amount <= 0
-        if plan['to_delete_keys']:
-            # Convert keys to query
-            delete_filters = []
-            # Build Q objects for deletion or use a filter IN tuple list
-            tuples = plan['to_delete_keys']  # list of (user_id, coin_id)
-            q = None
-            # efficient delete by composing conditions
-            from django.db.models import Q
-            combined_q = Q()
-            for u,c in tuples:
-                combined_q |= Q(user_id=u, coin_id=c)
-            UserCoinHoldings.objects.filter(combined_q).delete()
-
-        bulk_update_coin_totals(plan['coin_total_deltas'])
-
-        bulk_update_holders_counts(plan['holders_changes'])
+        # Upsert holdings on the exact keys; totals and holder counts follow from before/after
+        coin_total_deltas, holders_changes = apply_holdings_deltas(deltas)
+
+        bulk_update_coin_totals(coin_total_deltas)
+
+        bulk_update_holders_counts(holders_changes)
 
         # Done atomically: trades exist, holdings & coin totals updated
 
@@ -1,127 +1,490 @@
 
 from collections import defaultdict
+from decimal import Decimal
 # from django.db import transaction
 # from django.db.models import F, Value
+from datetime import datetime, timedelta, timezone as dt_timezone
 from typing import Dict, Tuple
-from systems.models import UserCoinHoldings, CoinDRCScore, Coin
-from django.db.models import Case, When, F, Value, IntegerField, DecimalField
+from systems.models import UserCoinHoldings, CoinDRCScore, Coin, Trade, CoinStatsBucket, CoinCandle, SolanaUser
+from django.conf import settings
+from django.db import connection
+
+def holdings_deltas(trades) -> Dict[Tuple[str, str], Decimal]:
+    """
+    Net change in amount held per (user_id, coin_id) of newly inserted trades.
+    trades = iterable of (user_id, coin_id, trade_type, coin_amount)
+    """
+    deltas = defaultdict(Decimal)
+    for user_id, coin_id, trade_type, coin_amount in trades:
+        deltas[(user_id, coin_id)] += coin_amount if trade_type in ('BUY', 'COIN_CREATE') else -coin_amount
+    return deltas
+
+def holdings_upsert_sql(holdings_map: Dict[Tuple[str, str], Decimal]):
+    """
+    (sql, params) adding many (user, coin) deltas with one
+    INSERT ... ON CONFLICT DO UPDATE SET amount_held = amount_held + delta,
+    returning (user_id, coin_id, amount_held, delta, inserted) per key.
+    None when no delta is left.
+    """
+    # Stable order, so concurrent batches lock shared rows in the same order
+    keys = sorted(key for key, delta in holdings_map.items() if delta != 0)
+    if not keys:
+        return None
+    table = connection.ops.quote_name(UserCoinHoldings._meta.db_table)
+    user_table = connection.ops.quote_name(SolanaUser._meta.db_table)
+    coin_table = connection.ops.quote_name(Coin._meta.db_table)
+    # Deltas rounded like the column, so after - delta is exactly the stored balance before
+    amount_type = UserCoinHoldings._meta.get_field('amount_held').db_type(connection)
+    values = ", ".join([f"(%s, %s, %s::{amount_type})"] * len(keys))
+    return (
+        f"""
+        WITH v(user_id, coin_id, delta) AS (VALUES {values}),
+        up AS (
+            INSERT INTO {table} AS h (user_id, coin_id, user_sid, coin_sid, amount_held)
+            SELECT v.user_id, v.coin_id, u.sid, c.sid, v.delta
+            FROM v
+            LEFT JOIN {user_table} u ON u.wallet_address = v.user_id
+            LEFT JOIN {coin_table} c ON c.address = v.coin_id
+            ON CONFLICT (user_id, coin_id) DO UPDATE SET
+                amount_held = h.amount_held + EXCLUDED.amount_held,
+                user_sid = EXCLUDED.user_sid,
+                coin_sid = EXCLUDED.coin_sid
+            RETURNING h.user_id, h.coin_id, h.amount_held, (h.xmax = 0) AS inserted
+        )
+        SELECT up.user_id, up.coin_id, up.amount_held, v.delta, up.inserted
+        FROM up JOIN v ON v.user_id = up.user_id AND v.coin_id = up.coin_id
+        """,
+        [value for key in keys for value in (*key, holdings_map[key])],
+    )
+
+def holdings_cleanup_sql(rows):
+    """(sql, params) deleting the holdings the upsert left at <= 0, or None"""
+    emptied = [(user_id, coin_id) for user_id, coin_id, after, _, _ in rows if after <= 0]
+    if not emptied:
+        return None
+    table = connection.ops.quote_name(UserCoinHoldings._meta.db_table)
+    return (
+        f"DELETE FROM {table} WHERE (user_id, coin_id) IN ({', '.join(['(%s, %s)'] * len(emptied))})",
+        [value for key in emptied for value in key],
+    )
+
+def holdings_changes(rows):
+    """
+    Coin totals and holder counts implied by the upsert's before/after of each row.
+
+    Returns:
+      coin_total_deltas: { coin_id: total_delta }  # change in the sum of positive holdings
+      holders_changes: { coin_id: (added_count, removed_count) }
+    """
+    coin_total_deltas = defaultdict(Decimal)
+    added_by_coin = defaultdict(int)
+    removed_by_coin = defaultdict(int)
+    for user_id, coin_id, after, delta, inserted in rows:
+        before = Decimal(0) if inserted else after - delta
+        coin_total_deltas[coin_id] += max(after, 0) - max(before, 0)
+        if before <= 0 < after:
+            added_by_coin[coin_id] += 1
+        elif after <= 0 < before:
+            removed_by_coin[coin_id] += 1
+
+    return (
+        {cid: delta for cid, delta in coin_total_deltas.items() if delta != 0},
+        {cid: (added_by_coin.get(cid, 0), removed_by_coin.get(cid, 0))
+         for cid in set(added_by_coin) | set(removed_by_coin)},
+    )
 
 def apply_holdings_deltas(
-    holdings_map: Dict[Tuple[int,int], float],
+    holdings_map: Dict[Tuple[str, str], Decimal],
     # holdings_map: (user_id, coin_id) -> delta (can be positive or negative)
 ):
     """
-    Apply many (user,coin) deltas in bulk:
-      - create missing holdings where new_amount > 0
-      - update existing holdings via F() where new_amount != old_amount
-      - delete holdings where new_amount <= 0
+    Apply many (user, coin) deltas with one upsert on exactly these keys
+    (holdings_upsert_sql), then delete the holdings that dropped to <= 0.
+    The row locks taken by the upsert make concurrent batches add up
+    instead of overwriting each other. Call inside the caller's transaction.
 
     Returns:
-      coin_total_deltas: { coin_id: total_delta }  # to update Coin.total_held via F()
-      holders_changes: { coin_id: (added_count, removed_count) } # net holder changes
+      (coin_total_deltas, holders_changes), see holdings_changes
     """
+    upsert = holdings_upsert_sql(holdings_map)
+    if upsert is None:
+        return {}, {}
 
-    coin_total_deltas = defaultdict(float)
-    added_by_coin = defaultdict(int)
-    removed_by_coin = defaultdict(int)
+    with connection.cursor() as cursor:
+        cursor.execute(*upsert)
+        rows = cursor.fetchall()
 
-    if not holdings_map:
-        return {}, {}
+        cleanup = holdings_cleanup_sql(rows)
+        if cleanup:
+            cursor.execute(*cleanup)
 
-    # keys: list of (user_id, coin_id)
-    keys = list(holdings_map.keys())
-    users = [k[0] for k in keys]
-    coins = [k[1] for k in keys]
-
-    # Fetch existing holdings
-    qs = UserCoinHoldings.objects.filter(user_id__in=set(users), coin_id__in=set(coins))
-    existing = {(h.user_id, h.coin_id): h for h in qs}
-
-    to_update = []
-    to_create = []
-    to_delete_keys = []
-
-    for (user_id, coin_id), delta in holdings_map.items():
-        existing_h = existing.get((user_id, coin_id))
-        if existing_h:
-            # compute new amount using numeric ops (Decimal or float depending on model)
-            new_amount = existing_h.amount_held + delta
-            # track coin totals
-            coin_total_deltas[coin_id] += delta
-
-            if new_amount <= 0:
-                # mark for deletion
-                to_delete_keys.append((user_id, coin_id))
-                # holder removed if previously > 0
-                if existing_h.amount_held > 0:
-                    removed_by_coin[coin_id] += 1
-            else:
-                # update object in memory and add to bulk_update list
-                existing_h.amount_held = new_amount
-                to_update.append(existing_h)
-                # if previously zero? shouldn't be for existing_h
-        else:
-            # no existing holding
-            new_amount = delta
-            if new_amount > 0:
-                # create new holding
-                to_create.append(UserCoinHoldings(user_id=user_id, coin_id=coin_id, amount_held=new_amount))
-                coin_total_deltas[coin_id] += new_amount
-                added_by_coin[coin_id] += 1
-            else:
-                # nothing to do (attempt to reduce holdings that don't exist)
-                continue
-
-    # Apply DB changes inside atomic by caller
-    return {
-        "to_update": to_update,
-        "to_create": to_create,
-        "to_delete_keys": to_delete_keys,
-        "coin_total_deltas": dict(coin_total_deltas),
-        "holders_changes": {cid: (added_by_coin.get(cid,0), removed_by_coin.get(cid,0))
-                            for cid in set(list(added_by_coin.keys()) + list(removed_by_coin.keys()))}
-    }
+    return holdings_changes(rows)
 
-def bulk_update_holders_counts(holders_changes: dict):
+def holders_counts_sql(holders_changes: dict):
     """
-    Efficiently update CoinDRCScore.holders_count using a single SQL query.
+    (sql, params) applying holder count changes to the affected CoinDRCScore
+    rows only, in one UPDATE ... FROM (VALUES ...); None when nothing changes.
     holders_changes = {coin_id: (added_count, removed_count)}
     """
-    if not holders_changes:
-        return
+    deltas = [(coin_id, added - removed) for coin_id, (added, removed) in holders_changes.items() if added != removed]
+    if not deltas:
+        return None
 
-    whens = []
-    for coin_id, (added, removed) in holders_changes.items():
-        delta = added - removed
-        if delta != 0:
-            whens.append(
-                When(coin_id=coin_id, then=F('holders_count') + Value(delta))
-            )
+    table = connection.ops.quote_name(CoinDRCScore._meta.db_table)
+    values = ", ".join(["(%s, %s::integer)"] * len(deltas))
+    return (
+        f"""
+        UPDATE {table} AS s SET holders_count = s.holders_count + v.delta
+        FROM (VALUES {values}) AS v(coin_id, delta)
+        WHERE s.coin_id = v.coin_id
+        """,
+        [value for delta in deltas for value in delta],
+    )
+
+def bulk_update_holders_counts(holders_changes: dict):
+    statement = holders_counts_sql(holders_changes)
+    if statement:
+        with connection.cursor() as cursor:
+            cursor.execute(*statement)
 
-    if not whens:
-        return
+def coin_totals_sql(coin_deltas: dict):
+    """
+    (sql, params) applying total_held deltas to the affected coins in one
+    UPDATE ... FROM (VALUES ...); None when nothing changes.
+    coin_deltas = {coin_id: delta}
+    """
+    deltas = [(coin_id, delta) for coin_id, delta in coin_deltas.items() if delta != 0]
+    if not deltas:
+        return None
 
-    CoinDRCScore.objects.update(
-        holders_count=Case(*whens, output_field=IntegerField())
+    table = connection.ops.quote_name(Coin._meta.db_table)
+    values = ", ".join(["(%s, %s::numeric)"] * len(deltas))
+    return (
+        f"""
+        UPDATE {table} AS c SET total_held = c.total_held + v.delta
+        FROM (VALUES {values}) AS v(address, delta)
+        WHERE c.address = v.address
+        """,
+        [value for delta in deltas for value in delta],
     )
 
 def bulk_update_coin_totals(coin_deltas: dict):
+    statement = coin_totals_sql(coin_deltas)
+    if statement:
+        with connection.cursor() as cursor:
+            cursor.execute(*statement)
+
+TRADE_INSERT_COLUMNS = (
+    'transaction_hash', 'event_index', 'user_id', 'coin_id', 'trade_type', 'coin_amount', 'sol_amount',
+    'created_at', 'trading_fee', 'transaction_hash_raw',
+)
+
+def insert_trades(trades: list, batch_size: int = 500) -> set:
     """
-    Efficiently apply total_held deltas to Coin table using one query.
-    coin_deltas = {coin_id: delta}
+    INSERT ... ON CONFLICT (transaction_hash, event_index, created_at) DO NOTHING
+    RETURNING id, ... (the table's unique key; it is partitioned on created_at).
+    Unlike bulk_create(ignore_conflicts=True), this tells which trades were
+    really inserted, so derived updates can skip the ones already stored.
+    user_sid / coin_sid are looked up from the user and coin (migration 0046).
+    trades = unsaved Trade instances with unique (transaction_hash, event_index);
+    the inserted ones get their id set
+
+    Returns:
+      set of inserted (transaction_hash, event_index)
+    """
+    if not trades:
+        return set()
+
+    table = connection.ops.quote_name(Trade._meta.db_table)
+    user_table = connection.ops.quote_name(SolanaUser._meta.db_table)
+    coin_table = connection.ops.quote_name(Coin._meta.db_table)
+    columns = ", ".join(TRADE_INSERT_COLUMNS)
+    # Typed, so a column that is NULL in every row still matches its target
+    row = "(" + ", ".join(
+        f"%s::{Trade._meta.get_field(column).db_type(connection)}" for column in TRADE_INSERT_COLUMNS
+    ) + ")"
+    inserted = set()
+    with connection.cursor() as cursor:
+        for start in range(0, len(trades), batch_size):
+            chunk = trades[start:start + batch_size]
+            cursor.execute(
+                f"""
+                INSERT INTO {table} ({columns}, user_sid, coin_sid)
+                SELECT v.*, u.sid, c.sid
+                FROM (VALUES {", ".join([row] * len(chunk))}) AS v({columns})
+                LEFT JOIN {user_table} u ON u.wallet_address = v.user_id
+                LEFT JOIN {coin_table} c ON c.address = v.coin_id
+                ON CONFLICT (transaction_hash, event_index, created_at) DO NOTHING
+                RETURNING id, transaction_hash, event_index
+                """,
+                [getattr(t, column) for t in chunk for column in TRADE_INSERT_COLUMNS],
+            )
+            ids = {(transaction_hash, event_index): pk for pk, transaction_hash, event_index in cursor.fetchall()}
+            for trade in chunk:
+                trade.id = ids.get((trade.transaction_hash, trade.event_index))
+            inserted.update(ids)
+    return inserted
+
+def bulk_update_coin_prices(coin_updates: dict) -> list:
+    """
+    Apply the latest trade price of many coins in one UPDATE ... FROM (VALUES ...).
+    A coin only moves forward in time (updated < trade timestamp).
+    coin_updates = {coin_id: (price, timestamp)}
+
+    Returns:
+      [(coin_id, current_price, updated), ...] for the coins actually updated
+    """
+    if not coin_updates:
+        return []
+
+    rows = ", ".join(["(%s, %s::numeric, %s::timestamptz)"] * len(coin_updates))
+    params = [value for coin_id, (price, timestamp) in coin_updates.items() for value in (coin_id, price, timestamp)]
+    table = connection.ops.quote_name(Coin._meta.db_table)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {table} AS c
+            SET current_price = v.price, updated = v.ts
+            FROM (VALUES {rows}) AS v(address, price, ts)
+            WHERE c.address = v.address AND c.updated < v.ts
+            RETURNING c.address, c.current_price, c.updated
+            """,
+            params,
+        )
+        return cursor.fetchall()
+
+
+# Rolling windows kept on Coin: (volume, trades, change) columns and their length
+MARKET_WINDOWS = (
+    ('volume_5m', 'trades_5m', 'change_5m', timedelta(minutes=5)),
+    ('volume_1h', 'trades_1h', 'change_1h', timedelta(hours=1)),
+    ('volume_24h', 'trades_24h', 'change', timedelta(hours=24)),
+)
+STATS_HORIZON = MARKET_WINDOWS[-1][3]
+# Coin.change* are DecimalField(16, 4)
+MAX_CHANGE = Decimal('999999999999')
+
+
+def _bucket_start(timestamp: datetime, width: int) -> datetime:
+    seconds = int(timestamp.timestamp())
+    return datetime.fromtimestamp(seconds - seconds % width, tz=dt_timezone.utc)
+
+
+def _fold_ohlcv(trade_stats: list, width: int, since: datetime = None) -> dict:
+    """
+    Aggregate trades into `width`-second buckets.
+    Returns {(coin_id, bucket): [volume, trades, open, high, low, close, open_at, close_at]}
+    """
+    buckets = {}
+    for coin_id, timestamp, sol_amount, price, _ in trade_stats:
+        if since is not None and timestamp < since:
+            continue
+        key = (coin_id, _bucket_start(timestamp, width))
+        b = buckets.get(key)
+        if b is None:
+            buckets[key] = [sol_amount, 1, price, price, price, price, timestamp, timestamp]
+            continue
+        b[0] += sol_amount
+        b[1] += 1
+        b[3] = max(b[3], price)
+        b[4] = min(b[4], price)
+        if timestamp < b[6]:
+            b[2], b[6] = price, timestamp
+        if timestamp >= b[7]:
+            b[5], b[7] = price, timestamp
+    return buckets
+
+
+def _ohlcv_upserts(model, key_columns: tuple, rows: list, batch_size: int = 500) -> list:
+    """
+    Statements merging OHLCV rows (key values..., volume, trades, open, high,
+    low, close, open_at, close_at) into `model`, one
+    INSERT ... ON CONFLICT DO UPDATE per `batch_size` rows.
+    Open/close follow the trade times, so late (out-of-order) trades land
+    on the right end of a bucket that already exists.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    keys = ", ".join(key_columns)
+    placeholders = ", ".join(["%s"] * (len(key_columns) + 8))
+    statements = []
+    for start in range(0, len(rows), batch_size):
+        chunk = rows[start:start + batch_size]
+        values = ", ".join([f"({placeholders})"] * len(chunk))
+        statements.append((
+            f"""
+            INSERT INTO {table} AS b (
+                {keys}, volume, trades, open_price, high_price, low_price, close_price, open_at, close_at
+            )
+            VALUES {values}
+            ON CONFLICT ({keys}) DO UPDATE SET
+                volume = b.volume + EXCLUDED.volume,
+                trades = b.trades + EXCLUDED.trades,
+                high_price = GREATEST(b.high_price, EXCLUDED.high_price),
+                low_price = LEAST(b.low_price, EXCLUDED.low_price),
+                open_price = CASE WHEN EXCLUDED.open_at < b.open_at THEN EXCLUDED.open_price ELSE b.open_price END,
+                open_at = LEAST(b.open_at, EXCLUDED.open_at),
+                close_price = CASE WHEN EXCLUDED.close_at >= b.close_at THEN EXCLUDED.close_price ELSE b.close_price END,
+                close_at = GREATEST(b.close_at, EXCLUDED.close_at)
+            """,
+            [value for row in chunk for value in row],
+        ))
+    return statements
+
+
+def _market_stats_sql(coin_ids: list, now: datetime, batch: dict = None) -> tuple:
+    """
+    (sql, params) of one UPDATE of the rolling windows of `coin_ids`, summed
+    from their buckets; `batch` (coin_id -> (high, low, last_at, sol_raised))
+    also moves ATH/ATL and the market cap.
+    """
+    coin_table = connection.ops.quote_name(Coin._meta.db_table)
+    bucket_table = connection.ops.quote_name(CoinStatsBucket._meta.db_table)
+    batch = batch or {}
+
+    aggregates, window_params = [], []
+    assignments, clamp_params = [], []
+    for volume, trades, change, length in MARKET_WINDOWS:
+        since = now - length
+        aggregates.append(
+            f"COALESCE(SUM(b.volume) FILTER (WHERE b.bucket >= %s), 0) AS {volume}, "
+            f"COALESCE(SUM(b.trades) FILTER (WHERE b.bucket >= %s), 0) AS {trades}, "
+            f"(array_agg(b.open_price ORDER BY b.bucket) FILTER (WHERE b.bucket >= %s))[1] AS {change}_open"
+        )
+        window_params += [since, since, since]
+        # % change against the first price of the window
+        assignments.append(
+            f"{volume} = COALESCE(w.{volume}, 0), {trades} = COALESCE(w.{trades}, 0), "
+            f"{change} = CASE WHEN w.{change}_open > 0 THEN GREATEST(LEAST("
+            f"round((c.current_price - w.{change}_open) / w.{change}_open * 100, 4), %s), -100) ELSE 0 END"
+        )
+        clamp_params.append(MAX_CHANGE)
+
+    values = ", ".join(["(%s, %s::numeric, %s::numeric, %s::timestamptz, %s::numeric)"] * len(coin_ids))
+    value_params = [
+        value for coin_id in coin_ids
+        for value in (coin_id, *batch.get(coin_id, (None, None, None, None)))
+    ]
+
+    return (
+        f"""
+        WITH w AS (
+            SELECT b.coin_id, {", ".join(aggregates)}
+            FROM {bucket_table} b
+            WHERE b.bucket >= %s AND b.coin_id = ANY(%s)
+            GROUP BY b.coin_id
+        )
+        UPDATE {coin_table} AS c SET
+            {", ".join(assignments)},
+            ath = GREATEST(c.ath, COALESCE(x.high, c.ath)),
+            atl = LEAST(COALESCE(c.atl, x.low), x.low),
+            current_marketcap = CASE
+                WHEN x.last_at >= c.updated THEN c.start_marketcap + x.sol_raised
+                ELSE c.current_marketcap
+            END,
+            stats_updated = %s
+        FROM (VALUES {values}) AS x(address, high, low, last_at, sol_raised)
+        LEFT JOIN w ON w.coin_id = x.address
+        WHERE c.address = x.address
+        """,
+        window_params + [now - STATS_HORIZON, list(coin_ids)] + clamp_params + [now] + value_params,
+    )
+
+
+def market_stats_statements(trade_stats: list, now: datetime = None) -> list:
+    """
+    Statements maintaining the rolling market stats of the coins traded in a batch:
+      - fold the trades into per-coin time buckets (upsert)
+      - re-sum the 5m/1h/24h windows from the buckets and apply them, with
+        ATH/ATL and market cap, in one UPDATE (always the last statement)
+    trade_stats = [(coin_id, timestamp, sol_amount, price, sol_raised), ...]
     """
-    if not coin_deltas:
-        return
+    if not trade_stats:
+        return []
+    now = now or datetime.now(dt_timezone.utc)
+
+    batch = {}  # coin_id -> (high, low, last_at, sol_raised)
+    for coin_id, timestamp, _, price, sol_raised in trade_stats:
+        current = batch.get(coin_id)
+        if current is None:
+            batch[coin_id] = (price, price, timestamp, sol_raised)
+            continue
+        high, low, last_at, last_raised = current
+        if timestamp > last_at:  # same rule as the price update: first of the latest wins
+            last_at, last_raised = timestamp, sol_raised
+        batch[coin_id] = (max(high, price), min(low, price), last_at, last_raised)
 
-    whens = [
-        When(pk=coin_id, then=F('total_held') + Value(delta))
-        for coin_id, delta in coin_deltas.items()
-        if delta != 0
+    buckets = _fold_ohlcv(trade_stats, settings.MARKET_STATS_BUCKET_SECONDS, now - STATS_HORIZON)
+    return [
+        *_ohlcv_upserts(CoinStatsBucket, ('coin_id', 'bucket'), [(*key, *b) for key, b in buckets.items()]),
+        _market_stats_sql(list(batch), now, batch),
     ]
 
-    if not whens:
-        return
 
-    Coin.objects.filter(pk__in=coin_deltas.keys()).update(
-        total_held=Case(*whens, output_field=DecimalField(max_digits=32, decimal_places=9))
-    )
\ No newline at end of file
+def bulk_update_market_stats(trade_stats: list, now: datetime = None) -> int:
+    """
+    Apply market_stats_statements. Run it in the same transaction as the
+    trade inserts so a retried batch cannot count twice. The market cap
+    follows the latest trade, so call it after bulk_update_coin_prices.
+    trade_stats = [(coin_id, timestamp, sol_amount, price, sol_raised), ...]
+
+    Returns:
+      number of coins updated
+    """
+    statements = market_stats_statements(trade_stats, now)
+    if not statements:
+        return 0
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(*statement)
+        return cursor.rowcount
+
+
+def refresh_coin_market_stats(now: datetime = None) -> int:
+    """
+    Re-sum the windows of every coin with 24h activity, so coins that stopped
+    trading age out, and drop buckets older than the longest window.
+
+    Returns:
+      number of coins refreshed
+    """
+    now = now or datetime.now(dt_timezone.utc)
+    coin_ids = list(Coin.objects.filter(trades_24h__gt=0).values_list('address', flat=True))
+    CoinStatsBucket.objects.filter(bucket__lt=now - STATS_HORIZON).delete()
+    if not coin_ids:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(*_market_stats_sql(coin_ids, now))
+        return cursor.rowcount
+
+
+def _candle_rows(trade_stats: list) -> list:
+    return [
+        (coin_id, resolution, bucket, *b)
+        for resolution, width in CoinCandle.RESOLUTIONS.items()
+        for (coin_id, bucket), b in _fold_ohlcv(trade_stats, width).items()
+    ]
+
+
+def candle_statements(trade_stats: list) -> list:
+    """
+    Statements folding a batch of trades into the OHLCV candles of every
+    resolution (CoinCandle.RESOLUTIONS).
+    trade_stats = [(coin_id, timestamp, sol_amount, price, sol_raised), ...]
+    """
+    return _ohlcv_upserts(CoinCandle, ('coin_id', 'resolution', 'bucket'), _candle_rows(trade_stats))
+
+
+def bulk_update_candles(trade_stats: list) -> int:
+    """
+    Fold a batch of trades into the candles (candle_statements). Run it in
+    the trade insert's transaction, like bulk_update_market_stats.
+
+    Returns:
+      number of candles written
+    """
+    rows = _candle_rows(trade_stats)
+    with connection.cursor() as cursor:
+        for statement in _ohlcv_upserts(CoinCandle, ('coin_id', 'resolution', 'bucket'), rows):
+            cursor.execute(*statement)
+    return len(rows)
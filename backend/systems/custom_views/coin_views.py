@@ -19,13 +19,23 @@ class StandardResultsSetPagination(PageNumberPagination):
 class CoinListView(ListAPIView):
     pagination_class = StandardResultsSetPagination
     permission_classes = [permissions.AllowAny]
+    # ?ordering=<field> or -<field>; the market stats columns are indexed or kept per batch
+    ordering_fields = (
+        "created_at", "score", "current_marketcap", "change", "change_1h", "change_5m",
+        "volume_24h", "volume_1h", "volume_5m", "trades_24h",
+    )
 
     def get_queryset(self):
+        ordering = self.request.query_params.get("ordering", "-created_at")
+        if ordering.lstrip("-") not in self.ordering_fields:
+            ordering = "-created_at"
         return Coin.objects.values(
             "address", "ticker", "name",
             "image_url", "description",
-            "score", "current_marketcap"
-        ).order_by("-created_at")
+            "score", "current_marketcap",
+            "change", "change_1h", "change_5m",
+            "volume_24h", "volume_1h", "volume_5m", "trades_24h",
+        ).order_by(ordering, "address")
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
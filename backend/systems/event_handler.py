@@ -1,33 +1,94 @@
 # systems/event_handler.py
 import asyncio
 import json
+import os
+import time
 from typing import Dict, List, Optional
 from django.core.cache import cache, caches
 from django.conf import settings
-import aiohttp
-from systems.listeners import SolanaEventListener
-from systems.parser import TokenEventDecoder
-from systems.tasks import process_creates_batch, process_trades_batch
+from systems.listeners import SolanaEventListener, MultiEndpointListener
+from systems.parser import (
+    TokenEventDecoder, EventDecoderRegistry, TOKEN_CREATED_FIELDS,
+    PURCHASED_TOKEN_FIELDS, SOLD_TOKEN_FIELDS,
+)
+from systems.tasks import process_creates_batch, publish_trades_batch
+from systems.utils.ipfs import IpfsMetadataFetcher
+from systems.utils.spool import EventSpool
+from systems.utils.capture import TrafficRecorder
+from systems.utils.provisional import ProvisionalLedger
+from systems.utils.leader import RedisLease, LeaderElector
+from systems.utils.dedup import BatchDeduplicator
+from systems.utils.batching import AdaptiveBatchController, get_celery_queue_depth, get_task_duration
+from systems.sinks import PostgresCopySink
+from systems import metrics
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+class ListenerCheckpoint:
+    """Last processed slot/signature of a listener, persisted in Redis"""
+    
+    def __init__(self, key: str):
+        self.key = key
+    
+    def load(self) -> Optional[dict]:
+        return cache.get(self.key)
+    
+    def save(self, slot: int, signature: str):
+        cache.set(self.key, {'slot': slot, 'signature': signature}, None)  # no expiry
+
+
 class EventHandler:
     """Base event handler with batching support"""
     
-    def __init__(self, batch_size=50, batch_delay=0.5, enable_batching=True):
+    def __init__(self, batch_size=50, batch_delay=0.5, enable_batching=True,
+                 ws_urls=None, stall_timeout=30, queue_size=1000,
+                 decode_workers=1, enrich_workers=4, spool_dir=None,
+                 batch_controller: Optional[AdaptiveBatchController] = None,
+                 sink: Optional[PostgresCopySink] = None, metrics_port=None,
+                 capture_path=None, fetch_metadata=True, provisional_timeout=None,
+                 replica_id=None, lease_ttl=5.0, standby_buffer=20000):
         """
         Initialize event handler with batching configuration
         
         Args:
             batch_size: Number of events before forcing batch processing
             batch_delay: Seconds to wait before processing batch
-            enable_batching: Whether to enable batching (False for immediate processing)
+            enable_batching: Whether to enable batching (False publishes every event on its
+                own, still through the spool, dedup claims and checkpoint handoff)
+            ws_urls: WebSocket RPC URLs; more than one enables multi-endpoint fan-in
+            stall_timeout: Seconds a fan-in connection may stay quiet while peers deliver
+            queue_size: Max raw notifications buffered between the websocket reader and workers
+            decode_workers: Workers decoding notifications and routing trades. One keeps
+                events in arrival order; more may reorder them within a batch
+            enrich_workers: Workers fetching IPFS metadata for creates
+            spool_dir: Directory for the on-disk spool of unpublished batches (None disables it)
+            batch_controller: Adjusts batch size/delay from Celery lag (None keeps them static)
+            sink: Write batches directly to Postgres instead of publishing Celery tasks
+            metrics_port: Serve /metrics and /metrics.json on this local port (None disables)
+            capture_path: Record every received notification to this gzip JSONL file (see replay_capture)
+            fetch_metadata: Fetch IPFS metadata for creates (off for offline replays)
+            provisional_timeout: Also subscribe at `processed` and broadcast events as provisional
+                until confirmed, rolling back after this many seconds (None disables)
+            replica_id: Run as one of several replicas; only the holder of the Redis lease publishes
+            lease_ttl: Seconds before a crashed leader's lease expires and a standby takes over
+            standby_buffer: Unpublished events a standby keeps per queue for a takeover
         """
         self.batch_size = batch_size
         self.batch_delay = batch_delay
         self.enable_batching = enable_batching
+        if not enable_batching:
+            # Batches of one take the same publish path as real batches
+            self.batch_size = 1
+            batch_controller = None
+        self.batch_controller = batch_controller
+        if batch_controller:
+            self.batch_size = batch_controller.batch_size
+            self.batch_delay = batch_controller.batch_delay
+        self.sink = sink
+        self.ws_urls = ws_urls or settings.RPC_WS_URLS
+        self.stall_timeout = stall_timeout
         
         # Separate queues for different event types
         self.create_queue = []
@@ -43,75 +104,74 @@ class EventHandler:
         # Event types this handler processes
         self.event_types = ["CreateToken", "PurchaseToken", "SellToken"]
         
-        # IPFS session
-        self.ipfs_session = None
+        # IPFS metadata (hedged across gateways, cached)
+        self.metadata_fetcher = IpfsMetadataFetcher(gateways=settings.IPFS_GATEWAYS)
+        self.fetch_metadata = fetch_metadata
+        
+        # Listener (set in run_listener)
+        self.listener = None
+        
+        # Reader -> worker pipeline. The reader blocks on a full queue
+        # (backpressure); creates go to their own queue so a slow metadata
+        # fetch never holds up trades.
+        self.decode_workers = decode_workers
+        self.enrich_workers = enrich_workers
+        self.event_queue = asyncio.Queue(maxsize=queue_size)
+        self.enrich_queue = asyncio.Queue(maxsize=queue_size)
+        self.worker_tasks = []
+        self.backpressure_waits = 0
+        # Listener sequence number of each queued event, released once it is published
+        self.handoffs = {}
+        
+        # Replicas stay subscribed and buffer; the lease holder publishes
+        self.replica_id = replica_id
+        self.elector = LeaderElector(RedisLease(
+            f"listener_leader:{settings.PROGRAM_ID}:{self.__class__.__name__}", replica_id, ttl=lease_ttl,
+        )) if replica_id else None
+        self.standby_buffer = standby_buffer
+        self.standby_stats = {'followed': 0, 'overflow': 0}
+        
+        # Batched events are spooled to disk until Celery accepts them
+        self.spool = None
+        if spool_dir:
+            spool_path = os.path.join(spool_dir, self.__class__.__name__)
+            if replica_id:
+                spool_path = os.path.join(spool_path, replica_id)
+            self.spool = EventSpool(spool_path)
+        
+        # Recent keys are filtered in-process; Redis is claimed once per batch
+        # (after the spool write is durable). Separate caches for creates/trades.
+        self.create_dedup = BatchDeduplicator(caches['creates'] if 'creates' in caches else cache, name='create')
+        self.trade_dedup = BatchDeduplicator(caches['trades'] if 'trades' in caches else cache, name='trade')
+        self.claimed_keys = set()  # claimed by this process, publish still pending
+        
+        self.recorder = TrafficRecorder(capture_path) if capture_path else None
+        
+        # Processed-commitment events are only broadcast; the database is
+        # written from the confirmed subscription alone
+        self.ledger = ProvisionalLedger(timeout=provisional_timeout) if provisional_timeout else None
+        self.processed_listener = None
+        
+        self.metrics_server = (
+            metrics.MetricsServer(host=settings.METRICS_HOST, port=metrics_port) if metrics_port else None
+        )
         
     def _init_decoders(self):
         """Initialize token event decoders"""
         self.decoders = {}
         
-        self.decoders["CreateToken"] = TokenEventDecoder(
-            "TokenCreated", {
-                "mint": "pubkey",
-                "initial_price_per_token": "u64",
-                "migrated": "bool",
-                "total_supply": "u64",
-                "tokens_sold": "u64",
-                "sol_raised": "u64",
-                "start_mcap": "u64",
-                "target_sol": "u64",
-                "creator": "pubkey",
-                "raydium_pool": "option<pubkey>",
-                "migration_timestamp": "i64",
-                "uri": "string",
-            }
-        )
-        
-        self.decoders["PurchaseToken"] = TokenEventDecoder(
-            "PurchasedToken", {
-                "base_cost": "u64",
-                "trading_fee": "u64",
-                "total_cost": "u64",
-                "mint": "pubkey",
-                "amount_purchased": "u64",
-                "migrated": "bool",
-                "total_supply": "u64",
-                "tokens_sold": "u64",
-                "sol_raised": "u64",
-                "current_price": "u64",
-                "buyer": "pubkey",
-                "timestamp": "i64",
-            }
-        )
+        self.decoders["CreateToken"] = TokenEventDecoder("TokenCreated", TOKEN_CREATED_FIELDS)
+        self.decoders["PurchaseToken"] = TokenEventDecoder("PurchasedToken", PURCHASED_TOKEN_FIELDS)
+        self.decoders["SellToken"] = TokenEventDecoder("SoldToken", SOLD_TOKEN_FIELDS)
         
-        self.decoders["SellToken"] = TokenEventDecoder(
-            "SoldToken", {
-                "mint": "pubkey",
-                "base_proceeds": "u64",
-                "trading_fee": "u64",
-                "net_proceeds": "u64",
-                "amount_sold": "u64",
-                "migrated": "bool",
-                "total_supply": "u64",
-                "tokens_sold": "u64",
-                "sol_raised": "u64",
-                "current_price": "u64",
-                "seller": "pubkey",
-                "timestamp": "i64",
-            }
-        )
-    
-    async def get_ipfs_session(self):
-        """Get or create aiohttp session for IPFS requests"""
-        if self.ipfs_session is None or self.ipfs_session.closed:
-            timeout = aiohttp.ClientTimeout(total=10)
-            self.ipfs_session = aiohttp.ClientSession(timeout=timeout)
-        return self.ipfs_session
+        # Dispatch on the Anchor discriminator rather than the instruction log
+        self.registry = EventDecoderRegistry()
+        for event_type, decoder in self.decoders.items():
+            self.registry.register(event_type, decoder)
     
     async def close_ipfs_session(self):
         """Close IPFS session"""
-        if self.ipfs_session and not self.ipfs_session.closed:
-            await self.ipfs_session.close()
+        await self.metadata_fetcher.close()
     
     def extract_ipfs_hash(self, uri: str) -> str:
         """Extract IPFS hash from URI"""
@@ -122,6 +182,8 @@ class EventHandler:
     
     async def get_metadata(self, log: dict) -> dict:
         """Fetch metadata from IPFS"""
+        if not self.fetch_metadata:
+            return log
         try:
             ipfuri: str = log.get("uri", "")
             ipfs_hash = self.extract_ipfs_hash(ipfuri)
@@ -130,97 +192,185 @@ class EventHandler:
                 logger.warning(f"Invalid IPFS URI: {ipfuri}")
                 return log
 
-            # Check cache first
-            cache_key = f"ipfs_metadata:{ipfs_hash}"
-            cached_data = cache.get(cache_key)
-            if cached_data:
-                log.update(cached_data)
-                return log
-
-            gateways = [
-                "https://ipfs.io/ipfs/",
-                "https://cloudflare-ipfs.com/ipfs/",
-                "https://gateway.pinata.cloud/ipfs/"
-            ]
-
-            session = await self.get_ipfs_session()
-            for gateway in gateways:
-                url = f"{gateway}{ipfs_hash}"
-                try:
-                    async with session.get(url) as response:
-                        if response.status == 200:
-                            content = await response.json()
-                            # Cache for 1 hour
-                            cache.set(cache_key, content, 3600)
-                            log.update(content)
-                            return log
-                        else:
-                            logger.debug(f"IPFS fetch failed: {response.status} - {url}")
-                except Exception as e:
-                    logger.debug(f"Error fetching from {url}: {e}")
-                    continue
+            content = await self.metadata_fetcher.fetch(ipfs_hash)
+            if content:
+                log.update(content)
 
         except Exception as e:
             logger.error(f"Unexpected error fetching metadata: {e}")
         return log
     
-    def get_function_id(self, logs: list) -> tuple:
-        """Extract function ID from logs"""
-        for num, log in enumerate(logs):
-            if "Program log: Instruction:" in log:
-                return log.split(": ")[-1], num
-        return None, None
+    @staticmethod
+    def event_key(signature: str, index: int = 0) -> str:
+        """
+        Dedup key for the index-th trade in a transaction (Trade.event_index).
+        The first keeps the bare signature; later ones are suffixed.
+        """
+        return signature if index == 0 else f"{signature}:{index}"
     
-    async def process_event(self, event_data):
-        """Process incoming Solana event"""
+    @classmethod
+    def dedup_key(cls, kind: str, event_data: dict) -> str:
+        return f"{kind}_event:{cls.event_key(event_data['signature'], event_data.get('event_index', 0))}"
+    
+    def hold(self, seq: Optional[int]):
+        """Keep the listener checkpoint before notification `seq` until a matching release"""
+        if seq is not None and self.listener:
+            self.listener.tracker.hold(seq)
+    
+    def release(self, seq: Optional[int]):
+        if seq is not None and self.listener:
+            self.listener.release(seq)
+    
+    def handed_off(self, events: list):
+        """Events published (or dropped as published elsewhere); their notifications may be checkpointed"""
+        for event_data in events:
+            self.release(self.handoffs.pop(id(event_data), None))
+    
+    async def process_event(self, event_data, seq: Optional[int] = None):
+        """
+        Process incoming Solana event, emitting every decoded event in log order.
+        Each event queued for a batch holds listener notification `seq` until
+        it is handed off.
+        """
         signature = getattr(event_data, 'signature', None)
-        logs = getattr(event_data, 'logs', [])
-        event_type, current_log = self.get_function_id(logs)
+        logs = getattr(event_data, 'logs', None) or []
         
-        if not event_type or not signature:
+        if not signature:
             return
         
-        if event_type not in self.event_types:
-            return
+        signature = str(signature)
+        with metrics.DECODE_SECONDS.time():
+            events = self.registry.decode_logs(logs)
         
-        # Decode event
-        if event_type not in self.decoders:
-            return
+        if self.ledger:
+            self.ledger.confirm(signature)
         
-        for log in logs[current_log:]:
-            decoded_event = self.decoders[event_type].decode(log)
-            if decoded_event:
-                # Route to appropriate handler
-                if event_type == "CreateToken":
-                    # Fetch metadata for creates
+        trade_index = 0
+        for event_type, decoded_event in events:
+            if event_type not in self.event_types:
+                continue
+            
+            # Route to appropriate handler
+            if event_type == "CreateToken":
+                if self.worker_tasks:
+                    # Metadata is fetched by the enrich workers
+                    self.hold(seq)
+                    await self.enrich_queue.put((signature, decoded_event, seq))
+                else:
                     decoded_event = await self.get_metadata(decoded_event)
-                    await self.add_to_create_queue(signature, decoded_event)
-                elif event_type in ["PurchaseToken", "SellToken"]:
-                    await self.add_to_trade_queue(signature, decoded_event)
-                break
+                    await self.add_to_create_queue(signature, decoded_event, seq=seq)
+            elif event_type in ["PurchaseToken", "SellToken"]:
+                await self.add_to_trade_queue(signature, decoded_event, trade_index, seq=seq)
+                trade_index += 1
     
-    async def add_to_create_queue(self, signature: str, event: dict):
-        """Add create event to queue"""
+    async def process_provisional(self, event_data):
+        """Processed-listener callback: broadcast the events now, promote them when confirmed"""
+        signature = getattr(event_data, 'signature', None)
+        if not signature or getattr(event_data, 'err', None) is not None or not self.is_publisher():
+            return
+        events = [
+            (event_type, event)
+            for event_type, event in self.registry.decode_logs(getattr(event_data, 'logs', None) or [])
+            if event_type in self.event_types
+        ]
+        if events:
+            self.ledger.add(str(signature), events)
+    
+    async def enqueue_event(self, event_data, seq: Optional[int] = None):
+        """
+        Listener callback: hand the raw notification to the worker pool. The
+        decode worker releases `seq` once its events are queued, and each
+        queued event once it is published.
+        """
+        if self.event_queue.full():
+            self.backpressure_waits += 1
+            if self.backpressure_waits % 100 == 1:
+                logger.warning(
+                    f"Event queue full ({self.event_queue.maxsize}), reader waiting on workers "
+                    f"({self.backpressure_waits} waits so far)"
+                )
+        await self.event_queue.put((event_data, seq))
+    
+    async def _decode_worker(self):
+        """Decode notifications and route their events"""
+        while True:
+            event_data, seq = await self.event_queue.get()
+            try:
+                await self.process_event(event_data, seq)
+            except Exception as e:
+                logger.error(f"Error processing event: {e}", exc_info=True)
+            finally:
+                self.release(seq)
+                self.event_queue.task_done()
+    
+    async def _enrich_worker(self):
+        """Fetch metadata for decoded creates, then queue them"""
+        while True:
+            signature, event, seq = await self.enrich_queue.get()
+            try:
+                event = await self.get_metadata(event)
+                await self.add_to_create_queue(signature, event, seq=seq)
+            except Exception as e:
+                logger.error(f"Error enriching create event {signature}: {e}", exc_info=True)
+            finally:
+                self.release(seq)
+                self.enrich_queue.task_done()
+    
+    def start_workers(self):
+        """Start the decode and enrich worker pools"""
+        self.worker_tasks = [
+            asyncio.create_task(self._decode_worker()) for _ in range(self.decode_workers)
+        ] + [
+            asyncio.create_task(self._enrich_worker()) for _ in range(self.enrich_workers)
+        ]
+    
+    async def stop_workers(self, timeout: float = 30):
+        """Let the workers drain what is already queued, then cancel them"""
+        if not self.worker_tasks:
+            return
+        try:
+            await asyncio.wait_for(self.event_queue.join(), timeout)
+            await asyncio.wait_for(self.enrich_queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Workers did not drain in {timeout}s "
+                f"({self.event_queue.qsize()} raw, {self.enrich_queue.qsize()} creates left)"
+            )
+        for task in self.worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self.worker_tasks, return_exceptions=True)
+        self.worker_tasks = []
+    
+    def queue_depths(self) -> dict:
+        """Current depth of every in-process queue"""
+        return {
+            'events': self.event_queue.qsize(),
+            'enrich': self.enrich_queue.qsize(),
+            'create_batch': len(self.create_queue),
+            'trade_batch': len(self.trade_queue),
+            'backpressure_waits': self.backpressure_waits,
+            'spool_pending': self.spool.pending_count() if self.spool else 0,
+        }
+    
+    async def add_to_create_queue(self, signature: str, event: dict, seq: Optional[int] = None):
+        """Add create event to queue (from listener notification `seq`)"""
         event_data = {
             'signature': signature,
             'event': event
         }
         
-        if not self.enable_batching:
-            # Process immediately
-            process_creates_batch.delay([event_data])
-            return
-        
-        # Use separate cache for creates
-        cache_backend = caches['creates'] if 'creates' in caches else cache
-        cache_key = f"create_event:{signature}"
-        
-        # Deduplicate
-        if cache_backend.get(cache_key):
+        # Deduplicate (Redis is checked when the batch is published)
+        if self.create_dedup.seen(f"create_event:{signature}"):
             logger.debug(f"Duplicate create event ignored: {signature}")
             return
         
-        cache_backend.set(cache_key, True, 3600)  # Cache for 1 hour
+        if self.spool:
+            event_data['spool_seq'] = self.spool.append('create', event_data)
+        if self.batch_controller:
+            self.batch_controller.record_arrival()
+        if seq is not None:
+            self.hold(seq)
+            self.handoffs[id(event_data)] = seq
         self.create_queue.append(event_data)
         
         logger.info(f"Added create event to queue: {signature} (queue size: {len(self.create_queue)})")
@@ -228,28 +378,27 @@ class EventHandler:
         # Check if we should process
         await self._check_create_batch()
     
-    async def add_to_trade_queue(self, signature: str, event: dict):
-        """Add trade event to queue"""
+    async def add_to_trade_queue(self, signature: str, event: dict, event_index: int = 0,
+                                 seq: Optional[int] = None):
+        """Add trade event to queue (the event_index-th trade of its transaction)"""
         event_data = {
             'signature': signature,
+            'event_index': event_index,
             'event': event
         }
         
-        if not self.enable_batching:
-            # Process immediately
-            process_trades_batch.delay([event_data])
-            return
-        
-        # Use separate cache for trades
-        cache_backend = caches['trades'] if 'trades' in caches else cache
-        cache_key = f"trade_event:{signature}"
-        
-        # Deduplicate
-        if cache_backend.get(cache_key):
-            logger.debug(f"Duplicate trade event ignored: {signature}")
+        # Deduplicate (Redis is checked when the batch is published)
+        if self.trade_dedup.seen(self.dedup_key('trade', event_data)):
+            logger.debug(f"Duplicate trade event ignored: {signature} #{event_index}")
             return
         
-        cache_backend.set(cache_key, True, 3600)  # Cache for 1 hour
+        if self.spool:
+            event_data['spool_seq'] = self.spool.append('trade', event_data)
+        if self.batch_controller:
+            self.batch_controller.record_arrival()
+        if seq is not None:
+            self.hold(seq)
+            self.handoffs[id(event_data)] = seq
         self.trade_queue.append(event_data)
         
         logger.info(f"Added trade event to queue: {signature} (queue size: {len(self.trade_queue)})")
@@ -283,9 +432,13 @@ class EventHandler:
         if should_process:
             await self._process_trade_batch()
     
+    def is_publisher(self) -> bool:
+        """True unless this is a standby replica"""
+        return self.elector is None or self.elector.is_leader
+    
     async def _process_create_batch(self):
         """Process batch of create events"""
-        if not self.create_queue:
+        if not self.create_queue or not self.is_publisher():
             return
         
         batch = self.create_queue[:]
@@ -294,12 +447,14 @@ class EventHandler:
         
         logger.info(f"Processing create batch: {len(batch)} events")
         
-        # Send to Celery
-        process_creates_batch.delay(batch)
+        # Send to Celery (or straight to Postgres)
+        send = self.sink.write_creates if self.sink else process_creates_batch.delay
+        if not await self._publish('create', send, batch, self.create_dedup):
+            self.create_queue[:0] = batch
     
     async def _process_trade_batch(self):
         """Process batch of trade events"""
-        if not self.trade_queue:
+        if not self.trade_queue or not self.is_publisher():
             return
         
         batch = self.trade_queue[:]
@@ -308,43 +463,292 @@ class EventHandler:
         
         logger.info(f"Processing trade batch: {len(batch)} events")
         
-        # Send to Celery
-        process_trades_batch.delay(batch)
+        # Send to Celery (or straight to Postgres)
+        send = self.sink.write_trades if self.sink else publish_trades_batch
+        if not await self._publish('trade', send, batch, self.trade_dedup):
+            self.trade_queue[:0] = batch
+    
+    async def _publish(self, kind: str, send, batch: list, dedup: BatchDeduplicator) -> bool:
+        """
+        Publish a batch with `send` (a task's delay or a sink coroutine
+        function). With a spool, the batch is made durable
+        first (group commit) and acked only after the publish succeeds.
+        Keys are claimed in Redis in one round trip; events another process
+        (or an earlier run) already published are dropped. The listener
+        checkpoint moves past the batch only once it is handed off.
+        
+        Returns:
+            False if the publish failed; the caller keeps the batch queued
+        """
+        try:
+            if self.spool:
+                await self.spool.sync()
+            
+            keys = [self.dedup_key(kind, e) for e in batch]
+            unclaimed = [key for key in keys if key not in self.claimed_keys]
+            for key, won in zip(unclaimed, dedup.claim(unclaimed)):
+                if won:
+                    self.claimed_keys.add(key)
+            fresh = [e for e, key in zip(batch, keys) if key in self.claimed_keys]
+            
+            if len(fresh) < len(batch):
+                logger.debug(f"Dropped {len(batch) - len(fresh)} events already published elsewhere")
+            if fresh:
+                start = time.perf_counter()
+                result = send(fresh)
+                if asyncio.iscoroutine(result):
+                    await result
+                metrics.PUBLISH_SECONDS.observe(
+                    time.perf_counter() - start, kind=kind, sink='direct' if self.sink else 'celery'
+                )
+                metrics.BATCH_SIZE.observe(len(fresh), kind=kind)
+        except Exception as e:
+            # Claimed keys stay in claimed_keys so the retry publishes them
+            logger.error(f"Failed to publish {len(batch)} events, will retry: {e}")
+            return False
+        
+        self.claimed_keys.difference_update(keys)
+
+        if self.spool:
+            self.spool.ack([e['spool_seq'] for e in batch if 'spool_seq' in e])
+        self.handed_off(batch)
+        return True
+    
+    def follow_leader(self):
+        """
+        Standby: drop buffered events the leader has already published and
+        cap the rest. What remains is published on takeover; the Redis
+        claims keep anything the old leader sent from going out twice.
+        """
+        for kind, queue, dedup in (
+            ('create', self.create_queue, self.create_dedup),
+            ('trade', self.trade_queue, self.trade_dedup),
+        ):
+            if not queue:
+                continue
+            keys = [self.dedup_key(kind, e) for e in queue]
+            try:
+                published = dedup.published(keys)
+            except Exception as e:
+                logger.warning(f"Standby could not check published {kind} events: {e}")
+                published = [False] * len(keys)
+            # Our own recovered spool entries were claimed by us; keep them
+            keep = [e for e, key, done in zip(queue, keys, published) if not done or key in self.claimed_keys]
+            overflow = max(len(keep) - self.standby_buffer, 0)
+            if overflow:
+                logger.warning(f"Standby {kind} buffer over {self.standby_buffer}, dropping {overflow} oldest")
+                self.standby_stats['overflow'] += overflow
+            dropped = len(queue) - len(keep) + overflow
+            if not dropped:
+                continue
+            kept = {id(e) for e in keep[overflow:]}
+            if self.spool:
+                self.spool.ack([e['spool_seq'] for e in queue if id(e) not in kept and 'spool_seq' in e])
+            self.handed_off([e for e in queue if id(e) not in kept])
+            queue[:] = keep[overflow:]
+            self.standby_stats['followed'] += dropped - overflow
+    
+    def register_metrics(self):
+        """Expose handler, listener, fetcher and sink state as gauges"""
+        registry = metrics.registry
+        registry.callback(
+            'ingest_queue_depth', 'Items waiting in each in-process queue', ['queue'],
+            lambda: [({'queue': name}, value) for name, value in self.queue_depths().items()]
+        )
+        registry.callback(
+            'batching', 'Current batch size/delay and adaptive controller inputs', ['field'],
+            lambda: [({'field': name}, value) for name, value in self.batching_stats().items()]
+        )
+        registry.callback(
+            'listener_gap_recovery', 'Gap recovery after reconnects', ['field'],
+            lambda: [({'field': name}, value) for name, value in self.listener.gap_stats.items()]
+        )
+        registry.callback(
+            'fanin_endpoint_events', 'Fan-in events per endpoint (first arrival, duplicate, recycled)',
+            ['endpoint', 'result'],
+            lambda: [
+                ({'endpoint': url, 'result': name}, value)
+                for url, stats in getattr(self.listener, 'endpoint_stats', {}).items()
+                for name, value in stats.items()
+            ]
+        )
+        registry.callback(
+            'ipfs_gateway', 'IPFS gateway wins, errors and total latency', ['gateway', 'field'],
+            lambda: [
+                ({'gateway': gateway, 'field': name}, value)
+                for gateway, stats in self.metadata_fetcher.stats.items()
+                for name, value in stats.items()
+            ]
+        )
+        if self.elector:
+            registry.callback(
+                'listener_leader', 'Leader election: is_leader, elections, standby buffer trimming', ['field'],
+                lambda: [
+                    ({'field': name}, value)
+                    for name, value in {
+                        'is_leader': int(self.elector.is_leader), **self.elector.stats, **self.standby_stats,
+                    }.items()
+                ]
+            )
+        if self.ledger:
+            registry.callback(
+                'provisional', 'Provisional (processed) events: pending, promoted, rolled back', ['field'],
+                lambda: [({'field': name}, value) for name, value in self.ledger.stats.items()]
+            )
+        if self.sink:
+            registry.callback(
+                'direct_sink', 'Rows written by the direct sink', ['field'],
+                lambda: [({'field': name}, value) for name, value in self.sink.stats.items()]
+            )
+    
+    def recover_spool(self):
+        """Queue events that were spooled but never published (previous run crashed)"""
+        if not self.spool:
+            return
+        for seq, kind, event_data in self.spool.open():
+            event_data['spool_seq'] = seq
+            # The previous run may already have claimed these keys; publish regardless
+            key = self.dedup_key(kind, event_data)
+            self.claimed_keys.add(key)
+            if kind == 'create':
+                self.create_dedup.seen(key)
+                self.create_queue.append(event_data)
+            else:
+                self.trade_dedup.seen(key)
+                self.trade_queue.append(event_data)
+    
+    async def adapt_batching(self, interval: float = 1.0):
+        """Periodically resize batches from Celery backlog, task durations and arrival rate"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                queue_depth = await asyncio.to_thread(get_celery_queue_depth)
+                durations = [
+                    stats['duration']
+                    for stats in await asyncio.gather(
+                        asyncio.to_thread(get_task_duration, 'process_creates_batch'),
+                        asyncio.to_thread(get_task_duration, 'process_trades_batch'),
+                    )
+                    if stats
+                ]
+                self.batch_size, self.batch_delay = self.batch_controller.update(
+                    queue_depth, max(durations) if durations else None
+                )
+            except Exception as e:
+                logger.warning(f"Could not adapt batch size: {e}")
+    
+    def batching_stats(self) -> dict:
+        """Current batch size/delay and, when adaptive, the inputs behind them"""
+        if self.batch_controller:
+            return dict(self.batch_controller.stats)
+        return {'batch_size': self.batch_size, 'batch_delay': self.batch_delay}
     
     async def periodic_batch_check(self):
         """Periodically check for batches to process"""
         while True:
             await asyncio.sleep(self.batch_delay)
+            if not self.is_publisher():
+                self.follow_leader()
+                continue
             await self._check_create_batch()
             await self._check_trade_batch()
     
-    async def run_listener(self):
-        """Run the Solana event listener"""
-        listener = SolanaEventListener(
-            rpc_ws_url=settings.RPC_WS_URL,
+    def build_listener(self, callback, commitment='confirmed', **kwargs):
+        """Single-endpoint listener, or a fan-in across every configured endpoint"""
+        listener_kwargs = dict(
             program_id=settings.PROGRAM_ID,
-            callback=self.process_event,
+            callback=callback,
+            commitment=commitment,
             max_retries=None,
             retry_delay=3,
-            auto_restart=True
+            auto_restart=True,
+            **kwargs
         )
+        if len(self.ws_urls) > 1:
+            return MultiEndpointListener(
+                rpc_ws_urls=self.ws_urls,
+                stall_timeout=self.stall_timeout,
+                **listener_kwargs
+            )
+        return SolanaEventListener(rpc_ws_url=self.ws_urls[0], **listener_kwargs)
+    
+    async def run_listener(self):
+        """Run the Solana event listener"""
+        listener = self.build_listener(
+            self.enqueue_event,
+            rpc_http_url=settings.RPC_HTTP_URL,
+            checkpoint_store=ListenerCheckpoint(
+                f"listener_checkpoint:{settings.PROGRAM_ID}:{self.__class__.__name__}"
+            ),
+            recorder=self.recorder,
+            handoff_ack=True,
+        )
+        self.listener = listener
+        if self.ledger:
+            # No gap recovery: whatever it misses still arrives as confirmed
+            self.processed_listener = self.build_listener(self.process_provisional, commitment='processed')
         
+        background = []
         try:
-            # Start periodic batch checker
-            batch_task = asyncio.create_task(self.periodic_batch_check())
+            if self.recorder:
+                self.recorder.open()
+            if self.sink:
+                await self.sink.start()
+            if self.metrics_server:
+                self.register_metrics()
+                await self.metrics_server.start()
+                background.append(asyncio.create_task(self.metrics_server.sample_rates()))
+            
+            # Republish anything a previous run spooled but never sent
+            self.recover_spool()
+            if self.spool:
+                background.append(asyncio.create_task(self.spool.run_committer()))
             
-            # Start listener
-            await listener.listen()
+            if self.elector:
+                await self.elector.step()
+                background.append(asyncio.create_task(self.elector.run()))
+            
+            # Start decode/enrich workers and periodic batch checker
+            self.start_workers()
+            background.append(asyncio.create_task(self.periodic_batch_check()))
+            if self.batch_controller:
+                background.append(asyncio.create_task(self.adapt_batching()))
+            
+            # Start listener(s)
+            if self.processed_listener:
+                background.append(asyncio.create_task(self.ledger.run_broadcaster()))
+                background.append(asyncio.create_task(self.ledger.run_sweeper()))
+                await asyncio.gather(listener.listen(), self.processed_listener.listen())
+            else:
+                await listener.listen()
             
         except KeyboardInterrupt:
             logger.info("Keyboard interrupt received")
         finally:
-            # Process remaining events
+            # Stop reading, then finish what the workers already have
+            await listener.stop()
+            if self.processed_listener:
+                await self.processed_listener.stop()
+            await self.stop_workers()
+            for task in background:
+                task.cancel()
+            
+            # Process remaining events (a standby keeps them spooled)
             await self._process_create_batch()
             await self._process_trade_batch()
+            listener.save_checkpoint()
+            if self.elector:
+                await self.elector.resign()
             
             # Clean up
-            await listener.stop()
+            if self.spool:
+                await self.spool.close()
+            if self.sink:
+                await self.sink.close()
+            if self.metrics_server:
+                await self.metrics_server.stop()
+            if self.recorder:
+                self.recorder.close()
             await self.close_ipfs_session()
 
 
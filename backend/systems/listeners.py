@@ -2,7 +2,13 @@ from solana.rpc.websocket_api import connect, RpcTransactionLogsFilterMentions
 from solders.pubkey import Pubkey 
 import asyncio
 import logging
+import time
+import aiohttp
+from collections import OrderedDict
+from types import SimpleNamespace
 from solders.rpc import responses
+from systems.rpc_client import SolanaRpcClient, RpcError
+from systems.metrics import LISTENER_MESSAGES
 
 # Configure logging
 logging.basicConfig(
@@ -11,9 +17,55 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class CheckpointTracker:
+    """
+    Dispatched notifications in arrival order, each held until everything it
+    produced has been handed off. The checkpoint only moves over the oldest
+    notifications once they are released, so handoffs finishing out of order
+    never move it past one still in flight.
+    """
+
+    def __init__(self):
+        self._next_seq = 0
+        self._pending = OrderedDict()  # seq -> [position or None, holds]
+        self.committed = None  # {'slot': int, 'signature': str}
+
+    def begin(self, position: dict = None) -> int:
+        """Register a notification (held once) and return its sequence number"""
+        seq = self._next_seq
+        self._next_seq += 1
+        self._pending[seq] = [position, 1]
+        return seq
+
+    def hold(self, seq: int):
+        self._pending[seq][1] += 1
+
+    def release(self, seq: int) -> bool:
+        """Drop one hold of `seq`; returns True if the checkpoint advanced"""
+        entry = self._pending.get(seq)
+        if entry is None:
+            return False
+        entry[1] -= 1
+        advanced = False
+        while self._pending:
+            position, holds = next(iter(self._pending.values()))
+            if holds > 0:
+                break
+            self._pending.popitem(last=False)
+            if position:
+                self.committed = position
+                advanced = True
+        return advanced
+
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+
 class SolanaEventListener: 
     def __init__(self, rpc_ws_url, program_id, callback=None, commitment='confirmed',
-                 max_retries=10, retry_delay=5, auto_restart=True): 
+                 max_retries=10, retry_delay=5, auto_restart=True,
+                 rpc_http_url=None, checkpoint_store=None, gap_chunk_size=5000,
+                 checkpoint_interval=1.0, recorder=None, handoff_ack=False, gap_fetch_retries=4): 
         """ 
         Initialize the Solana event listener with auto-restart capability. 
          
@@ -25,6 +77,15 @@ class SolanaEventListener:
             max_retries (int): Maximum number of reconnection attempts (None for infinite)
             retry_delay (int): Delay in seconds between retry attempts
             auto_restart (bool): Whether to automatically restart on failure
+            rpc_http_url (str): HTTP RPC URL used to replay missed transactions (None disables gap recovery)
+            checkpoint_store: Object with load()/save(slot, signature) persisting the last processed event
+            gap_chunk_size (int): Transactions fetched per round while replaying a gap
+            checkpoint_interval (float): Minimum seconds between checkpoint writes
+            recorder: Object with record(value, slot) capturing every dispatched notification
+            handoff_ack (bool): Call callback(value, seq) and checkpoint a notification only once
+                the callback reports it with release(seq) (its events spooled or published);
+                otherwise it counts as processed when the callback returns
+            gap_fetch_retries (int): Retries of transactions a gap replay failed to fetch
         """ 
         self.rpc_ws_url = rpc_ws_url 
         self.program_id = Pubkey.from_string(program_id) 
@@ -37,6 +98,25 @@ class SolanaEventListener:
         self.auto_restart = auto_restart
         self.should_run = False
         self.retry_count = 0
+        
+        # Gap recovery
+        self.rpc_http_url = rpc_http_url
+        self.checkpoint_store = checkpoint_store
+        self.gap_chunk_size = gap_chunk_size
+        self.gap_fetch_retries = gap_fetch_retries
+        self.checkpoint_interval = checkpoint_interval
+        self.recorder = recorder
+        self.handoff_ack = handoff_ack
+        self.tracker = CheckpointTracker()
+        self._last_checkpoint_save = 0
+        # Held while a gap is unrecovered, so live events cannot move the checkpoint past it
+        self._gap_hold = None
+        self.gap_stats = {
+            'gaps_recovered': 0,
+            'last_gap_size': 0,
+            'max_gap_size': 0,
+            'events_recovered': 0,
+        }
          
     async def connect(self): 
         """Establish connection to Solana WebSocket endpoint""" 
@@ -98,20 +178,21 @@ class SolanaEventListener:
                     notifications.append(msg)
 
                 for note in notifications:
+                    LISTENER_MESSAGES.inc(endpoint=self.rpc_ws_url, commitment=self.commitment)
                     # Object-style (e.g., from `websockets` or `jsonrpcclient`)
                     if hasattr(note, 'method') and note.method == "logsNotification":
                         result = getattr(note.params, 'result', None)
                         if result and self.callback:
-                            await self.callback(result.value)
+                            await self._dispatch(result.value, self._get_slot(result))
                     
                     if type(note) == responses.LogsNotification:
-                        await self.callback(note.result.value)
+                        await self._dispatch(note.result.value, self._get_slot(note.result))
 
                     # Dict-style message (e.g., raw JSON from some WebSocket clients)
                     elif isinstance(note, dict) and note.get("method") == "logsNotification":
                         result = note.get("params", {}).get("result", {})
                         if self.callback:
-                            await self.callback(result.get("value", {}))
+                            await self._dispatch(result.get("value", {}), result.get("context", {}).get("slot"))
             
             return True
         except Exception as e:
@@ -120,6 +201,167 @@ class SolanaEventListener:
             traceback.print_exc()
             return False
 
+    @staticmethod
+    def _get_slot(result):
+        context = getattr(result, 'context', None)
+        return getattr(context, 'slot', None)
+
+    @property
+    def last_processed(self):
+        """Newest notification whose events (and everything before it) were handed off"""
+        return self.tracker.committed
+
+    async def _dispatch(self, value, slot=None):
+        """Run the callback for one notification; it is checkpointed once released"""
+        if self.recorder:
+            self.recorder.record(value, slot)
+
+        signature = value.get('signature') if isinstance(value, dict) else getattr(value, 'signature', None)
+        position = None
+        if signature is not None and slot is not None:
+            position = {'slot': slot, 'signature': str(signature)}
+        seq = self.tracker.begin(position)
+
+        if self.callback and self.handoff_ack:
+            # The callback owns the hold and releases it after the handoff
+            await self.callback(value, seq)
+            return
+        try:
+            if self.callback:
+                await self.callback(value)
+        finally:
+            self.release(seq)
+
+    def release(self, seq: int):
+        """Mark notification `seq` handed off; the checkpoint follows the oldest still in flight"""
+        if not self.tracker.release(seq):
+            return
+        now = time.monotonic()
+        if now - self._last_checkpoint_save >= self.checkpoint_interval:
+            self.save_checkpoint()
+            self._last_checkpoint_save = now
+
+    def save_checkpoint(self):
+        if self.checkpoint_store and self.last_processed:
+            try:
+                self.checkpoint_store.save(self.last_processed['slot'], self.last_processed['signature'])
+            except Exception as e:
+                logger.warning(f"Failed to save listener checkpoint: {e}")
+
+    async def fetch_gap_transactions(self, client: SolanaRpcClient, signatures: list, commitment: str) -> dict:
+        """
+        Transactions of a gap chunk. Failed fetches are retried with backoff;
+        if any is still missing the replay fails rather than skip it.
+        """
+        transactions = {}
+        for attempt in range(self.gap_fetch_retries + 1):
+            missing = [sig for sig in signatures if transactions.get(sig) is None]
+            if not missing:
+                return transactions
+            if attempt:
+                backoff = 0.5 * (2 ** attempt)
+                logger.warning(f"{len(missing)} gap transactions failed to fetch, retrying in {backoff}s")
+                await asyncio.sleep(backoff)
+            try:
+                transactions.update(await client.get_transactions(missing, commitment=commitment))
+            except (RpcError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"Fetching {len(missing)} gap transactions failed: {e}")
+
+        missing = [sig for sig in signatures if transactions.get(sig) is None]
+        raise RpcError(
+            f"{len(missing)} gap transactions could not be fetched after {self.gap_fetch_retries} retries "
+            f"(first: {missing[0]})"
+        )
+
+    async def recover_gap(self):
+        """
+        Replay transactions missed since the last processed event (while
+        disconnected or restarting) through the callback, oldest first, in
+        chunks of gap_chunk_size. Duplicates of events already seen are left
+        to the callback's dedup.
+
+        If the replay fails, the checkpoint is held at the start of the gap
+        (live events keep flowing but cannot move it) until a later
+        recovery, after the next reconnect or restart, replays it.
+
+        Returns:
+            int: Number of transactions in the recovered gap
+        """
+        if not self.rpc_http_url or not self.callback:
+            return 0
+
+        checkpoint = self.last_processed
+        if checkpoint is None and self.checkpoint_store:
+            checkpoint = self.checkpoint_store.load()
+        if not checkpoint:
+            logger.info("No listener checkpoint yet, skipping gap recovery")
+            return 0
+        if self.tracker.committed is None:
+            self.tracker.committed = checkpoint
+
+        if self._gap_hold is None:
+            self._gap_hold = self.tracker.begin()
+        try:
+            gap_size = await self._replay_gap(checkpoint)
+        except Exception:
+            logger.error(
+                f"Gap since slot {checkpoint['slot']} not recovered; "
+                f"checkpoint held there until a later recovery succeeds"
+            )
+            raise
+        hold, self._gap_hold = self._gap_hold, None
+        self.release(hold)
+        self.save_checkpoint()
+        return gap_size
+
+    async def _replay_gap(self, checkpoint: dict) -> int:
+        # getSignaturesForAddress does not accept `processed`
+        commitment = 'confirmed' if self.commitment == 'processed' else self.commitment
+        missed = []
+        async with SolanaRpcClient(self.rpc_http_url) as client:
+            async for page in client.iter_signatures(
+                str(self.program_id), until=checkpoint['signature'], commitment=commitment
+            ):
+                missed.extend(
+                    {'signature': s['signature'], 'slot': s['slot']} for s in page if s.get('err') is None
+                )
+
+            if not missed:
+                return 0
+            missed.reverse()
+            if len(missed) > self.gap_chunk_size:
+                logger.warning(
+                    f"Gap since slot {checkpoint['slot']} is {len(missed)} transactions; "
+                    f"replaying in chunks of {self.gap_chunk_size}"
+                )
+
+            for start in range(0, len(missed), self.gap_chunk_size):
+                chunk = missed[start:start + self.gap_chunk_size]
+                transactions = await self.fetch_gap_transactions(
+                    client, [s['signature'] for s in chunk], commitment
+                )
+                for entry in chunk:
+                    tx = transactions[entry['signature']]
+                    if (tx.get('meta') or {}).get('err') is not None:
+                        continue
+                    value = SimpleNamespace(
+                        signature=entry['signature'],
+                        logs=tx['meta'].get('logMessages') or [],
+                        err=None,
+                    )
+                    await self._dispatch(value, entry['slot'])
+
+        gap_size = len(missed)
+        self.gap_stats['gaps_recovered'] += 1
+        self.gap_stats['last_gap_size'] = gap_size
+        self.gap_stats['max_gap_size'] = max(self.gap_stats['max_gap_size'], gap_size)
+        self.gap_stats['events_recovered'] += gap_size
+        logger.info(
+            f"Recovered gap of {gap_size} transactions "
+            f"(slots {missed[0]['slot']}-{missed[-1]['slot']})"
+        )
+        return gap_size
+
     async def listen(self):
         """Main method to start the listener with auto-restart capability"""
         self.should_run = True
@@ -131,6 +373,13 @@ class SolanaEventListener:
                 if not subscription_success:
                     raise Exception("Failed to subscribe to program logs")
                 
+                # Replay anything missed while disconnected; live messages
+                # buffer on the socket meanwhile and are deduplicated downstream
+                try:
+                    await self.recover_gap()
+                except Exception as e:
+                    logger.error(f"Gap recovery failed: {e}")
+                
                 # Process messages
                 processing_success = await self.process_messages()
                 if not processing_success:
@@ -159,6 +408,7 @@ class SolanaEventListener:
         """Stop the listener gracefully"""
         logger.info("Stopping listener...")
         self.should_run = False
+        self.save_checkpoint()
         await self.close()
         
     async def unsubscribe(self): 
@@ -186,6 +436,121 @@ class SolanaEventListener:
             finally:
                 self.ws_connection = None
 
+class _FanInConnection(SolanaEventListener):
+    """One websocket of a MultiEndpointListener; forwards everything to the fan-in"""
+
+    def __init__(self, fan_in, rpc_ws_url, **kwargs):
+        super().__init__(rpc_ws_url, str(fan_in.program_id), callback=fan_in.callback,
+                         commitment=fan_in.commitment, **kwargs)
+        self.fan_in = fan_in
+        self.last_message_at = time.monotonic()
+
+    async def connect(self):
+        connected = await super().connect()
+        if connected:
+            # A fresh connection gets a full stall window before the watchdog judges it
+            self.last_message_at = time.monotonic()
+        return connected
+
+    async def _dispatch(self, value, slot=None):
+        self.last_message_at = time.monotonic()
+        await self.fan_in._dispatch(value, slot, source=self)
+
+    async def recover_gap(self):
+        return await self.fan_in.recover_gap()
+
+
+class MultiEndpointListener(SolanaEventListener):
+    """
+    Subscribes to the program logs on several RPC endpoints at once and
+    merges the streams: the first arrival of a signature wins, later copies
+    from slower endpoints are dropped. A watchdog recycles any connection
+    that goes quiet while its peers are still delivering.
+    """
+
+    def __init__(self, rpc_ws_urls, program_id, callback=None, commitment='confirmed',
+                 stall_timeout=30, dedup_size=20000, **kwargs):
+        """
+        Args:
+            rpc_ws_urls (list): WebSocket RPC URLs to subscribe on
+            stall_timeout (float): Seconds without messages (while peers deliver) before recycling
+            dedup_size (int): Number of recent signatures remembered for first-arrival-wins dedup
+            **kwargs: Passed to SolanaEventListener (retry, gap recovery and checkpoint options)
+        """
+        super().__init__(rpc_ws_urls[0], program_id, callback=callback, commitment=commitment, **kwargs)
+        self.stall_timeout = stall_timeout
+        self.dedup_size = dedup_size
+        self._seen = OrderedDict()
+        self._recovery_lock = asyncio.Lock()
+
+        self.connections = [
+            _FanInConnection(self, url, max_retries=None, retry_delay=self.retry_delay, auto_restart=True)
+            for url in rpc_ws_urls
+        ]
+        self.endpoint_stats = {
+            url: {'first': 0, 'duplicate': 0, 'recycled': 0}
+            for url in rpc_ws_urls
+        }
+
+    async def _dispatch(self, value, slot=None, source=None):
+        signature = value.get('signature') if isinstance(value, dict) else getattr(value, 'signature', None)
+        if signature is not None:
+            key = str(signature)
+            stats = self.endpoint_stats.get(source.rpc_ws_url) if source else None
+            if key in self._seen:
+                if stats:
+                    stats['duplicate'] += 1
+                return
+            self._seen[key] = None
+            if len(self._seen) > self.dedup_size:
+                self._seen.popitem(last=False)
+            if stats:
+                stats['first'] += 1
+
+        await super()._dispatch(value, slot)
+
+    async def recover_gap(self):
+        # Every connection asks on (re)subscribe; run them one at a time so
+        # later ones start from the checkpoint the previous one advanced
+        async with self._recovery_lock:
+            return await super().recover_gap()
+
+    async def watchdog(self):
+        """Recycle connections that stopped delivering while peers still produce"""
+        while self.should_run:
+            await asyncio.sleep(max(self.stall_timeout / 2, 1))
+            now = time.monotonic()
+            producing = [c for c in self.connections if now - c.last_message_at < self.stall_timeout]
+            if not producing:
+                # Whole feed is quiet (or every endpoint is down); nothing to compare against
+                continue
+
+            for connection in self.connections:
+                if connection in producing or connection.ws_connection is None:
+                    continue
+                logger.warning(
+                    f"{connection.rpc_ws_url} delivered nothing for "
+                    f"{now - connection.last_message_at:.0f}s while peers did; recycling"
+                )
+                self.endpoint_stats[connection.rpc_ws_url]['recycled'] += 1
+                connection.last_message_at = now
+                await connection.close()
+
+    async def listen(self):
+        """Run every connection plus the stall watchdog until stopped"""
+        self.should_run = True
+        watchdog_task = asyncio.create_task(self.watchdog())
+        try:
+            await asyncio.gather(*[connection.listen() for connection in self.connections])
+        finally:
+            watchdog_task.cancel()
+
+    async def stop(self):
+        logger.info("Stopping fan-in listener...")
+        self.should_run = False
+        self.save_checkpoint()
+        await asyncio.gather(*[connection.stop() for connection in self.connections])
+
 # Example usage:
 async def example_log_callback(log_data):
     logger.info(f"Received log data: {log_data}")
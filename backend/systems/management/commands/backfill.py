@@ -0,0 +1,228 @@
+# systems/management/commands/backfill.py
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from asgiref.sync import sync_to_async
+import aiohttp
+import asyncio
+import json
+import os
+import time
+from systems.event_handler import EventHandler
+from systems.rpc_client import SolanaRpcClient, RpcError
+from systems.tasks import process_creates_batch, process_trades_batch
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild coins, trades and holdings from the program transaction history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rpc-url',
+            type=str,
+            default=settings.RPC_HTTP_URL,
+            help='HTTP JSON-RPC endpoint (point at a local stand-in for testing)'
+        )
+        parser.add_argument(
+            '--checkpoint-file',
+            type=str,
+            default='backfill_checkpoint.json',
+            help='Where the last applied slot/signature is stored'
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Ignore any existing checkpoint and start from the first transaction'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Maximum concurrent RPC requests'
+        )
+        parser.add_argument(
+            '--rpc-batch-size',
+            type=int,
+            default=50,
+            help='getTransaction calls per JSON-RPC batch'
+        )
+        parser.add_argument(
+            '--fetch-retries',
+            type=int,
+            default=4,
+            help='Retries (with backoff) for transactions whose getTransaction failed'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Transactions applied to the database per step (checkpoint granularity)'
+        )
+        parser.add_argument(
+            '--max-signatures',
+            type=int,
+            default=None,
+            help='Stop after this many transactions (oldest first)'
+        )
+        parser.add_argument(
+            '--no-metadata',
+            action='store_true',
+            help='Skip IPFS metadata for created coins'
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.stdout.write(self.style.SUCCESS(
+            f'\n{"="*60}\n'
+            f'Backfilling program {settings.PROGRAM_ID}\n'
+            f'{"="*60}\n'
+            f'RPC:           {options["rpc_url"]}\n'
+            f'Workers:       {options["workers"]}\n'
+            f'Checkpoint:    {options["checkpoint_file"]}\n'
+            f'{"="*60}\n'
+        ))
+        asyncio.run(self.run_backfill())
+
+    # checkpoint helpers
+    def load_checkpoint(self) -> dict | None:
+        path = self.options['checkpoint_file']
+        if self.options['reset'] or not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def save_checkpoint(self, slot: int, signature: str):
+        path = self.options['checkpoint_file']
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'slot': slot, 'signature': signature}, f)
+        os.replace(tmp_path, path)  # atomic, a crash never leaves a torn checkpoint
+
+    async def collect_signatures(self, client: SolanaRpcClient, until: str | None) -> list:
+        """All successful signatures newer than `until`, oldest first"""
+        signatures = []
+        async for page in client.iter_signatures(settings.PROGRAM_ID, until=until):
+            signatures.extend(s for s in page if s.get('err') is None)
+            self.stdout.write(f'Collected {len(signatures)} signatures...')
+        signatures.reverse()
+        if self.options['max_signatures']:
+            signatures = signatures[:self.options['max_signatures']]
+        return signatures
+
+    async def fetch_chunk(self, client: SolanaRpcClient, chunk: list) -> dict:
+        """
+        Transactions of a chunk. Fetches that failed (a None entry, or the
+        whole request) are retried with backoff; if any is still missing the
+        run stops, so the checkpoint never moves past a transaction that was
+        not applied.
+        """
+        signatures = [s['signature'] for s in chunk]
+        transactions = {}
+        retries = self.options['fetch_retries']
+        for attempt in range(retries + 1):
+            missing = [sig for sig in signatures if transactions.get(sig) is None]
+            if not missing:
+                return transactions
+            if attempt:
+                backoff = 0.5 * (2 ** attempt)
+                logger.warning(f"{len(missing)} transactions failed to fetch, retrying in {backoff}s")
+                await asyncio.sleep(backoff)
+            try:
+                transactions.update(await client.get_transactions(
+                    missing, batch_size=self.options['rpc_batch_size']
+                ))
+            except (RpcError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"Fetching {len(missing)} transactions failed: {e}")
+
+        missing = [sig for sig in signatures if transactions.get(sig) is None]
+        for sig in missing:
+            logger.error(f"Could not fetch transaction {sig}")
+        raise CommandError(
+            f"{len(missing)} transactions could not be fetched after {retries} retries "
+            f"(first: {missing[0]}); stopping with the checkpoint before this chunk, rerun to resume"
+        )
+
+    async def decode_chunk(self, handler: EventHandler, chunk: list, transactions: dict):
+        """Decode a chunk in chain order into create and trade batches"""
+        creates, trades = [], []
+        for entry in chunk:
+            signature = entry['signature']
+            tx = transactions[signature]
+            # Failed transactions emit no events
+            if (tx.get('meta') or {}).get('err') is not None:
+                continue
+
+            logs = tx['meta'].get('logMessages') or []
+            trade_index = 0
+            for event_type, event in handler.registry.decode_logs(logs):
+                if event_type == "CreateToken":
+                    creates.append({'signature': signature, 'event': event})
+                else:
+                    trades.append({'signature': signature, 'event_index': trade_index, 'event': event})
+                    trade_index += 1
+
+        if creates and not self.options['no_metadata']:
+            await asyncio.gather(*[handler.get_metadata(c['event']) for c in creates])
+        return creates, trades
+
+    def apply_chunk(self, creates: list, trades: list):
+        # Creates first so trades in the same chunk find their coin
+        if creates:
+            process_creates_batch.apply(args=[creates], throw=True)
+        if trades:
+            process_trades_batch.apply(args=[trades], throw=True)
+
+    async def run_backfill(self):
+        checkpoint = self.load_checkpoint()
+        until = checkpoint['signature'] if checkpoint else None
+        if checkpoint:
+            self.stdout.write(f'Resuming after slot {checkpoint["slot"]} ({checkpoint["signature"]})')
+
+        handler = EventHandler(enable_batching=False)
+        chunk_size = self.options['chunk_size']
+        start_time = time.time()
+        applied = 0
+
+        async with SolanaRpcClient(self.options['rpc_url'], max_concurrency=self.options['workers']) as client:
+            signatures = await self.collect_signatures(client, until)
+            if not signatures:
+                self.stdout.write(self.style.SUCCESS('Nothing to backfill'))
+                await handler.close_ipfs_session()
+                return
+
+            chunks = [signatures[i:i + chunk_size] for i in range(0, len(signatures), chunk_size)]
+
+            def fetch(chunk):
+                return asyncio.create_task(self.fetch_chunk(client, chunk))
+
+            # Fetch the next chunk while the current one is written to the database
+            pending = fetch(chunks[0])
+            try:
+                for index, chunk in enumerate(chunks):
+                    transactions = await pending
+                    if index + 1 < len(chunks):
+                        pending = fetch(chunks[index + 1])
+
+                    creates, trades = await self.decode_chunk(handler, chunk, transactions)
+                    await sync_to_async(self.apply_chunk, thread_sensitive=True)(creates, trades)
+
+                    last = chunk[-1]
+                    self.save_checkpoint(last['slot'], last['signature'])
+                    applied += len(chunk)
+
+                    elapsed = time.time() - start_time
+                    self.stdout.write(
+                        f'Applied {applied}/{len(signatures)} transactions '
+                        f'({len(creates)} creates, {len(trades)} trades in chunk) '
+                        f'- {applied / elapsed:.0f} tx/s'
+                    )
+            finally:
+                if not pending.done():
+                    pending.cancel()
+                await handler.close_ipfs_session()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Backfill complete: {applied} transactions in {time.time() - start_time:.1f}s'
+        ))
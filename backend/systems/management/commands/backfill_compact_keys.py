@@ -0,0 +1,45 @@
+# systems/management/commands/backfill_compact_keys.py
+from django.core.management.base import BaseCommand, CommandError
+from systems.utils.compact_keys import RAW_KEYS, SID_MODELS, backfill_raw_keys, backfill_sids, missing_compact_keys
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the raw key and sid columns of migration 0046 for rows written before it '
+        '(safe to rerun, and to run while ingest is live)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows per UPDATE'
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report the rows still missing compact keys; fails if there are any'
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            batch_size = options['batch_size']
+            for model in RAW_KEYS:
+                filled, undecodable = backfill_raw_keys(model, batch_size)
+                self.stdout.write(self.style.SUCCESS(f'{model._meta.db_table}: {filled} raw keys filled'))
+                if undecodable:
+                    self.stdout.write(self.style.WARNING(
+                        f'{model._meta.db_table}: {undecodable} keys are not valid base58 and stay NULL'
+                    ))
+            for model in SID_MODELS:
+                updated = backfill_sids(model, batch_size)
+                self.stdout.write(self.style.SUCCESS(f'{model._meta.db_table}: {updated} rows got their sids'))
+
+        missing = {key: count for key, count in missing_compact_keys().items() if count}
+        for (table, column), count in missing.items():
+            self.stdout.write(f'{table}.{column}: {count} rows NULL')
+        if not missing:
+            self.stdout.write(self.style.SUCCESS('Every row has its compact keys'))
+        elif options['check']:
+            raise CommandError('Rows are missing compact keys (backfill them, or fix keys that are not base58)')
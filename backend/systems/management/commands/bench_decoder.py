@@ -0,0 +1,72 @@
+# systems/management/commands/bench_decoder.py
+from django.core.management.base import BaseCommand
+import time
+from systems.parser import (
+    TokenEventDecoder, pubkey_to_str,
+    TOKEN_CREATED_FIELDS, PURCHASED_TOKEN_FIELDS, SOLD_TOKEN_FIELDS,
+)
+
+# Recorded "Program data:" payloads for each event the listener decodes
+RECORDED_EVENTS = {
+    "TokenCreated": (
+        TOKEN_CREATED_FIELDS,
+        "Program data: 7BMp/4JOk6ylpPXSq5YU+gTDRvhfqyqjs8+e5tgopiIKfJbww09WTBwAAAAAAAAAAAAAZKeztuANAAAAAAAAAAAAAAAAAAAAAACsI/wGAAAAABJlyhMAAAAVQBO2QGidIKQ7aJdi295/x2SbvNESz94s53GmIlAmpgAAAAAAAAAAAF0AAABodHRwczovL2dhdGV3YXkucGluYXRhLmNsb3VkL2lwZnMvYmFma3JlaWhkd2RjZWZnaDRkcWtqdjY3dXpjbXc3b2plZTZ4ZWR6ZGV0b2p1empldnRlbnhxdXZ5a3U=",
+    ),
+    "PurchasedToken": (
+        PURCHASED_TOKEN_FIELDS,
+        "Program data: OEl4DhFNd8sAZc0dAAAAAEBLTAAAAAAAQLAZHgAAAAClpPXSq5YU+gTDRvhfqyqjs8+e5tgopiIKfJbww09WTGK6hb/0DwAAAAAAZKeztuANYrqFv/QPAAAAZc0dAAAAAB0AAAAAAAAA6EfvCEo0VYflqTaCvOYD4ojWDSLauhRyIuQjt0Scy2kAeOdoAAAAAA==",
+    ),
+    "SoldToken": (
+        SOLD_TOKEN_FIELDS,
+        "Program data: NwJpTA5vXgSlpPXSq5YU+gTDRvhfqyqjs8+e5tgopiIKfJbww09WTEBw1w4AAAAAkP4lAAAAAACwcbEOAAAAADHdwl/6BwAAAAAAZKeztuANMd3CX/oHAADA9PUOAAAAABwAAAAAAAAAKeKdS78HQfm8Nov13wffue7mPqNicdQgE+ArYRlvuL0qeOdoAAAAAA==",
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark the compiled event decoder against the construct path'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=20000,
+            help='Number of decodes per event type and path'
+        )
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Clear the pubkey cache before every decode (worst case for the fast path)'
+        )
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        cold = options['cold']
+
+        self.stdout.write(f'{"Event":<16}{"construct/s":>14}{"compiled/s":>14}{"speedup":>10}')
+        for event_name, (fields, log_line) in RECORDED_EVENTS.items():
+            decoder = TokenEventDecoder(event_name, fields)
+
+            # Both paths must agree before timing means anything
+            expected = decoder.decode_construct(log_line)
+            if decoder.decode(log_line) != expected:
+                self.stdout.write(self.style.ERROR(f'{event_name}: compiled output differs from construct'))
+                continue
+
+            slow = self._bench(decoder.decode_construct, log_line, iterations, cold)
+            fast = self._bench(decoder.decode, log_line, iterations, cold)
+            self.stdout.write(
+                f'{event_name:<16}{iterations / slow:>14,.0f}{iterations / fast:>14,.0f}{slow / fast:>9.1f}x'
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'pubkey cache: {pubkey_to_str.cache_info()}'))
+
+    @staticmethod
+    def _bench(decode, log_line, iterations, cold):
+        clear = pubkey_to_str.cache_clear
+        start = time.perf_counter()
+        for _ in range(iterations):
+            if cold:
+                clear()
+            decode(log_line)
+        return time.perf_counter() - start
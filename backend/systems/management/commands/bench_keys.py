@@ -0,0 +1,394 @@
+# systems/management/commands/bench_keys.py
+import io
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.core.management.base import BaseCommand
+from django.db import connection
+from systems.utils.keys import PUBKEY_BYTES, pubkey_to_bytes, bytes_to_pubkey, bytes_to_signature
+
+SCHEMA = 'bench_keys'
+
+# Current schema: base58 text keys everywhere, same indexes as the models
+# (Trade unpartitioned, so its keys leave out created_at)
+TEXT_LAYOUT = """
+CREATE TABLE {s}.text_user (
+    wallet_address varchar(44) PRIMARY KEY,
+    display_name varchar(150) NOT NULL DEFAULT ''
+);
+CREATE TABLE {s}.text_coin (
+    address varchar(44) PRIMARY KEY,
+    creator_id varchar(44) NOT NULL,
+    name varchar(100) NOT NULL
+);
+CREATE TABLE {s}.text_trade (
+    id bigint PRIMARY KEY,
+    transaction_hash varchar(88) NOT NULL,
+    event_index smallint NOT NULL DEFAULT 0,
+    user_id varchar(44) NOT NULL,
+    coin_id varchar(44) NOT NULL,
+    created_at timestamptz NOT NULL,
+    coin_amount numeric(24, 9) NOT NULL,
+    sol_amount numeric(24, 9) NOT NULL,
+    CONSTRAINT text_trade_signature_key UNIQUE (transaction_hash, event_index)
+);
+CREATE TABLE {s}.text_holding (
+    id bigserial PRIMARY KEY,
+    user_id varchar(44) NOT NULL,
+    coin_id varchar(44) NOT NULL,
+    amount_held numeric(20, 8) NOT NULL,
+    CONSTRAINT text_holding_user_coin_key UNIQUE (user_id, coin_id)
+);
+"""
+
+# Proposed schema: BIGINT surrogate keys, pubkeys and signatures as raw bytea
+COMPACT_LAYOUT = """
+CREATE TABLE {s}.compact_user (
+    id bigint PRIMARY KEY,
+    wallet_address bytea NOT NULL,
+    display_name varchar(150) NOT NULL DEFAULT '',
+    CONSTRAINT compact_user_wallet_address_key UNIQUE (wallet_address)
+);
+CREATE TABLE {s}.compact_coin (
+    id bigint PRIMARY KEY,
+    address bytea NOT NULL,
+    creator_id bigint NOT NULL,
+    name varchar(100) NOT NULL,
+    CONSTRAINT compact_coin_address_key UNIQUE (address)
+);
+CREATE TABLE {s}.compact_trade (
+    id bigint PRIMARY KEY,
+    signature bytea NOT NULL,
+    event_index smallint NOT NULL DEFAULT 0,
+    user_id bigint NOT NULL,
+    coin_id bigint NOT NULL,
+    created_at timestamptz NOT NULL,
+    coin_amount numeric(24, 9) NOT NULL,
+    sol_amount numeric(24, 9) NOT NULL,
+    CONSTRAINT compact_trade_signature_key UNIQUE (signature, event_index)
+);
+CREATE TABLE {s}.compact_holding (
+    id bigserial PRIMARY KEY,
+    user_id bigint NOT NULL,
+    coin_id bigint NOT NULL,
+    amount_held numeric(20, 8) NOT NULL,
+    CONSTRAINT compact_holding_user_coin_key UNIQUE (user_id, coin_id)
+);
+"""
+
+# Secondary indexes both layouts get, as on Coin / Trade / UserCoinHoldings
+SECONDARY_INDEXES = [
+    ('coin', 'creator', '(creator_id)'),
+    ('trade', 'user_created', '(user_id, created_at)'),
+    ('trade', 'coin_created', '(coin_id, created_at)'),
+    ('trade', 'created', '(created_at)'),
+    ('holding', 'user_coin', '(user_id, coin_id)'),
+    ('holding', 'user', '(user_id)'),
+]
+
+# Point queries on the compact layout first resolve the address to its id,
+# as get_object_or_404(Coin, address=...) followed by coin.trades would. Joining
+# on the address instead hides the coin from the planner's statistics and
+# turns "latest 100 trades" into "all trades of the coin, then sort".
+RESOLVE = {
+    'coin': 'SELECT id FROM {s}.compact_coin WHERE address = %s',
+    'user': 'SELECT id FROM {s}.compact_user WHERE wallet_address = %s',
+}
+
+# name -> (text SQL, compact SQL, parameterised by a coin / user address)
+QUERIES = {
+    'coin trades': (
+        """
+        SELECT t.transaction_hash, t.event_index, u.wallet_address, u.display_name, t.sol_amount, t.created_at
+        FROM {s}.text_trade t JOIN {s}.text_user u ON u.wallet_address = t.user_id
+        WHERE t.coin_id = %s ORDER BY t.created_at DESC LIMIT 100
+        """,
+        """
+        SELECT t.signature, t.event_index, u.wallet_address, u.display_name, t.sol_amount, t.created_at
+        FROM {s}.compact_trade t JOIN {s}.compact_user u ON u.id = t.user_id
+        WHERE t.coin_id = %s ORDER BY t.created_at DESC LIMIT 100
+        """,
+        'coin',
+    ),
+    'coin holders': (
+        """
+        SELECT u.wallet_address, h.amount_held
+        FROM {s}.text_holding h JOIN {s}.text_user u ON u.wallet_address = h.user_id
+        WHERE h.coin_id = %s ORDER BY h.amount_held DESC LIMIT 100
+        """,
+        """
+        SELECT u.wallet_address, h.amount_held
+        FROM {s}.compact_holding h JOIN {s}.compact_user u ON u.id = h.user_id
+        WHERE h.coin_id = %s ORDER BY h.amount_held DESC LIMIT 100
+        """,
+        'coin',
+    ),
+    'user trades': (
+        """
+        SELECT t.transaction_hash, t.event_index, c.address, c.name, t.sol_amount, t.created_at
+        FROM {s}.text_trade t JOIN {s}.text_coin c ON c.address = t.coin_id
+        WHERE t.user_id = %s ORDER BY t.created_at DESC LIMIT 100
+        """,
+        """
+        SELECT t.signature, t.event_index, c.address, c.name, t.sol_amount, t.created_at
+        FROM {s}.compact_trade t JOIN {s}.compact_coin c ON c.id = t.coin_id
+        WHERE t.user_id = %s ORDER BY t.created_at DESC LIMIT 100
+        """,
+        'user',
+    ),
+    'volume by coin': (
+        """
+        SELECT c.address, count(*), sum(t.sol_amount)
+        FROM {s}.text_trade t JOIN {s}.text_coin c ON c.address = t.coin_id
+        GROUP BY c.address
+        """,
+        """
+        SELECT c.address, count(*), sum(t.sol_amount)
+        FROM {s}.compact_trade t JOIN {s}.compact_coin c ON c.id = t.coin_id
+        GROUP BY c.address
+        """,
+        None,
+    ),
+    'trades x holdings': (
+        """
+        SELECT count(*), sum(h.amount_held)
+        FROM {s}.text_trade t
+        JOIN {s}.text_holding h ON h.user_id = t.user_id AND h.coin_id = t.coin_id
+        """,
+        """
+        SELECT count(*), sum(h.amount_held)
+        FROM {s}.compact_trade t
+        JOIN {s}.compact_holding h ON h.user_id = t.user_id AND h.coin_id = t.coin_id
+        """,
+        None,
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare index sizes and join speed of the base58 text keys against '
+        'BIGINT surrogate keys with bytea pubkeys/signatures, on synthetic data '
+        'in a scratch schema'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50000, help='Number of wallets')
+        parser.add_argument('--coins', type=int, default=5000, help='Number of coins')
+        parser.add_argument('--trades', type=int, default=500000, help='Number of trades')
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Runs per query; the median is reported'
+        )
+        parser.add_argument(
+            '--lookups',
+            type=int,
+            default=200,
+            help='Different coins / users per run of the point queries'
+        )
+        parser.add_argument('--seed', type=int, default=7)
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help=f'Leave the {SCHEMA} schema in place for manual EXPLAINs'
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+            cursor.execute(f'CREATE SCHEMA {SCHEMA}')
+            try:
+                cursor.execute(TEXT_LAYOUT.format(s=SCHEMA))
+                cursor.execute(COMPACT_LAYOUT.format(s=SCHEMA))
+                started = time.perf_counter()
+                users, coins = self._load(cursor, rng, options)
+                for table, suffix, columns in SECONDARY_INDEXES:
+                    for layout in ('text', 'compact'):
+                        cursor.execute(
+                            f'CREATE INDEX {layout}_{table}_{suffix}_idx ON {SCHEMA}.{layout}_{table} {columns}'
+                        )
+                for layout in ('text', 'compact'):
+                    for table in ('user', 'coin', 'trade', 'holding'):
+                        cursor.execute(f'VACUUM ANALYZE {SCHEMA}.{layout}_{table}')
+                self.stdout.write(f'Loaded in {time.perf_counter() - started:.1f}s\n')
+
+                cursor.execute('SELECT datcollate FROM pg_database WHERE datname = current_database()')
+                self.stdout.write(f'Database collation: {cursor.fetchone()[0]}\n')
+                self._report_sizes(cursor)
+                self._report_queries(cursor, rng, users, coins, options)
+            finally:
+                if not options['keep']:
+                    cursor.execute(f'DROP SCHEMA {SCHEMA} CASCADE')
+
+    def _load(self, cursor, rng, options):
+        """Same keys in both layouts; trades skew towards popular coins and active wallets"""
+        users = [rng.randbytes(32) for _ in range(options['users'])]
+        coins = [rng.randbytes(32) for _ in range(options['coins'])]
+        user_text = [bytes_to_pubkey(raw) for raw in users]
+        coin_text = [bytes_to_pubkey(raw) for raw in coins]
+        start = datetime.now(dt_timezone.utc) - timedelta(days=90)
+
+        self._copy(cursor, 'text_user', ['wallet_address'], ((w,) for w in user_text))
+        self._copy(cursor, 'compact_user', ['id', 'wallet_address'], ((i + 1, _hex(w)) for i, w in enumerate(users)))
+        creators = [rng.randrange(len(users)) for _ in coins]
+        self._copy(
+            cursor, 'text_coin', ['address', 'creator_id', 'name'],
+            ((coin_text[i], user_text[creators[i]], f'coin {i}') for i in range(len(coins)))
+        )
+        self._copy(
+            cursor, 'compact_coin', ['id', 'address', 'creator_id', 'name'],
+            ((i + 1, _hex(coins[i]), creators[i] + 1, f'coin {i}') for i in range(len(coins)))
+        )
+
+        trades, holdings = [], {}
+        for _ in range(options['trades']):
+            user = int(len(users) * rng.random() ** 2)
+            coin = int(len(coins) * rng.random() ** 3)
+            signature = rng.randbytes(64)
+            # ~5% of transactions carry a second trade
+            index = 1 if rng.random() < 0.05 else 0
+            created_at = start + timedelta(seconds=rng.randrange(90 * 86400))
+            sol_amount = round(rng.uniform(0.01, 20), 9)
+            trades.append((signature, index, user, coin, created_at, sol_amount))
+            holdings[(user, coin)] = holdings.get((user, coin), 0) + sol_amount * 1000
+
+        self._copy(
+            cursor, 'text_trade',
+            ['id', 'transaction_hash', 'event_index', 'user_id', 'coin_id', 'created_at', 'coin_amount', 'sol_amount'],
+            (
+                (i + 1, bytes_to_signature(sig), ix, user_text[u], coin_text[c], at, sol * 1000, sol)
+                for i, (sig, ix, u, c, at, sol) in enumerate(trades)
+            )
+        )
+        self._copy(
+            cursor, 'compact_trade',
+            ['id', 'signature', 'event_index', 'user_id', 'coin_id', 'created_at', 'coin_amount', 'sol_amount'],
+            (
+                (i + 1, _hex(sig), ix, u + 1, c + 1, at, sol * 1000, sol)
+                for i, (sig, ix, u, c, at, sol) in enumerate(trades)
+            )
+        )
+        self._copy(
+            cursor, 'text_holding', ['user_id', 'coin_id', 'amount_held'],
+            ((user_text[u], coin_text[c], round(amount, 8)) for (u, c), amount in holdings.items())
+        )
+        self._copy(
+            cursor, 'compact_holding', ['user_id', 'coin_id', 'amount_held'],
+            ((u + 1, c + 1, round(amount, 8)) for (u, c), amount in holdings.items())
+        )
+        return users, coins
+
+    @staticmethod
+    def _copy(cursor, table, columns, rows):
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join(str(value) for value in row))
+            buffer.write('\n')
+        buffer.seek(0)
+        cursor.cursor.copy_expert(f'COPY {SCHEMA}.{table} ({", ".join(columns)}) FROM STDIN', buffer)
+
+    def _report_sizes(self, cursor):
+        cursor.execute(
+            """
+            SELECT t.relname, i.relname, pg_relation_size(t.oid), pg_relation_size(i.oid)
+            FROM pg_index x
+            JOIN pg_class t ON t.oid = x.indrelid
+            JOIN pg_class i ON i.oid = x.indexrelid
+            JOIN pg_namespace n ON n.oid = t.relnamespace
+            WHERE n.nspname = %s
+            """,
+            [SCHEMA],
+        )
+        # (table, index without the layout prefix) -> {layout: bytes}
+        heaps, indexes = {}, {}
+        for table, index, heap_size, index_size in cursor.fetchall():
+            layout, _, table = table.partition('_')
+            heaps.setdefault(table, {})[layout] = heap_size
+            name = index.split('_', 1)[1].replace(f'{table}_', '', 1)
+            indexes.setdefault((table, name), {})[layout] = index_size
+
+        self.stdout.write(f'\n{"Relation":<28}{"text":>12}{"compact":>12}{"ratio":>8}')
+        totals = {'text': 0, 'compact': 0}
+        for table in ('user', 'coin', 'trade', 'holding'):
+            self._size_row(f'{table} (heap)', heaps[table])
+            for (owner, name), sizes in sorted(indexes.items()):
+                if owner != table:
+                    continue
+                self._size_row(f'  {name}', sizes)
+                for layout in totals:
+                    totals[layout] += sizes.get(layout, 0)
+        self._size_row('all indexes', totals, style=self.style.SUCCESS)
+
+    def _size_row(self, label, sizes, style=None):
+        text, compact = sizes.get('text', 0), sizes.get('compact', 0)
+        ratio = f'{compact / text:.2f}' if text and compact else '-'
+        line = f'{label:<28}{_mb(text):>12}{_mb(compact):>12}{ratio:>8}'
+        self.stdout.write(style(line) if style else line)
+
+    def _report_queries(self, cursor, rng, users, coins, options):
+        # Point queries arrive with a base58 key from the API and return base58;
+        # "+ edge" adds that decode / encode to the compact layout
+        lookups = {
+            'coin': [bytes_to_pubkey(coins[i]) for i in rng.sample(range(len(coins)), min(options['lookups'], len(coins)))],
+            'user': [bytes_to_pubkey(users[i]) for i in rng.sample(range(len(users)), min(options['lookups'], len(users)))],
+        }
+
+        self.stdout.write(
+            f'\n{"Query (median ms)":<28}{"text":>12}{"compact":>12}{"ratio":>8}{"+ edge":>12}{"ratio":>8}'
+        )
+        for name, (text_sql, compact_sql, param) in QUERIES.items():
+            keys = lookups[param] if param else [None]
+            resolve = RESOLVE[param].format(s=SCHEMA) if param else None
+            variants = {
+                'text': (text_sql, None, False, keys),
+                # Key already decoded, rows left as bytes: the database side alone
+                'compact': (compact_sql, resolve, False, [key and pubkey_to_bytes(key) for key in keys]),
+                'edge': (compact_sql, resolve, True, keys),
+            }
+            samples = {variant: [] for variant in variants}
+            # Interleaved, so drift on a busy machine hits every variant alike; round 0 warms the cache
+            for round in range(options['repeat'] + 1):
+                for variant, (sql, resolve, edge, params) in variants.items():
+                    elapsed = self._run(cursor, sql.format(s=SCHEMA), params, resolve, edge)
+                    if round:
+                        samples[variant].append(elapsed)
+            timings = {variant: statistics.median(elapsed) for variant, elapsed in samples.items()}
+            text, compact, edge = timings['text'], timings['compact'], timings['edge']
+            self.stdout.write(
+                f'{name:<28}{text:>12.1f}{compact:>12.1f}{compact / text:>8.2f}{edge:>12.1f}{edge / text:>8.2f}'
+            )
+
+    @staticmethod
+    def _run(cursor, sql, keys, resolve, edge):
+        """
+        Milliseconds to run `sql` once per key (looked up through `resolve`
+        first, if given); with `edge` the key is decoded from base58 and every
+        bytea in the result encoded back, as the API would
+        """
+        started = time.perf_counter()
+        for key in keys:
+            params = [] if key is None else [pubkey_to_bytes(key) if edge else key]
+            if resolve:
+                cursor.execute(resolve, params)
+                params = [cursor.fetchone()[0]]
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+            if edge:
+                for row in rows:
+                    for value in row:
+                        if isinstance(value, memoryview):
+                            bytes_to_pubkey(value) if len(value) == PUBKEY_BYTES else bytes_to_signature(value)
+        return (time.perf_counter() - started) * 1000
+
+
+def _hex(raw: bytes) -> str:
+    """bytea in COPY text format"""
+    return '\\\\x' + raw.hex()
+
+
+def _mb(size: int) -> str:
+    return f'{size / 1024 / 1024:.1f} MB'
@@ -0,0 +1,199 @@
+# systems/management/commands/chaos_failover.py
+from django.core.management.base import BaseCommand, CommandError
+import asyncio
+import time
+import uuid
+from collections import Counter
+from types import SimpleNamespace
+from systems.event_handler import EventHandler
+from systems.management.commands.bench_decoder import RECORDED_EVENTS
+from systems.utils.capture import read_capture
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RecordingSink:
+    """Stands in for Celery/Postgres: remembers which replica published which event"""
+
+    def __init__(self, replica_id: str, published: Counter, publishers: Counter):
+        self.replica_id = replica_id
+        self.published = published
+        self.publishers = publishers
+        self.stats = {'creates': 0, 'trades': 0, 'batches': 0}
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def write_creates(self, events: list):
+        self._record(events, 'creates')
+        await asyncio.sleep(0)
+
+    async def write_trades(self, events: list):
+        self._record(events, 'trades')
+        await asyncio.sleep(0)
+
+    def _record(self, events: list, kind: str):
+        self.published.update(EventHandler.event_key(e['signature'], e.get('event_index', 0)) for e in events)
+        self.publishers[self.replica_id] += len(events)
+        self.stats[kind] += len(events)
+        self.stats['batches'] += 1
+
+
+class Replica:
+    def __init__(self, handler: EventHandler):
+        self.handler = handler
+        self.tasks = []
+        self.alive = True
+
+    @property
+    def name(self):
+        return self.handler.replica_id
+
+    def start(self):
+        self.tasks = [
+            asyncio.create_task(self.handler.elector.run()),
+            asyncio.create_task(self.handler.periodic_batch_check()),
+        ]
+
+    def kill(self):
+        """Crash: stop everything without resigning the lease or flushing"""
+        self.alive = False
+        for task in self.tasks:
+            task.cancel()
+
+
+class Command(BaseCommand):
+    help = 'Chaos drill: run listener replicas with leader election, kill the leader mid-stream, check nothing is lost'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--replicas', type=int, default=3, help='Replicas subscribed to the same stream')
+        parser.add_argument('--kills', type=int, default=1, help='Leaders killed during the stream')
+        parser.add_argument('--events', type=int, default=5000, help='Notifications in the stream')
+        parser.add_argument('--rate', type=float, default=500, help='Notifications per second')
+        parser.add_argument('--lease-ttl', type=float, default=2, help='Leader lease TTL in seconds')
+        parser.add_argument('--batch-size', type=int, default=50, help='Events per batch')
+        parser.add_argument('--batch-delay', type=float, default=0.2, help='Seconds before a partial batch is sent')
+        parser.add_argument('--capture', type=str, default=None,
+                            help='Use notifications from a run_listener --record capture instead of synthetic trades')
+
+    def handle(self, *args, **options):
+        if options['kills'] >= options['replicas']:
+            raise CommandError('--kills must leave at least one replica alive')
+        self.options = options
+        missing, duplicated = asyncio.run(self.run_drill())
+        if missing or duplicated:
+            raise CommandError(f'Failover lost {missing} and duplicated {duplicated} events')
+        self.stdout.write(self.style.SUCCESS('No events lost or published twice'))
+
+    def stream(self) -> list:
+        if self.options['capture']:
+            return [value for _, _, value in read_capture(self.options['capture'])][:self.options['events']]
+        trades = [RECORDED_EVENTS['PurchasedToken'][1], RECORDED_EVENTS['SoldToken'][1]]
+        run = uuid.uuid4().hex[:8]
+        return [
+            SimpleNamespace(signature=f"chaos-{run}-{i}", logs=[trades[i % 2]], err=None)
+            for i in range(self.options['events'])
+        ]
+
+    def build_replicas(self, published: Counter, publishers: Counter) -> list:
+        run = uuid.uuid4().hex[:12]
+        replicas = []
+        for index in range(self.options['replicas']):
+            replica_id = f"replica-{index}"
+            handler = EventHandler(
+                batch_size=self.options['batch_size'],
+                batch_delay=self.options['batch_delay'],
+                sink=RecordingSink(replica_id, published, publishers),
+                fetch_metadata=False,
+                replica_id=replica_id,
+                lease_ttl=self.options['lease_ttl'],
+            )
+            # Private lease and dedup namespace, so a running listener is never disturbed
+            handler.elector.lease.key = f"chaos:{run}:leader"
+            handler.create_dedup.key_prefix = f"chaos:{run}:"
+            handler.trade_dedup.key_prefix = f"chaos:{run}:"
+            replicas.append(Replica(handler))
+        return replicas
+
+    async def run_drill(self):
+        published, publishers = Counter(), Counter()
+        stream = self.stream()
+        replicas = self.build_replicas(published, publishers)
+        for replica in replicas:
+            await replica.handler.elector.step()
+            replica.start()
+
+        kills = self.options['kills']
+        kill_points = {int(len(stream) * (k + 1) / (kills + 1)) for k in range(kills)}
+        interval = 1 / self.options['rate'] if self.options['rate'] > 0 else 0
+        failovers = []
+        start = time.monotonic()
+
+        for index, value in enumerate(stream):
+            if index in kill_points:
+                failovers.append(asyncio.create_task(self.kill_leader(replicas)))
+                await asyncio.sleep(0)
+            # Every live replica is subscribed to the same feed
+            for replica in replicas:
+                if replica.alive:
+                    await replica.handler.process_event(value)
+            delay = start + (index + 1) * interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        failover_times = await asyncio.gather(*failovers)
+        # Let the current leader flush what it holds, then shut down cleanly
+        leader = await self.wait_for_leader(replicas)
+        await leader.handler._process_create_batch()
+        await leader.handler._process_trade_batch()
+        for replica in replicas:
+            if replica.alive:
+                replica.kill()
+                await replica.handler.elector.resign()
+
+        expected_keys = self.expected_keys(replicas[0].handler, stream)
+        missing = len(expected_keys - set(published))
+        duplicated = sum(count - 1 for count in published.values() if count > 1)
+
+        self.stdout.write(
+            f'Stream:     {len(stream)} notifications, {len(expected_keys)} events in {time.monotonic() - start:.1f}s\n'
+            f'Failovers:  {", ".join(f"{t:.2f}s" for t in failover_times) or "none"}\n'
+            f'Publishers: {", ".join(f"{name}={count}" for name, count in sorted(publishers.items()))}\n'
+            f'Published:  {len(published)} unique, {missing} missing, {duplicated} duplicates'
+        )
+        return missing, duplicated
+
+    @staticmethod
+    def expected_keys(handler: EventHandler, stream: list) -> set:
+        keys = set()
+        for value in stream:
+            trade_index = 0
+            for event_type, _ in handler.registry.decode_logs(value.logs):
+                if event_type == "CreateToken":
+                    keys.add(value.signature)
+                else:
+                    keys.add(handler.event_key(value.signature, trade_index))
+                    trade_index += 1
+        return keys
+
+    async def wait_for_leader(self, replicas: list) -> Replica:
+        while True:
+            for replica in replicas:
+                if replica.alive and replica.handler.is_publisher():
+                    return replica
+            await asyncio.sleep(0.05)
+
+    async def kill_leader(self, replicas: list) -> float:
+        """Kill the current leader; returns seconds until a survivor took over"""
+        leader = await self.wait_for_leader(replicas)
+        leader.kill()
+        killed_at = time.monotonic()
+        self.stdout.write(self.style.WARNING(f'Killed leader {leader.name}'))
+        survivor = await self.wait_for_leader(replicas)
+        took = time.monotonic() - killed_at
+        self.stdout.write(self.style.WARNING(f'{survivor.name} took over after {took:.2f}s'))
+        return took
@@ -0,0 +1,63 @@
+# systems/management/commands/manage_partitions.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from systems.utils.partitioning import (
+    PARTITIONED_MODELS, list_partitions, cold_partitions, ensure_partitions, archive_cold_partitions,
+)
+
+
+class Command(BaseCommand):
+    help = 'Pre-create monthly partitions of Trade/TraderHistory/CoinHistory and archive cold ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=settings.PARTITION_PREMAKE_MONTHS,
+            help='Months of partitions to create after the current one'
+        )
+        parser.add_argument(
+            '--archive',
+            action='store_true',
+            help='Detach partitions older than --keep-months, export them to --archive-dir and drop them'
+        )
+        parser.add_argument(
+            '--keep-months',
+            type=int,
+            default=settings.PARTITION_RETENTION_MONTHS,
+            help='Full months kept in the database before a partition is archived'
+        )
+        parser.add_argument(
+            '--archive-dir',
+            type=str,
+            default=settings.PARTITION_ARCHIVE_DIR,
+            help='Directory for <table>/<partition>.csv.gz exports'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only list partitions and what would be archived'
+        )
+
+    def handle(self, *args, **options):
+        if not options['dry_run']:
+            created = ensure_partitions(options['months_ahead'])
+            for name in created:
+                self.stdout.write(self.style.SUCCESS(f'Created {name}'))
+
+        if options['archive']:
+            if options['keep_months'] <= 0:
+                self.stdout.write(self.style.WARNING('--keep-months is 0, nothing is archived'))
+            elif options['dry_run']:
+                for model in PARTITIONED_MODELS:
+                    for name, lower, upper, estimate in cold_partitions(model, options['keep_months']):
+                        self.stdout.write(f'Would archive {name} (~{estimate} rows)')
+            else:
+                for name, path, rows in archive_cold_partitions(options['keep_months'], options['archive_dir']):
+                    self.stdout.write(self.style.SUCCESS(f'Archived {name}: {rows} rows -> {path}'))
+
+        for model in PARTITIONED_MODELS:
+            partitions = list_partitions(model)
+            self.stdout.write(f'\n{model._meta.db_table}: {len(partitions)} monthly partitions')
+            for name, lower, upper, estimate in partitions:
+                self.stdout.write(f'  {name:<36}{lower} .. {upper}  ~{estimate} rows')
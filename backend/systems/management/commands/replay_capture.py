@@ -0,0 +1,244 @@
+# systems/management/commands/replay_capture.py
+from django.core.management.base import BaseCommand
+from asgiref.sync import sync_to_async
+import asyncio
+import hashlib
+import time
+import uuid
+from systems.event_handler import EventHandler
+from systems.models import Coin, Trade, UserCoinHoldings
+from systems.sinks import PostgresCopySink, InlineTaskSink
+from systems.utils.capture import read_capture
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Columns compared between runs; wall-clock defaults (Coin.created_at/updated) are left out
+CHECKSUM_COLUMNS = {
+    Coin: ('address', 'creator_id', 'total_supply', 'current_price', 'ath', 'total_held', 'score'),
+    Trade: ('transaction_hash', 'event_index', 'user_id', 'coin_id', 'trade_type', 'coin_amount', 'sol_amount',
+            'created_at', 'trading_fee'),
+    UserCoinHoldings: ('user_id', 'coin_id', 'amount_held'),
+}
+
+
+def table_checksums() -> dict:
+    """Row count and md5 of the checksum columns of every ingest table, in column order"""
+    checksums = {}
+    for model, columns in CHECKSUM_COLUMNS.items():
+        digest = hashlib.md5()
+        count = 0
+        for row in model.objects.order_by(*columns[:2]).values_list(*columns).iterator(chunk_size=5000):
+            digest.update(repr(row).encode())
+            count += 1
+        checksums[model._meta.db_table] = (count, digest.hexdigest())
+    return checksums
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+class LatencyProbe:
+    """
+    Wraps the replay sink and records, per written event, the time from
+    feeding its notification to the handler until its batch returned.
+    """
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.stats = sink.stats
+        self.fed_at = {}  # signature -> monotonic feed time
+        self.latencies = []
+
+    async def start(self):
+        await self.sink.start()
+
+    async def close(self):
+        await self.sink.close()
+
+    async def write_creates(self, events: list):
+        await self.sink.write_creates(events)
+        self._observe(events)
+
+    async def write_trades(self, events: list):
+        await self.sink.write_trades(events)
+        self._observe(events)
+
+    def _observe(self, events: list):
+        now = time.monotonic()
+        for event_data in events:
+            self.latencies.append(now - self.fed_at[event_data['signature']])
+
+
+class Command(BaseCommand):
+    help = 'Replay a recorded listener capture through the event handler and report ingest performance'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'capture',
+            type=str,
+            help='Capture file written by run_listener --record'
+        )
+        parser.add_argument(
+            '--speed',
+            type=float,
+            default=1.0,
+            help='Replay speed relative to the recorded arrival times (0 = as fast as possible)'
+        )
+        parser.add_argument(
+            '--sink',
+            type=str,
+            default='inline',
+            choices=['inline', 'direct', 'celery'],
+            help='inline: run the batch tasks in-process; direct: COPY into Postgres; '
+                 'celery: publish tasks (latency then ends at publish)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Number of events before forcing batch processing'
+        )
+        parser.add_argument(
+            '--batch-delay',
+            type=float,
+            default=0.5,
+            help='Seconds to wait before processing batch'
+        )
+        parser.add_argument(
+            '--decode-workers',
+            type=int,
+            default=1,
+            help='Workers decoding notifications (more than one may reorder events within a batch)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Replay only the first N notifications'
+        )
+        parser.add_argument(
+            '--fetch-metadata',
+            action='store_true',
+            help='Fetch IPFS metadata for creates (off by default so runs are repeatable offline)'
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        speed = options['speed']
+        self.stdout.write(self.style.SUCCESS(
+            f'\n{"="*60}\n'
+            f'Replaying {options["capture"]}\n'
+            f'{"="*60}\n'
+            f'Speed:         {f"{speed:g}x" if speed > 0 else "max"}\n'
+            f'Sink:          {options["sink"]}\n'
+            f'Batch Size:    {options["batch_size"]}\n'
+            f'Batch Delay:   {options["batch_delay"]}s\n'
+            f'{"="*60}\n'
+        ))
+        asyncio.run(self.run_replay())
+
+    def build_handler(self):
+        sink = None
+        if self.options['sink'] == 'inline':
+            sink = InlineTaskSink()
+        elif self.options['sink'] == 'direct':
+            sink = PostgresCopySink()
+        probe = LatencyProbe(sink) if sink else None
+
+        handler = EventHandler(
+            batch_size=self.options['batch_size'],
+            batch_delay=self.options['batch_delay'],
+            decode_workers=self.options['decode_workers'],
+            sink=probe,
+            fetch_metadata=self.options['fetch_metadata'],
+        )
+        # Fresh Redis claims per run, otherwise a second replay would be dropped as duplicates
+        run_prefix = f"replay:{uuid.uuid4().hex[:12]}:"
+        handler.create_dedup.key_prefix = run_prefix
+        handler.trade_dedup.key_prefix = run_prefix
+        return handler, probe
+
+    async def feed(self, handler: EventHandler, probe: LatencyProbe | None) -> int:
+        """Enqueue the capture at the requested speed; returns notifications fed"""
+        speed = self.options['speed']
+        limit = self.options['limit']
+        first_ts = None
+        start = time.monotonic()
+        fed = 0
+
+        for ts, slot, value in read_capture(self.options['capture']):
+            if limit is not None and fed >= limit:
+                break
+            if speed > 0:
+                if first_ts is None:
+                    first_ts = ts
+                delay = (ts - first_ts) / speed - (time.monotonic() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            if probe and value.signature:
+                probe.fed_at.setdefault(value.signature, time.monotonic())
+            await handler.enqueue_event(value)
+            fed += 1
+        return fed
+
+    @staticmethod
+    async def flush_batches(handler: EventHandler, done: asyncio.Event):
+        """periodic_batch_check that stops between batches, so no write is cancelled halfway"""
+        while not done.is_set():
+            await asyncio.sleep(handler.batch_delay)
+            await handler._check_create_batch()
+            await handler._check_trade_batch()
+
+    async def run_replay(self):
+        handler, probe = self.build_handler()
+        done = asyncio.Event()
+        try:
+            if handler.sink:
+                await handler.sink.start()
+            handler.start_workers()
+            flusher = asyncio.create_task(self.flush_batches(handler, done))
+
+            start = time.monotonic()
+            fed = await self.feed(handler, probe)
+            await handler.stop_workers()
+            done.set()
+            await flusher
+            await handler._process_create_batch()
+            await handler._process_trade_batch()
+            elapsed = time.monotonic() - start
+        finally:
+            done.set()
+            await handler.stop_workers()
+            if handler.sink:
+                await handler.sink.close()
+            await handler.close_ipfs_session()
+
+        self.report(fed, elapsed, probe)
+        unpublished = len(handler.create_queue) + len(handler.trade_queue)
+        if unpublished:
+            self.stdout.write(self.style.ERROR(f'{unpublished} events could not be published (see the log)'))
+        checksums = await sync_to_async(table_checksums, thread_sensitive=True)()
+        for table, (count, digest) in checksums.items():
+            self.stdout.write(f'{table:<28}{count:>10} rows  {digest}')
+
+    def report(self, fed: int, elapsed: float, probe: LatencyProbe | None):
+        elapsed = max(elapsed, 1e-9)
+        self.stdout.write(self.style.SUCCESS(
+            f'Replayed {fed} notifications in {elapsed:.2f}s ({fed / elapsed:.0f} notifications/s)'
+        ))
+        if probe is None:
+            self.stdout.write('Latency is only measured with --sink=inline or --sink=direct')
+            return
+
+        written = probe.stats.get('creates', probe.stats.get('coins', 0)) + probe.stats['trades']
+        latencies = sorted(probe.latencies)
+        self.stdout.write(
+            f'Events written: {written} ({written / elapsed:.0f} events/s) in {probe.stats["batches"]} batches\n'
+            f'Latency:        p50 {percentile(latencies, 0.5) * 1000:.1f}ms  '
+            f'p99 {percentile(latencies, 0.99) * 1000:.1f}ms  '
+            f'max {(latencies[-1] if latencies else 0) * 1000:.1f}ms'
+        )
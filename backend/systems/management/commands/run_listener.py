@@ -1,7 +1,12 @@
 # systems/management/commands/run_listener.py
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
 import asyncio
+import os
+import socket
 from systems.event_handler import EventHandler, CreateEventHandler, TradeEventHandler
+from systems.utils.batching import AdaptiveBatchController
+from systems.sinks import PostgresCopySink
 import logging
 
 logging.basicConfig(
@@ -38,12 +43,184 @@ class Command(BaseCommand):
             action='store_true',
             help='Disable batching (process events immediately)'
         )
+        parser.add_argument(
+            '--sink',
+            type=str,
+            default='celery',
+            choices=['celery', 'direct'],
+            help='celery: publish batch tasks; direct: COPY batches into Postgres from the listener'
+        )
+        parser.add_argument(
+            '--sink-pool-size',
+            type=int,
+            default=4,
+            help='Postgres connections used by --sink=direct'
+        )
+        parser.add_argument(
+            '--adaptive',
+            action='store_true',
+            help='Adapt batch size and delay to Celery backlog (--batch-size/--batch-delay are ignored)'
+        )
+        parser.add_argument(
+            '--min-batch-size',
+            type=int,
+            default=10,
+            help='Smallest adaptive batch size'
+        )
+        parser.add_argument(
+            '--max-batch-size',
+            type=int,
+            default=500,
+            help='Largest adaptive batch size'
+        )
+        parser.add_argument(
+            '--min-batch-delay',
+            type=float,
+            default=0.05,
+            help='Shortest adaptive flush interval in seconds'
+        )
+        parser.add_argument(
+            '--max-batch-delay',
+            type=float,
+            default=2.0,
+            help='Longest adaptive flush interval in seconds (latency bound)'
+        )
+        parser.add_argument(
+            '--metrics-port',
+            type=int,
+            default=settings.METRICS_PORT,
+            help='Serve /metrics (Prometheus) and /metrics.json on this local port (0 disables)'
+        )
+        parser.add_argument(
+            '--ha',
+            action='store_true',
+            help='Run as one of several replicas; the holder of a Redis lease publishes, the rest stand by'
+        )
+        parser.add_argument(
+            '--replica-id',
+            type=str,
+            default=os.getenv('LISTENER_REPLICA_ID') or socket.gethostname(),
+            help='Unique, stable id of this replica (lease owner, spool subdirectory)'
+        )
+        parser.add_argument(
+            '--lease-ttl',
+            type=float,
+            default=5,
+            help='Seconds before a crashed leader is replaced'
+        )
+        parser.add_argument(
+            '--standby-buffer',
+            type=int,
+            default=20000,
+            help='Unpublished events a standby keeps per queue for a takeover'
+        )
+        parser.add_argument(
+            '--provisional',
+            action='store_true',
+            help='Also subscribe at processed commitment and broadcast events before they are confirmed'
+        )
+        parser.add_argument(
+            '--provisional-timeout',
+            type=float,
+            default=60,
+            help='Seconds a provisional event may wait for confirmation before it is rolled back'
+        )
+        parser.add_argument(
+            '--record',
+            type=str,
+            default=None,
+            help='Append every received notification to this gzip JSONL capture (replay with replay_capture)'
+        )
+        parser.add_argument(
+            '--ws-urls',
+            type=str,
+            default=None,
+            help='Comma separated WebSocket RPC URLs; more than one enables fan-in (default: RPC_WS_URLS)'
+        )
+        parser.add_argument(
+            '--stall-timeout',
+            type=float,
+            default=30,
+            help='Seconds a fan-in connection may go quiet while its peers deliver'
+        )
+        parser.add_argument(
+            '--queue-size',
+            type=int,
+            default=1000,
+            help='Raw notifications buffered before the websocket reader waits (backpressure)'
+        )
+        parser.add_argument(
+            '--decode-workers',
+            type=int,
+            default=1,
+            help='Workers decoding notifications (more than one may reorder events within a batch)'
+        )
+        parser.add_argument(
+            '--enrich-workers',
+            type=int,
+            default=4,
+            help='Workers fetching IPFS metadata for creates'
+        )
+        parser.add_argument(
+            '--spool-dir',
+            type=str,
+            default=settings.LISTENER_SPOOL_DIR,
+            help='Directory where batches are spooled until Celery accepts them'
+        )
+        parser.add_argument(
+            '--no-spool',
+            action='store_true',
+            help='Keep pending batches in memory only (lost if the listener crashes)'
+        )
 
     def handle(self, *args, **options):
         mode = options['mode']
         batch_size = options['batch_size']
         batch_delay = options['batch_delay']
         enable_batching = not options['no_batching']
+        ws_urls = (
+            [url.strip() for url in options['ws_urls'].split(',') if url.strip()]
+            if options['ws_urls'] else settings.RPC_WS_URLS
+        )
+        handler_kwargs = dict(
+            batch_size=batch_size,
+            batch_delay=batch_delay,
+            enable_batching=enable_batching,
+            ws_urls=ws_urls,
+            stall_timeout=options['stall_timeout'],
+            queue_size=options['queue_size'],
+            decode_workers=options['decode_workers'],
+            enrich_workers=options['enrich_workers'],
+            spool_dir=None if options['no_spool'] else options['spool_dir'],
+            metrics_port=options['metrics_port'] or None,
+            capture_path=options['record'],
+            provisional_timeout=options['provisional_timeout'] if options['provisional'] else None,
+        )
+        if options['ha']:
+            if not enable_batching:
+                raise CommandError('--ha needs batching (standby replicas buffer batches)')
+            handler_kwargs.update(
+                replica_id=options['replica_id'],
+                lease_ttl=options['lease_ttl'],
+                standby_buffer=options['standby_buffer'],
+            )
+        if options['sink'] == 'direct':
+            handler_kwargs['sink'] = PostgresCopySink(pool_size=options['sink_pool_size'])
+        if options['adaptive']:
+            handler_kwargs['batch_controller'] = AdaptiveBatchController(
+                min_batch_size=options['min_batch_size'],
+                max_batch_size=options['max_batch_size'],
+                min_delay=options['min_batch_delay'],
+                max_delay=options['max_batch_delay'],
+            )
+            batch_size = f'adaptive {options["min_batch_size"]}-{options["max_batch_size"]}'
+            batch_delay = f'adaptive {options["min_batch_delay"]}-{options["max_batch_delay"]}'
+        provisional = (
+            f'processed, rollback after {options["provisional_timeout"]:g}s' if options['provisional'] else 'Disabled'
+        )
+        metrics_address = (
+            f'{settings.METRICS_HOST}:{options["metrics_port"]}' if options['metrics_port'] else 'Disabled'
+        )
 
         self.stdout.write(self.style.SUCCESS(
             f'\n{"="*60}\n'
@@ -51,36 +228,32 @@ class Command(BaseCommand):
             f'{"="*60}\n'
             f'Mode:          {mode}\n'
             f'Batching:      {"Enabled" if enable_batching else "Disabled"}\n'
+            f'Sink:          {options["sink"]}\n'
+            f'Provisional:   {provisional}\n'
+            f'Replica:       {options["replica_id"] + " (leader election)" if options["ha"] else "Single"}\n'
+            f'Metrics:       {metrics_address}\n'
             f'Batch Size:    {batch_size}\n'
             f'Batch Delay:   {batch_delay}s\n'
+            f'Workers:       {options["decode_workers"]} decode / {options["enrich_workers"]} enrich\n'
+            f'Endpoints:     {len(ws_urls)}{" (fan-in)" if len(ws_urls) > 1 else ""}\n'
+            f'Spool:         {handler_kwargs["spool_dir"] or "Disabled"}\n'
+            f'Recording:     {options["record"] or "Disabled"}\n'
             f'{"="*60}\n'
         ))
 
         # Choose handler based on mode
         if mode == 'creates':
-            handler = CreateEventHandler(
-                batch_size=batch_size,
-                batch_delay=batch_delay,
-                enable_batching=enable_batching
-            )
+            handler = CreateEventHandler(**handler_kwargs)
             self.stdout.write(self.style.SUCCESS(
                 '📝 Processing CREATE events only\n'
             ))
         elif mode == 'trades':
-            handler = TradeEventHandler(
-                batch_size=batch_size,
-                batch_delay=batch_delay,
-                enable_batching=enable_batching
-            )
+            handler = TradeEventHandler(**handler_kwargs)
             self.stdout.write(self.style.SUCCESS(
                 '💱 Processing TRADE events only (BUY/SELL)\n'
             ))
         else:
-            handler = EventHandler(
-                batch_size=batch_size,
-                batch_delay=batch_delay,
-                enable_batching=enable_batching
-            )
+            handler = EventHandler(**handler_kwargs)
             self.stdout.write(self.style.SUCCESS(
                 '🌐 Processing ALL event types\n'
             ))
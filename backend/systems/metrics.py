@@ -0,0 +1,377 @@
+# systems/metrics.py
+"""
+Minimal metrics layer for the ingest path.
+
+Metrics live in a process-wide registry and are served by MetricsServer
+as Prometheus text (/metrics) and JSON (/metrics.json). Celery workers
+have no server of their own: SharedHistogram aggregates their
+observations in Redis and the listener's server exports them.
+"""
+import asyncio
+import bisect
+import json
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+DECODE_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005)
+LAG_BUCKETS = (0.5, 1, 2, 5, 10, 30, 60, 300, 900, 3600)
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+def _label_key(labelnames, labels: dict) -> tuple:
+    return tuple(str(labels.get(name, '')) for name in labelnames)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, key, extra=None) -> str:
+    pairs = list(zip(labelnames, key)) + list(extra or [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def total(self) -> float:
+        return sum(self.values.values())
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield self.name, self.labelnames, key, value, None
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        self.values[_label_key(self.labelnames, labels)] = value
+
+
+class CallbackGauge:
+    """Gauge whose values are read from `callback` at scrape time: [(labels, value), ...]"""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames, callback):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def samples(self):
+        try:
+            values = list(self.callback())
+        except Exception as e:
+            logger.debug(f"Metric callback {self.name} failed: {e}")
+            return
+        for labels, value in values:
+            if isinstance(value, (int, float)):
+                yield self.name, self.labelnames, _label_key(self.labelnames, labels), value, None
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.values = {}  # label key -> [per-bucket counts (+Inf last), sum]
+
+    def observe(self, value, **labels):
+        self.observe_many([value], **labels)
+
+    def observe_many(self, values, **labels):
+        if not values:
+            return
+        entry = self.values.setdefault(
+            _label_key(self.labelnames, labels), [[0] * (len(self.buckets) + 1), 0.0]
+        )
+        for value in values:
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _entries(self):
+        return self.values.items()
+
+    def samples(self):
+        for key, (counts, total) in self._entries():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield f"{self.name}_bucket", self.labelnames, key, cumulative, ('le', le)
+            yield f"{self.name}_sum", self.labelnames, key, total, None
+            yield f"{self.name}_count", self.labelnames, key, cumulative, None
+
+
+def _read_hash(name, redis_key):
+    """HGETALL of a shared metric's hash; None when the cache is not Redis"""
+    client = SharedHistogram._redis()
+    if client is None:
+        return None
+    try:
+        return client.hgetall(redis_key)
+    except Exception as e:
+        logger.debug(f"Could not read {name}: {e}")
+        return {}
+
+
+class SharedHistogram(Histogram):
+    """
+    Histogram aggregated in Redis so observations from any process
+    (Celery workers) are exported by whichever process serves metrics.
+    Falls back to in-process storage when the cache is not Redis.
+    Scrapes render the hash read by the last collect() (blocking; the
+    server runs it in a worker thread).
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames, buckets)
+        self.redis_key = f"metrics:{name}"
+        self.fields = None  # Redis hash as of the last collect(), None without Redis
+
+    @staticmethod
+    def _redis():
+        try:
+            from django_redis import get_redis_connection
+            return get_redis_connection('default')
+        except Exception:
+            return None
+
+    def observe_many(self, values, **labels):
+        if not values:
+            return
+        client = self._redis()
+        if client is None:
+            return super().observe_many(values, **labels)
+
+        key = json.dumps(_label_key(self.labelnames, labels))
+        counts = {}
+        for value in values:
+            index = bisect.bisect_left(self.buckets, value)
+            counts[index] = counts.get(index, 0) + 1
+        try:
+            pipe = client.pipeline(transaction=False)
+            for index, count in counts.items():
+                pipe.hincrby(self.redis_key, f"{key}|{index}", count)
+            pipe.hincrbyfloat(self.redis_key, f"{key}|sum", sum(values))
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"Could not record {self.name}: {e}")
+
+    def collect(self):
+        self.fields = _read_hash(self.name, self.redis_key)
+
+    def _entries(self):
+        if self.fields is None:
+            return super()._entries()
+
+        entries = {}
+        for field, value in self.fields.items():
+            label_json, _, slot = field.decode().rpartition('|')
+            key = tuple(json.loads(label_json))
+            entry = entries.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0])
+            if slot == 'sum':
+                entry[1] = float(value)
+            else:
+                entry[0][int(slot)] = int(value)
+        return entries.items()
+
+
+class SharedCounter(Counter):
+    """Counter aggregated in Redis, like SharedHistogram (falls back to in-process)"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.redis_key = f"metrics:{name}"
+        self.fields = None
+
+    def inc(self, amount=1, **labels):
+        client = SharedHistogram._redis()
+        if client is None:
+            return super().inc(amount, **labels)
+        try:
+            client.hincrbyfloat(self.redis_key, json.dumps(_label_key(self.labelnames, labels)), amount)
+        except Exception as e:
+            logger.debug(f"Could not record {self.name}: {e}")
+
+    def collect(self):
+        self.fields = _read_hash(self.name, self.redis_key)
+
+    def samples(self):
+        if self.fields is None:
+            yield from super().samples()
+            return
+        for field, value in self.fields.items():
+            yield self.name, self.labelnames, tuple(json.loads(field)), float(value), None
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+        self._rates = {}  # rate gauge name -> (counter, window, deque of (time, total))
+
+    def _register(self, metric):
+        # Re-registering a name (a new handler instance) replaces the old metric
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.metrics.get(name) or self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.metrics.get(name) or self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.metrics.get(name) or self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def shared_histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.metrics.get(name) or self._register(SharedHistogram(name, documentation, labelnames, buckets))
+
+    def shared_counter(self, name, documentation, labelnames=()):
+        return self.metrics.get(name) or self._register(SharedCounter(name, documentation, labelnames))
+
+    def callback(self, name, documentation, labelnames, callback):
+        return self._register(CallbackGauge(name, documentation, labelnames, callback))
+
+    def rate(self, name, documentation, counter: Counter, window: float = 10):
+        """Per-second rate of `counter` over the last `window` seconds (needs sample_rates())"""
+        samples = deque()
+        self._rates[name] = (counter, window, samples)
+
+        def current():
+            if len(samples) < 2:
+                return []
+            (t0, v0), (t1, v1) = samples[0], samples[-1]
+            return [({}, (v1 - v0) / (t1 - t0) if t1 > t0 else 0.0)]
+
+        return self.callback(name, documentation, (), current)
+
+    def sample_rates(self):
+        now = time.monotonic()
+        for counter, window, samples in self._rates.values():
+            samples.append((now, counter.total()))
+            while samples and now - samples[0][0] > window:
+                samples.popleft()
+
+    def collect(self):
+        """Read every shared metric from Redis (blocking); call before rendering"""
+        for metric in list(self.metrics.values()):
+            if hasattr(metric, 'collect'):
+                metric.collect()
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labelnames, key, value, extra in metric.samples():
+                lines.append(f"{name}{_format_labels(labelnames, key, [extra] if extra else None)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def as_dict(self) -> dict:
+        output = {}
+        for metric in self.metrics.values():
+            series = []
+            for name, labelnames, key, value, extra in metric.samples():
+                labels = dict(zip(labelnames, key))
+                if extra:
+                    labels[extra[0]] = extra[1]
+                series.append({'name': name, 'labels': labels, 'value': value})
+            output[metric.name] = {'type': metric.kind, 'help': metric.documentation, 'series': series}
+        return output
+
+
+registry = MetricsRegistry()
+
+# Ingest path metrics (handler/listener state is added as callback gauges
+# by EventHandler.register_metrics)
+LISTENER_MESSAGES = registry.counter(
+    'listener_messages_total', 'Log notifications received, per websocket endpoint and commitment',
+    ['endpoint', 'commitment'])
+registry.rate(
+    'listener_messages_per_second', 'Log notifications per second over the last 10s', LISTENER_MESSAGES)
+DECODE_SECONDS = registry.histogram(
+    'decode_seconds', 'Time to decode the events of one notification', buckets=DECODE_BUCKETS)
+BATCH_SIZE = registry.histogram(
+    'batch_size', 'Events per published batch', ['kind'], buckets=SIZE_BUCKETS)
+PUBLISH_SECONDS = registry.histogram(
+    'publish_seconds', 'Time to hand a batch to Celery or the direct sink', ['kind', 'sink'])
+DEDUP_LOOKUPS = registry.counter(
+    'dedup_lookups_total', 'Dedup checks by layer (local LRU, Redis claim) and result', ['kind', 'layer', 'result'])
+IPFS_FETCH_SECONDS = registry.histogram(
+    'ipfs_fetch_seconds', 'IPFS gateway response time', ['gateway', 'result'])
+TASK_DURATION = registry.shared_histogram(
+    'batch_task_duration_seconds', 'Duration of process_*_batch tasks', ['task'])
+PROMOTION_SECONDS = registry.histogram(
+    'provisional_promotion_seconds', 'Processed to confirmed notification delay', buckets=LAG_BUCKETS)
+COMMIT_LAG = registry.shared_histogram(
+    'commit_lag_seconds', 'On-chain event timestamp to database commit', ['kind'], buckets=LAG_BUCKETS)
+PARKED_TRADES = registry.shared_counter(
+    'parked_trades_total', 'Trades parked until their coin exists, and released', ['result'])
+
+
+class MetricsServer:
+    """Serves the registry on a local port: /metrics (Prometheus text) and /metrics.json"""
+
+    def __init__(self, host='127.0.0.1', port=9108, metrics_registry=registry):
+        self.host = host
+        self.port = port
+        self.registry = metrics_registry
+        self.runner = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/metrics', self.prometheus)
+        app.router.add_get('/metrics.json', self.json)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def sample_rates(self, interval: float = 1.0):
+        while True:
+            self.registry.sample_rates()
+            await asyncio.sleep(interval)
+
+    async def prometheus(self, request):
+        await asyncio.to_thread(self.registry.collect)
+        return web.Response(text=self.registry.render_prometheus(), content_type='text/plain', charset='utf-8')
+
+    async def json(self, request):
+        await asyncio.to_thread(self.registry.collect)
+        return web.json_response(self.registry.as_dict())
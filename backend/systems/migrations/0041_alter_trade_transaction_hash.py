@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('systems', '0040_developerscore_is_active'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trade',
+            name='transaction_hash',
+            field=models.CharField(max_length=96, primary_key=True, serialize=False, unique=True),
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('systems', '0041_alter_trade_transaction_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoinStatsBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('volume', models.DecimalField(decimal_places=9, default=0, max_digits=24)),
+                ('trades', models.IntegerField(default=0)),
+                ('open_price', models.DecimalField(decimal_places=10, max_digits=24)),
+                ('high_price', models.DecimalField(decimal_places=10, max_digits=24)),
+                ('low_price', models.DecimalField(decimal_places=10, max_digits=24)),
+                ('close_price', models.DecimalField(decimal_places=10, max_digits=24)),
+                ('open_at', models.DateTimeField()),
+                ('close_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='coin',
+            name='atl',
+            field=models.DecimalField(blank=True, decimal_places=8, max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='coin',
+            name='change_1h',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=16),
+        ),
+        migrations.AddField(
+            model_name='coin',
+            name='change_5m',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=16),
+        ),
+        migrations.AddField(
+            model_name='coin',
+            name='stats_updated',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='coin',
+            name='trades_1h',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='coin',
+            name='trades_24h',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='coin',
+            name='trades_5m',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='coin',
+            name='volume_1h',
+            field=models.DecimalField(decimal_places=9, default=0, max_digits=24),
+        ),
+        migrations.AddField(
+            model_name='coin',
+            name='volume_24h',
+            field=models.DecimalField(decimal_places=9, default=0, max_digits=24),
+        ),
+        migrations.AddField(
+            model_name='coin',
+            name='volume_5m',
+            field=models.DecimalField(decimal_places=9, default=0, max_digits=24),
+        ),
+        migrations.AddIndex(
+            model_name='coin',
+            index=models.Index(fields=['volume_24h'], name='idx_coin_volume_24h'),
+        ),
+        migrations.AddIndex(
+            model_name='coin',
+            index=models.Index(fields=['change'], name='idx_coin_change'),
+        ),
+        migrations.AddIndex(
+            model_name='coin',
+            index=models.Index(fields=['current_marketcap'], name='idx_coin_marketcap'),
+        ),
+        migrations.AddField(
+            model_name='coinstatsbucket',
+            name='coin',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats_buckets', to='systems.coin'),
+        ),
+        migrations.AddIndex(
+            model_name='coinstatsbucket',
+            index=models.Index(fields=['bucket'], name='systems_coi_bucket_82b4bb_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='coinstatsbucket',
+            unique_together={('coin', 'bucket')},
+        ),
+    ]
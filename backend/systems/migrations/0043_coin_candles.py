@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('systems', '0042_coin_market_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoinCandle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('1m', '1m'), ('5m', '5m'), ('1h', '1h'), ('1d', '1d')], max_length=2)),
+                ('bucket', models.DateTimeField()),
+                ('volume', models.DecimalField(decimal_places=9, default=0, max_digits=24)),
+                ('trades', models.IntegerField(default=0)),
+                ('open_price', models.DecimalField(decimal_places=10, max_digits=24)),
+                ('high_price', models.DecimalField(decimal_places=10, max_digits=24)),
+                ('low_price', models.DecimalField(decimal_places=10, max_digits=24)),
+                ('close_price', models.DecimalField(decimal_places=10, max_digits=24)),
+                ('open_at', models.DateTimeField()),
+                ('close_at', models.DateTimeField()),
+                ('coin', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candles', to='systems.coin')),
+            ],
+            options={
+                'unique_together': {('coin', 'resolution', 'bucket')},
+            },
+        ),
+    ]
@@ -0,0 +1,157 @@
+# Range-partition Trade, TraderHistory and CoinHistory by month on created_at.
+#
+# Postgres requires the partition key in every unique constraint, so the
+# database primary keys become (transaction_hash, created_at) and
+# (id, created_at). Django's model state is unchanged: it still treats
+# transaction_hash / id as the primary key, which stays true in practice
+# (a trade's created_at comes from its event). Index and foreign key names
+# are kept, so later migrations find them.
+#
+# Existing rows are copied into monthly partitions, one per month present
+# in the data plus PARTITION_PREMAKE_MONTHS ahead; a DEFAULT partition
+# catches anything outside them. manage_partitions keeps creating months
+# ahead and archives cold ones.
+
+from datetime import date, datetime, timezone as dt_timezone
+from django.conf import settings
+from django.db import migrations, models
+
+# table -> (primary key columns without the partition key, partition key)
+TABLES = {
+    'systems_trade': (['transaction_hash'], 'created_at'),
+    'systems_traderhistory': (['id'], 'created_at'),
+    'systems_coinhistory': (['id'], 'created_at'),
+}
+
+
+def _month(day, offset=0):
+    months = day.year * 12 + day.month - 1 + offset
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def _table_definition(cursor, table):
+    """Secondary index definitions and foreign keys (name, definition) of a table"""
+    cursor.execute(
+        """
+        SELECT indexdef FROM pg_indexes
+        WHERE tablename = %s AND indexname <> %s
+        """,
+        [table, f"{table}_pkey"],
+    )
+    indexes = [row[0] for row in cursor.fetchall()]
+    cursor.execute(
+        """
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype = 'f'
+        """,
+        [table],
+    )
+    return indexes, cursor.fetchall()
+
+
+def _identity_columns(cursor, table):
+    cursor.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_name = %s AND is_identity = 'YES'",
+        [table],
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _rebuild(cursor, table, new_table_sql, primary_key, create_partitions=None):
+    """Copy `table` into a new table of the same name, then restore its keys and indexes"""
+    indexes, foreign_keys = _table_definition(cursor, table)
+    identity = _identity_columns(cursor, table)
+    old = f"{table}_old"
+
+    cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{old}"')
+    cursor.execute(new_table_sql.format(table=table, old=old))
+    if create_partitions:
+        create_partitions(cursor, table, old)
+    overriding = "OVERRIDING SYSTEM VALUE" if identity else ""
+    cursor.execute(f'INSERT INTO "{table}" {overriding} SELECT * FROM "{old}"')
+    for column in identity:
+        cursor.execute(
+            f"""SELECT setval(pg_get_serial_sequence(%s, %s), COALESCE(MAX("{column}"), 0) + 1, false) FROM "{table}" """,
+            [table, column],
+        )
+    cursor.execute(f'DROP TABLE "{old}"')
+
+    columns = ", ".join(f'"{column}"' for column in primary_key)
+    cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY ({columns})')
+    for definition in indexes:
+        # Indexes of a partitioned parent read back as "ON ONLY"; build them on every partition
+        cursor.execute(definition.replace(" ON ONLY ", " ON "))
+    for name, definition in foreign_keys:
+        cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}')
+    cursor.execute(f'ANALYZE "{table}"')
+
+
+def _monthly_partitions(key):
+    def create(cursor, table, old):
+        cursor.execute(f'SELECT MIN("{key}") FROM "{old}"')
+        oldest = cursor.fetchone()[0]
+        today = datetime.now(dt_timezone.utc).date()
+        month = _month(oldest.date() if oldest else today)
+        last = _month(today, getattr(settings, 'PARTITION_PREMAKE_MONTHS', 3))
+        while month <= last:
+            cursor.execute(
+                f'CREATE TABLE "{table}_p{month:%Y%m}" PARTITION OF "{table}" FOR VALUES FROM (%s) TO (%s)',
+                [month, _month(month, 1)],
+            )
+            month = _month(month, 1)
+        cursor.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT')
+    return create
+
+
+def partition_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table, (primary_key, key) in TABLES.items():
+            _rebuild(
+                cursor, table,
+                f'CREATE TABLE "{{table}}" (LIKE "{{old}}" INCLUDING DEFAULTS INCLUDING IDENTITY) '
+                f'PARTITION BY RANGE ("{key}")',
+                primary_key + [key],
+                _monthly_partitions(key),
+            )
+
+
+def unpartition_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table, (primary_key, key) in TABLES.items():
+            _rebuild(
+                cursor, table,
+                'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS INCLUDING IDENTITY)',
+                primary_key,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('systems', '0043_coin_candles'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tables, unpartition_tables),
+        # Per-coin / per-trader scans over recent trades: key + partition column
+        migrations.RemoveIndex(
+            model_name='trade',
+            name='systems_tra_user_id_7694ad_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='trade',
+            name='systems_tra_coin_id_743efb_idx',
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(fields=['user', 'created_at'], name='idx_trade_user_created'),
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(fields=['coin', 'created_at'], name='idx_trade_coin_created'),
+        ),
+    ]
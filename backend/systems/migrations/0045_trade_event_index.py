@@ -0,0 +1,110 @@
+# Give Trade a BIGINT surrogate key and an event_index, so transaction_hash
+# holds the bare signature again instead of "<signature>:<n>" for the n-th
+# extra trade of a transaction.
+#
+# The table is partitioned (0044), so every unique constraint carries
+# created_at: the database primary key is (id, created_at) and the natural
+# key (transaction_hash, event_index, created_at). Postgres cannot add an
+# identity column to a partitioned table, so id is backed by an owned
+# sequence, which Django treats like a serial column.
+
+from django.db import migrations, models
+
+FORWARD = [
+    'CREATE SEQUENCE "systems_trade_id_seq" AS bigint',
+    'ALTER TABLE "systems_trade" ADD COLUMN "id" bigint NOT NULL DEFAULT nextval(\'"systems_trade_id_seq"\')',
+    'ALTER SEQUENCE "systems_trade_id_seq" OWNED BY "systems_trade"."id"',
+    'ALTER TABLE "systems_trade" ADD COLUMN "event_index" smallint NOT NULL DEFAULT 0 '
+    'CONSTRAINT "systems_trade_event_index_check" CHECK ("event_index" >= 0)',
+    'ALTER TABLE "systems_trade" DROP CONSTRAINT "systems_trade_pkey"',
+    """
+    UPDATE "systems_trade"
+    SET event_index = split_part(transaction_hash, ':', 2)::smallint,
+        transaction_hash = split_part(transaction_hash, ':', 1)
+    WHERE transaction_hash LIKE '%:%'
+    """,
+    # Fire the deferred FK checks of the UPDATE, or the ALTERs below refuse to run
+    'SET CONSTRAINTS ALL IMMEDIATE',
+    'ALTER TABLE "systems_trade" ALTER COLUMN "event_index" DROP DEFAULT',
+    'ALTER TABLE "systems_trade" ALTER COLUMN "transaction_hash" TYPE varchar(88)',
+    'ALTER TABLE "systems_trade" ADD CONSTRAINT "systems_trade_pkey" PRIMARY KEY ("id", "created_at")',
+    'ALTER TABLE "systems_trade" ADD CONSTRAINT "uniq_trade_signature_event" '
+    'UNIQUE ("transaction_hash", "event_index", "created_at")',
+]
+
+BACKWARD = [
+    'ALTER TABLE "systems_trade" DROP CONSTRAINT "uniq_trade_signature_event"',
+    'ALTER TABLE "systems_trade" DROP CONSTRAINT "systems_trade_pkey"',
+    """
+    UPDATE "systems_trade" SET transaction_hash = transaction_hash || ':' || event_index
+    WHERE event_index > 0
+    """,
+    'SET CONSTRAINTS ALL IMMEDIATE',
+    'ALTER TABLE "systems_trade" ALTER COLUMN "transaction_hash" TYPE varchar(96)',
+    'ALTER TABLE "systems_trade" ADD CONSTRAINT "systems_trade_pkey" PRIMARY KEY ("transaction_hash", "created_at")',
+    'ALTER TABLE "systems_trade" DROP COLUMN "event_index"',
+    'ALTER TABLE "systems_trade" DROP COLUMN "id"',
+]
+
+
+def _like_index(schema_editor):
+    """The varchar_pattern_ops index Django kept for the old transaction_hash primary key"""
+    return schema_editor._create_index_name('systems_trade', ['transaction_hash'], suffix='_like')
+
+
+def add_surrogate_key(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for statement in FORWARD:
+            cursor.execute(statement)
+        cursor.execute(f'DROP INDEX IF EXISTS "{_like_index(schema_editor)}"')
+
+
+def remove_surrogate_key(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for statement in BACKWARD:
+            cursor.execute(statement)
+        cursor.execute(
+            f'CREATE INDEX "{_like_index(schema_editor)}" ON "systems_trade" ("transaction_hash" varchar_pattern_ops)'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('systems', '0044_partition_trade_and_history'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(add_surrogate_key, remove_surrogate_key),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='trade',
+                    name='event_index',
+                    field=models.PositiveSmallIntegerField(default=0),
+                ),
+                migrations.AlterField(
+                    model_name='trade',
+                    name='transaction_hash',
+                    field=models.CharField(max_length=88),
+                ),
+                migrations.AddField(
+                    model_name='trade',
+                    name='id',
+                    field=models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+                ),
+                migrations.AddConstraint(
+                    model_name='trade',
+                    constraint=models.UniqueConstraint(
+                        fields=('transaction_hash', 'event_index'), name='uniq_trade_signature_event'
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,95 @@
+# First step toward compact keys: BIGINT surrogate keys for SolanaUser and
+# Coin, and the raw bytes of every base58 key, next to the text keys that
+# stay authoritative for now.
+#
+#   1. (here) SolanaUser.sid / Coin.sid, filled for existing rows by the
+#      volatile column default, and nullable *_raw / *_sid columns on the
+#      tables that carry the keys. Ingest and the wallet-connect views
+#      write them from now on; backfill_compact_keys fills older rows and
+#      reports what is left (--check).
+#   2. Make the child columns NOT NULL, index them per partition and add
+#      the foreign keys on sid.
+#   3. Move reads (API lookups, raw SQL joins) to sid / *_raw, decoding to
+#      base58 at the API edge, then drop the text keys. SolanaUser is
+#      AUTH_USER_MODEL; its key is referenced by the auth, admin and token
+#      tables, so that swap needs its own maintenance window.
+#
+# Like Trade.id (0045), the surrogate keys are backed by owned sequences;
+# Django only knows them as database defaults.
+
+from django.db import migrations, models
+
+SEQUENCES = ('systems_solanauser_sid_seq', 'systems_coin_sid_seq')
+
+
+def next_value(sequence):
+    return models.Func(models.Value(sequence), function='nextval', output_field=models.BigIntegerField())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('systems', '0045_trade_event_index'),
+    ]
+
+    operations = [
+        *[
+            migrations.RunSQL(f'CREATE SEQUENCE "{sequence}" AS bigint', f'DROP SEQUENCE "{sequence}"')
+            for sequence in SEQUENCES
+        ],
+        migrations.AddField(
+            model_name='solanauser',
+            name='sid',
+            field=models.BigIntegerField(db_default=next_value('systems_solanauser_sid_seq'), editable=False, unique=True),
+        ),
+        migrations.AddField(
+            model_name='solanauser',
+            name='wallet_address_raw',
+            field=models.BinaryField(max_length=32, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='coin',
+            name='sid',
+            field=models.BigIntegerField(db_default=next_value('systems_coin_sid_seq'), editable=False, unique=True),
+        ),
+        migrations.AddField(
+            model_name='coin',
+            name='address_raw',
+            field=models.BinaryField(max_length=32, null=True, unique=True),
+        ),
+        # Owned by their columns, like a serial; unlinked again before a reverse drops them
+        migrations.RunSQL(
+            'ALTER SEQUENCE "systems_solanauser_sid_seq" OWNED BY "systems_solanauser"."sid"',
+            'ALTER SEQUENCE "systems_solanauser_sid_seq" OWNED BY NONE',
+        ),
+        migrations.RunSQL(
+            'ALTER SEQUENCE "systems_coin_sid_seq" OWNED BY "systems_coin"."sid"',
+            'ALTER SEQUENCE "systems_coin_sid_seq" OWNED BY NONE',
+        ),
+        # Nullable without a default: a catalog-only change on the partitioned tables
+        migrations.AddField(
+            model_name='trade',
+            name='transaction_hash_raw',
+            field=models.BinaryField(max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='trade',
+            name='user_sid',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='trade',
+            name='coin_sid',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='usercoinholdings',
+            name='user_sid',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='usercoinholdings',
+            name='coin_sid',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from .main import Coin, UserCoinHoldings, SolanaUser, Trade, SolanaUserManager
 from .score import *
 from .history import CoinHistory, TraderHistory, History
+from .market import CoinStatsBucket, CoinCandle
 from .admin import *
\ No newline at end of file
@@ -1,6 +1,13 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
 from django.utils import timezone
+from systems.utils.keys import raw_pubkey, raw_signature
+
+
+def next_value(sequence: str):
+    """Database default drawing from `sequence`, for surrogate keys that are not the primary key"""
+    return models.Func(models.Value(sequence), function='nextval', output_field=models.BigIntegerField())
+
 
 # integrate the score directly into the models
 class SolanaUserManager(BaseUserManager):
@@ -39,6 +46,9 @@ class SolanaUser(AbstractUser):
     first_name = None
     last_name = None
     wallet_address = models.CharField(max_length=44, unique=True, primary_key=True)
+    # Compact keys (migration 0046): the BIGINT key child tables will reference and the raw pubkey
+    sid = models.BigIntegerField(unique=True, editable=False, db_default=next_value('systems_solanauser_sid_seq'))
+    wallet_address_raw = models.BinaryField(max_length=32, unique=True, null=True, editable=False)
     display_name = models.CharField(max_length=150, blank=True)
     bio = models.TextField(blank=True)
     # following
@@ -56,6 +66,11 @@ class SolanaUser(AbstractUser):
 
     def __str__(self):
         return self.wallet_address
+
+    def save(self, *args, **kwargs):
+        if self.wallet_address_raw is None:
+            self.wallet_address_raw = raw_pubkey(self.wallet_address)
+        super().save(*args, **kwargs)
     
     @property
     def devscore(self): # corrrect it later
@@ -75,6 +90,8 @@ class SolanaUser(AbstractUser):
 class Coin(models.Model): # we have to store the ath
     """Represents a coin on the platform"""
     address = models.CharField(primary_key=True, max_length=44, unique=True, editable=True)#False)
+    sid = models.BigIntegerField(unique=True, editable=False, db_default=next_value('systems_coin_sid_seq'))
+    address_raw = models.BinaryField(max_length=32, unique=True, null=True, editable=False)
     name = models.CharField(max_length=100)
     creator = models.ForeignKey(SolanaUser, on_delete=models.CASCADE, related_name='coins', to_field="wallet_address")
     created_at = models.DateTimeField(auto_now_add=True)
@@ -98,7 +115,18 @@ class Coin(models.Model): # we have to store the ath
     ath = models.DecimalField(max_digits=20, decimal_places=8, default=0)
     updated = models.DateTimeField(default=timezone.now)
     total_held = models.DecimalField(max_digits=32, decimal_places=9, default=0)
-    # figure out trade volume
+    # Rolling market stats, maintained per trade batch from CoinStatsBucket
+    # (bulk_update_market_stats) and aged by refresh_market_stats; `change` is the 24h change in %
+    atl = models.DecimalField(max_digits=20, decimal_places=8, null=True, blank=True)
+    volume_5m = models.DecimalField(max_digits=24, decimal_places=9, default=0)
+    volume_1h = models.DecimalField(max_digits=24, decimal_places=9, default=0)
+    volume_24h = models.DecimalField(max_digits=24, decimal_places=9, default=0)
+    trades_5m = models.IntegerField(default=0)
+    trades_1h = models.IntegerField(default=0)
+    trades_24h = models.IntegerField(default=0)
+    change_5m = models.DecimalField(max_digits=16, decimal_places=4, default=0)
+    change_1h = models.DecimalField(max_digits=16, decimal_places=4, default=0)
+    stats_updated = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.name} ({self.ticker})"
@@ -106,6 +134,8 @@ class Coin(models.Model): # we have to store the ath
     def save(self, *args, **kwargs):
         if self.ticker:
             self.ticker = self.ticker.upper()  # Ensure it's always uppercase
+        if self.address_raw is None:
+            self.address_raw = raw_pubkey(self.address)
         if self._state.adding or self.ath is None:
             self.ath = self.current_price
         else:
@@ -126,7 +156,11 @@ class Coin(models.Model): # we have to store the ath
         ordering = ['-created_at']
         indexes = [
             # Composite index: first filter by creator, then sort by created_at DESC
-            models.Index(fields=['creator', '-created_at'], name='idx_creator_created_at')
+            models.Index(fields=['creator', '-created_at'], name='idx_creator_created_at'),
+            # List endpoints sort by these
+            models.Index(fields=['volume_24h'], name='idx_coin_volume_24h'),
+            models.Index(fields=['change'], name='idx_coin_change'),
+            models.Index(fields=['current_marketcap'], name='idx_coin_marketcap'),
         ]
 
 class UserCoinHoldings(models.Model):
@@ -134,6 +168,9 @@ class UserCoinHoldings(models.Model):
     user = models.ForeignKey(SolanaUser, on_delete=models.CASCADE, related_name="holdings", to_field="wallet_address", db_index=True)
     coin = models.ForeignKey(Coin, on_delete=models.CASCADE, related_name="holders", to_field="address")
     amount_held = models.DecimalField(max_digits=20, decimal_places=8, default=0) # add a way to check if the holdings is above the availiable coins
+    # SolanaUser.sid / Coin.sid of user and coin (migration 0046), until they replace the text keys
+    user_sid = models.BigIntegerField(null=True, editable=False)
+    coin_sid = models.BigIntegerField(null=True, editable=False)
 
     class Meta:
         unique_together = ('user', 'coin')  # Ensures a user can't have duplicate records for the same coin
@@ -155,7 +192,10 @@ class Trade(models.Model): # change to transaction hash
         ('COIN_CREATE', 'Coin Creation'),
     ]
 
-    transaction_hash = models.CharField(max_length=88, primary_key=True, unique= True, editable= True)#False)
+    # A transaction can carry several trades: the signature plus the trade's
+    # position among them (0 for the first) identifies one
+    transaction_hash = models.CharField(max_length=88)
+    event_index = models.PositiveSmallIntegerField(default=0)
     user = models.ForeignKey(SolanaUser, on_delete=models.CASCADE, related_name='trades', to_field="wallet_address")
     coin = models.ForeignKey(Coin, on_delete=models.CASCADE, related_name='trades', to_field="address")
     trade_type = models.CharField(max_length=14, choices=TRADE_TYPES)
@@ -163,14 +203,29 @@ class Trade(models.Model): # change to transaction hash
     sol_amount = models.DecimalField(max_digits=24, decimal_places=9)
     created_at = models.DateTimeField(default=timezone.now)
     trading_fee = models.DecimalField(max_digits=24, decimal_places=9, default=0)
+    # Compact keys (migration 0046): the raw signature and SolanaUser.sid / Coin.sid of user and coin
+    transaction_hash_raw = models.BinaryField(max_length=64, null=True, editable=False)
+    user_sid = models.BigIntegerField(null=True, editable=False)
+    coin_sid = models.BigIntegerField(null=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        if self.transaction_hash_raw is None:
+            self.transaction_hash_raw = raw_signature(self.transaction_hash)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.get_trade_type_display()} Trade by {self.user.get_display_name()} on {self.coin.ticker}, created_at {self.created_at}"
 
     class Meta:
         ordering = ['-created_at']
+        # Range-partitioned by month on created_at (migration 0044, manage_partitions);
+        # in the database the primary key is (id, created_at) and the unique
+        # constraint (transaction_hash, event_index, created_at)
+        constraints = [
+            models.UniqueConstraint(fields=['transaction_hash', 'event_index'], name='uniq_trade_signature_event'),
+        ]
         indexes = [
-            models.Index(fields=['user']),
-            models.Index(fields=['coin']),
+            models.Index(fields=['user', 'created_at'], name='idx_trade_user_created'),
+            models.Index(fields=['coin', 'created_at'], name='idx_trade_coin_created'),
             models.Index(fields=['created_at']),
         ]
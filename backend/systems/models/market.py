@@ -0,0 +1,61 @@
+from django.db import models
+from .main import Coin
+
+class CoinStatsBucket(models.Model):
+    """
+    Trade counters of one coin over one MARKET_STATS_BUCKET_SECONDS slice.
+    Batches add to these; the rolling Coin stats are summed from them, never from Trade.
+    """
+    coin = models.ForeignKey(
+        Coin, on_delete=models.CASCADE,
+        related_name='stats_buckets', to_field="address"
+    )
+    bucket = models.DateTimeField()  # slice start
+    volume = models.DecimalField(max_digits=24, decimal_places=9, default=0)  # SOL
+    trades = models.IntegerField(default=0)
+    open_price = models.DecimalField(max_digits=24, decimal_places=10)
+    high_price = models.DecimalField(max_digits=24, decimal_places=10)
+    low_price = models.DecimalField(max_digits=24, decimal_places=10)
+    close_price = models.DecimalField(max_digits=24, decimal_places=10)
+    # trade times of open/close, so late trades merge into the right end
+    open_at = models.DateTimeField()
+    close_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.coin_id} @ {self.bucket}: {self.trades} trades, {self.volume} SOL"
+
+    class Meta:
+        unique_together = ('coin', 'bucket')
+        indexes = [
+            models.Index(fields=['bucket']),  # pruning
+        ]
+
+
+class CoinCandle(models.Model):
+    """
+    OHLCV candle of one coin at one resolution, upserted from each trade
+    batch (bulk_update_candles). Prices are the curve price after each trade.
+    """
+    RESOLUTIONS = {'1m': 60, '5m': 300, '1h': 3600, '1d': 86400}  # name -> seconds
+
+    coin = models.ForeignKey(
+        Coin, on_delete=models.CASCADE,
+        related_name='candles', to_field="address"
+    )
+    resolution = models.CharField(max_length=2, choices=[(r, r) for r in RESOLUTIONS])
+    bucket = models.DateTimeField()  # candle open time
+    volume = models.DecimalField(max_digits=24, decimal_places=9, default=0)  # SOL
+    trades = models.IntegerField(default=0)
+    open_price = models.DecimalField(max_digits=24, decimal_places=10)
+    high_price = models.DecimalField(max_digits=24, decimal_places=10)
+    low_price = models.DecimalField(max_digits=24, decimal_places=10)
+    close_price = models.DecimalField(max_digits=24, decimal_places=10)
+    open_at = models.DateTimeField()
+    close_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.coin_id} {self.resolution} @ {self.bucket}"
+
+    class Meta:
+        # Also the index a chart range scan uses: coin, resolution, bucket range
+        unique_together = ('coin', 'resolution', 'bucket')
@@ -1,16 +1,122 @@
-import hashlib 
+import hashlib
 import base64
+import binascii
+import struct
+import logging
+from functools import lru_cache
 import base58
+from solders.pubkey import Pubkey
 from construct import Struct, Bytes, Int8ul, Int32ul, Int64ul, PaddedString, If, this, Int64sl
 
+logger = logging.getLogger(__name__)
+
+# Event layouts emitted by the program (field order matters)
+TOKEN_CREATED_FIELDS = {
+    "mint": "pubkey",
+    "initial_price_per_token": "u64",
+    "migrated": "bool",
+    "total_supply": "u64",
+    "tokens_sold": "u64",
+    "sol_raised": "u64",
+    "start_mcap": "u64",
+    "target_sol": "u64",
+    "creator": "pubkey",
+    "raydium_pool": "option<pubkey>",
+    "migration_timestamp": "i64",
+    "uri": "string",
+}
+
+PURCHASED_TOKEN_FIELDS = {
+    "base_cost": "u64",
+    "trading_fee": "u64",
+    "total_cost": "u64",
+    "mint": "pubkey",
+    "amount_purchased": "u64",
+    "migrated": "bool",
+    "total_supply": "u64",
+    "tokens_sold": "u64",
+    "sol_raised": "u64",
+    "current_price": "u64",
+    "buyer": "pubkey",
+    "timestamp": "i64",
+}
+
+SOLD_TOKEN_FIELDS = {
+    "mint": "pubkey",
+    "base_proceeds": "u64",
+    "trading_fee": "u64",
+    "net_proceeds": "u64",
+    "amount_sold": "u64",
+    "migrated": "bool",
+    "total_supply": "u64",
+    "tokens_sold": "u64",
+    "sol_raised": "u64",
+    "current_price": "u64",
+    "seller": "pubkey",
+    "timestamp": "i64",
+}
+
+# struct format codes for fixed-width types; variable-width types
+# (string, option<pubkey>) get their own segment in the compiled plan
+_FIXED_FORMATS = {
+    "pubkey": "32s",
+    "u8": "B",
+    "u64": "Q",
+    "i64": "q",
+    "bool": "B",
+}
+_VARIABLE_TYPES = ("string", "option<pubkey>")
+_U32 = struct.Struct("<I")
+
+_FIXED = 0
+_STRING = 1
+_OPTION_PUBKEY = 2
+
+
+@lru_cache(maxsize=4096)
+def pubkey_to_str(raw: bytes) -> str:
+    """Base58 encode a 32-byte pubkey (cached, mints and wallets repeat a lot)"""
+    return str(Pubkey.from_bytes(raw))
+
+
 class TokenEventDecoder:
     def __init__(self, event_name: str, parse_dict: dict):
         self.event_name = event_name
         self.parse_dict = parse_dict
-        self.struct = self._convert_dict_to_struct()
+        self.plan = self._compile_plan()
         self.discriminator = self._get_discriminator()
+        self._struct = None
+
+    @property
+    def struct(self) -> Struct:
+        """construct-based parser, kept as the reference implementation"""
+        if self._struct is None:
+            self._struct = self._convert_dict_to_struct()
+        return self._struct
 
     def decode(self, log_line: str) -> dict | None:
+        raw = self._get_raw(log_line)
+        if raw is None:
+            return None
+        return self.parse(raw[8:])
+
+    def decode_construct(self, log_line: str) -> dict | None:
+        """Decode using the construct struct (slow path, used for benchmarks/verification)"""
+        raw = self._get_raw(log_line)
+        if raw is None:
+            return None
+        parsed = self.struct.parse(raw[8:])
+        return self._convert_from_struct_to_dict(parsed)
+
+    def parse(self, data: bytes) -> dict | None:
+        """Parse an event body (everything after the discriminator) using the compiled plan"""
+        try:
+            return self._parse_plan(data)
+        except (struct.error, IndexError, ValueError) as e:
+            logger.warning(f"Failed to parse {self.event_name} event: {e}")
+            return None
+
+    def _get_raw(self, log_line: str) -> bytes | None:
         if "Program data:" not in log_line:
             return None
 
@@ -18,15 +124,82 @@ class TokenEventDecoder:
         raw = base64.b64decode(base64_data)
 
         if raw[:8] != self.discriminator:
-            print("Discriminator mismatch.")
+            logger.debug(f"Discriminator mismatch for {self.event_name}")
             return None
-
-        parsed = self.struct.parse(raw[8:])
-        return self._convert_from_struct_to_dict(parsed)
+        return raw
 
     def _get_discriminator(self) -> bytes:
         return hashlib.sha256(f"event:{self.event_name}".encode()).digest()[:8]
 
+    def _compile_plan(self) -> list:
+        """
+        Compile the schema ahead of time into segments:
+          - runs of fixed-width fields become one little-endian struct.Struct
+          - strings are a u32 length prefix followed by utf8 bytes
+          - option<pubkey> is a u8 flag followed by 32 bytes when set
+        """
+        plan = []
+        fmt = ""
+        keys, pubkey_keys, bool_keys = [], [], []
+
+        def flush():
+            nonlocal fmt, keys, pubkey_keys, bool_keys
+            if keys:
+                plan.append((_FIXED, struct.Struct("<" + fmt), (tuple(keys), tuple(pubkey_keys), tuple(bool_keys))))
+            fmt = ""
+            keys, pubkey_keys, bool_keys = [], [], []
+
+        for key, value_type in self.parse_dict.items():
+            if value_type in _FIXED_FORMATS:
+                fmt += _FIXED_FORMATS[value_type]
+                keys.append(key)
+                if value_type == "pubkey":
+                    pubkey_keys.append(key)
+                elif value_type == "bool":
+                    bool_keys.append(key)
+            elif value_type in _VARIABLE_TYPES:
+                flush()
+                plan.append((_STRING if value_type == "string" else _OPTION_PUBKEY, None, key))
+            else:
+                raise ValueError(f"Unsupported type: {value_type}")
+
+        flush()
+        return plan
+
+    def _parse_plan(self, data: bytes) -> dict:
+        output = {}
+        offset = 0
+        for kind, layout, keys in self.plan:
+            if kind == _FIXED:
+                names, pubkey_keys, bool_keys = keys
+                output.update(zip(names, layout.unpack_from(data, offset)))
+                offset += layout.size
+                for key in pubkey_keys:
+                    output[key] = pubkey_to_str(output[key])
+                for key in bool_keys:
+                    output[key] = bool(output[key])
+            elif kind == _STRING:
+                (length,) = _U32.unpack_from(data, offset)
+                offset += 4
+                value = data[offset:offset + length]
+                if len(value) != length:
+                    raise ValueError(f"string field {keys} is truncated")
+                # PaddedString semantics: trailing nulls are padding
+                output[keys] = value.rstrip(b"\x00").decode("utf8")
+                offset += length
+            else:
+                present = data[offset]
+                offset += 1
+                if present == 1:
+                    value = data[offset:offset + 32]
+                    if len(value) != 32:
+                        raise ValueError(f"pubkey field {keys} is truncated")
+                    output[keys] = pubkey_to_str(value)
+                    offset += 32
+                else:
+                    output[keys] = None
+        return output
+
     def _convert_dict_to_struct(self) -> Struct:
         fields = {}
 
@@ -78,6 +251,48 @@ class TokenEventDecoder:
             return bool(output)
         return output
 
+class EventDecoderRegistry:
+    """
+    Decoders keyed by their 8-byte Anchor discriminator, so every
+    "Program data:" line costs one base64 decode and one dict lookup
+    """
+    DATA_PREFIX = "Program data: "
+
+    def __init__(self):
+        self._by_discriminator = {}
+
+    def register(self, event_type: str, decoder: TokenEventDecoder):
+        if decoder.discriminator in self._by_discriminator:
+            raise ValueError(f"Discriminator already registered: {decoder.event_name}")
+        self._by_discriminator[decoder.discriminator] = (event_type, decoder)
+
+    def decode_logs(self, logs: list) -> list:
+        """
+        Decode every known event in a transaction's logs in a single pass.
+
+        Returns:
+            List of (event_type, event) tuples in log order
+        """
+        events = []
+        prefix = self.DATA_PREFIX
+        for log_line in logs:
+            if not log_line.startswith(prefix):
+                continue
+            try:
+                raw = base64.b64decode(log_line[len(prefix):])
+            except (binascii.Error, ValueError):
+                continue
+
+            entry = self._by_discriminator.get(raw[:8])
+            if entry is None:
+                continue
+
+            event_type, decoder = entry
+            event = decoder.parse(raw[8:])
+            if event is not None:
+                events.append((event_type, event))
+        return events
+
 if __name__ == "__main__":
     my_dict = {
         "token_name": "string",
@@ -92,7 +307,7 @@ if __name__ == "__main__":
     log_line = "Program data: YHpxijLjlTkEAAAAT1RYWwQAAABya2tFBAAAAGdlcmXC/sKDZhL9WAglOAoGvMmCyhG8jVL3YSJo0JgMhNfHIxFxSi0yRsbzff3VW2I+0zipxim6KdmtuY9xFCiCfHka6WbAL72J1laWy4AVoH/xMcMVfCdfht60iQunUEMRTSMJ"
 
     decoder = TokenEventDecoder(
-        "TokenCreatedEvent", 
+        "TokenCreatedEvent",
         my_dict
     )
     event = decoder.decode(log_line)
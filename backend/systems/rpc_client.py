@@ -0,0 +1,148 @@
+# systems/rpc_client.py
+import asyncio
+import itertools
+import logging
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class RpcError(Exception):
+    """Raised when the RPC node returns an error object"""
+
+
+class SolanaRpcClient:
+    """
+    Minimal async JSON-RPC client for the HTTP endpoint.
+
+    Only covers what ingestion needs (signature paging and transaction
+    fetches) but supports batched requests, which solana-py's client does not.
+    """
+
+    def __init__(self, rpc_url: str, timeout: float = 30, max_concurrency: int = 8):
+        """
+        Args:
+            rpc_url: HTTP(S) JSON-RPC endpoint
+            timeout: Total seconds allowed per HTTP request
+            max_concurrency: Maximum number of in-flight HTTP requests
+        """
+        self.rpc_url = rpc_url
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.session = None
+        self._ids = itertools.count(1)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def get_session(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(timeout=self.timeout)
+        return self.session
+
+    async def close(self):
+        if self.session and not self.session.closed:
+            await self.session.close()
+
+    def _request(self, method: str, params: list) -> dict:
+        return {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params}
+
+    async def _post(self, payload, retries: int = 3):
+        session = await self.get_session()
+        for attempt in range(retries):
+            try:
+                async with self.semaphore:
+                    async with session.post(self.rpc_url, json=payload) as response:
+                        if response.status == 429:
+                            raise aiohttp.ClientResponseError(
+                                response.request_info, response.history, status=429, message="rate limited"
+                            )
+                        response.raise_for_status()
+                        return await response.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == retries - 1:
+                    raise
+                backoff = 0.5 * (2 ** attempt)
+                logger.warning(f"RPC request failed ({e}), retrying in {backoff}s")
+                await asyncio.sleep(backoff)
+
+    async def call(self, method: str, params: list):
+        """Single JSON-RPC call, returns the `result` field"""
+        response = await self._post(self._request(method, params))
+        if "error" in response:
+            raise RpcError(f"{method}: {response['error']}")
+        return response.get("result")
+
+    async def batch(self, calls: list) -> list:
+        """
+        Send several calls as one JSON-RPC batch.
+
+        Args:
+            calls: List of (method, params) tuples
+
+        Returns:
+            Results in the same order as `calls`; failed entries are None
+        """
+        if not calls:
+            return []
+        requests = [self._request(method, params) for method, params in calls]
+        responses = await self._post(requests)
+        if isinstance(responses, dict):
+            # Some nodes answer a rejected batch with a single error object
+            raise RpcError(f"batch rejected: {responses.get('error')}")
+
+        by_id = {r.get("id"): r for r in responses}
+        results = []
+        for request in requests:
+            response = by_id.get(request["id"], {})
+            if "error" in response:
+                logger.warning(f"{request['method']} failed: {response['error']}")
+            results.append(response.get("result"))
+        return results
+
+    async def get_signatures_for_address(self, address: str, before: str = None, until: str = None,
+                                         limit: int = 1000, commitment: str = "confirmed") -> list:
+        """One page of signatures for `address`, newest first"""
+        config = {"limit": limit, "commitment": commitment}
+        if before:
+            config["before"] = before
+        if until:
+            config["until"] = until
+        return await self.call("getSignaturesForAddress", [address, config]) or []
+
+    async def iter_signatures(self, address: str, until: str = None, limit: int = 1000,
+                              commitment: str = "confirmed"):
+        """Yield pages of signatures newer than `until`, newest page first"""
+        before = None
+        while True:
+            page = await self.get_signatures_for_address(
+                address, before=before, until=until, limit=limit, commitment=commitment
+            )
+            if not page:
+                return
+            yield page
+            if len(page) < limit:
+                return
+            before = page[-1]["signature"]
+
+    async def get_transactions(self, signatures: list, batch_size: int = 50,
+                               commitment: str = "confirmed") -> dict:
+        """
+        Fetch many transactions using concurrent JSON-RPC batches.
+
+        Returns:
+            {signature: transaction or None}
+        """
+        config = {"encoding": "json", "maxSupportedTransactionVersion": 0, "commitment": commitment}
+        chunks = [signatures[i:i + batch_size] for i in range(0, len(signatures), batch_size)]
+        results = await asyncio.gather(*[
+            self.batch([("getTransaction", [sig, config]) for sig in chunk])
+            for chunk in chunks
+        ])
+        transactions = {}
+        for chunk, chunk_results in zip(chunks, results):
+            transactions.update(zip(chunk, chunk_results))
+        return transactions
@@ -51,9 +51,13 @@ class CoinSerializer(serializers.ModelSerializer):
             'current_price', 'total_held', 'score',
             'decimals', 'bonding_curve',
             'current_marketcap', 'start_marketcap', 'end_marketcap', 
-            'marketcap', 'change'
+            'marketcap', 'change', 'change_1h', 'change_5m', 'ath', 'atl',
+            'volume_24h', 'volume_1h', 'volume_5m', 'trades_24h', 'trades_1h', 'trades_5m'
+        ]
+        read_only_fields = [
+            'creator', 'creator_display_name', 'created_at', 'change', 'change_1h', 'change_5m',
+            'ath', 'atl', 'volume_24h', 'volume_1h', 'volume_5m', 'trades_24h', 'trades_1h', 'trades_5m',
         ]
-        read_only_fields = ['creator', 'creator_display_name', 'created_at']
     
     def get_creator_display_name(self, obj):
         return obj.creator.get_display_name()
@@ -91,7 +95,7 @@ class TradeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Trade
         fields = [
-            'transaction_hash', 'user', 'coin', 'coin_symbol', 'trade_type',
+            'transaction_hash', 'event_index', 'user', 'coin', 'coin_symbol', 'trade_type',
             'trade_type_display', 'coin_amount', 'sol_amount', 'created_at'
         ]
         read_only_fields = ['user', 'created_at', 'coin']
@@ -0,0 +1,356 @@
+# systems/sinks.py
+import re
+import time
+import logging
+from itertools import count
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from systems.models import Coin, Trade, SolanaUser
+from systems.celery_sys.utlis import ensure_connection, get_transaction_type, bigint_to_float
+from systems.celery_sys.batched_signals import handle_coin_post_create, provision_wallets
+from systems.celery_sys.trade_utils import (
+    holdings_deltas, holdings_upsert_sql, holdings_cleanup_sql, holdings_changes, coin_totals_sql,
+    holders_counts_sql, market_stats_statements, candle_statements,
+)
+from systems.metrics import COMMIT_LAG
+from systems.utils.parking import park_trades, take_parked, requeue_parked
+from systems.utils.keys import raw_pubkey, raw_signature
+from systems.tasks import process_creates_batch, process_trades_batch
+
+try:
+    import asyncpg
+except ImportError:  # only needed for --sink=direct
+    asyncpg = None
+
+logger = logging.getLogger(__name__)
+
+COIN_TABLE = Coin._meta.db_table
+TRADE_TABLE = Trade._meta.db_table
+USER_TABLE = SolanaUser._meta.db_table
+
+# Session-local staging tables, emptied at the end of every transaction
+STAGING_DDL = """
+CREATE TEMP TABLE IF NOT EXISTS coin_staging (
+    address text, name text, creator_id text, total_supply numeric, image_url text,
+    ticker text, description text, discord text, website text, twitter text,
+    decimals smallint, current_marketcap numeric, start_marketcap numeric,
+    end_marketcap numeric, raydium_pool text, current_price numeric, address_raw bytea
+) ON COMMIT DELETE ROWS;
+CREATE TEMP TABLE IF NOT EXISTS trade_staging (
+    transaction_hash text, event_index smallint, user_id text, coin_id text, trade_type text,
+    amount_raw numeric, sol_amount numeric, created_at timestamptz,
+    trading_fee numeric, current_price numeric, transaction_hash_raw bytea
+) ON COMMIT DELETE ROWS;
+"""
+
+COIN_STAGING_COLUMNS = (
+    'address', 'name', 'creator_id', 'total_supply', 'image_url', 'ticker', 'description',
+    'discord', 'website', 'twitter', 'decimals', 'current_marketcap', 'start_marketcap',
+    'end_marketcap', 'raydium_pool', 'current_price', 'address_raw',
+)
+TRADE_STAGING_COLUMNS = (
+    'transaction_hash', 'event_index', 'user_id', 'coin_id', 'trade_type', 'amount_raw',
+    'sol_amount', 'created_at', 'trading_fee', 'current_price', 'transaction_hash_raw',
+)
+
+# Creators are provisioned before the merge; the join only guards against a missing creator field
+MERGE_COINS = f"""
+INSERT INTO {COIN_TABLE} (
+    address, name, creator_id, created_at, total_supply, image_url, ticker, description,
+    discord, website, twitter, score, decimals, current_marketcap, start_marketcap,
+    end_marketcap, change, migrated, raydium_pool, migration_timestamp, current_price,
+    ath, updated, total_held,
+    volume_5m, volume_1h, volume_24h, trades_5m, trades_1h, trades_24h, change_5m, change_1h, address_raw
+)
+SELECT s.address, s.name, s.creator_id, now(), s.total_supply, s.image_url, s.ticker, s.description,
+       s.discord, s.website, s.twitter, 150, s.decimals, s.current_marketcap, s.start_marketcap,
+       s.end_marketcap, 0, false, s.raydium_pool, NULL, s.current_price,
+       0, now(), 0,
+       0, 0, 0, 0, 0, 0, 0, 0, s.address_raw
+FROM coin_staging s
+JOIN {USER_TABLE} u ON u.wallet_address = s.creator_id
+ON CONFLICT (address) DO NOTHING
+RETURNING address
+"""
+
+# Trades whose coin is unknown are skipped here and parked (users are provisioned first).
+# The conflict target is the partitioned table's unique (transaction_hash, event_index, created_at)
+MERGE_TRADES = f"""
+INSERT INTO {TRADE_TABLE} (
+    transaction_hash, event_index, user_id, coin_id, trade_type, coin_amount, sol_amount, created_at, trading_fee,
+    transaction_hash_raw, user_sid, coin_sid
+)
+SELECT s.transaction_hash, s.event_index, s.user_id, s.coin_id, s.trade_type,
+       round(s.amount_raw / power(10::numeric, c.decimals), c.decimals),
+       s.sol_amount, s.created_at, s.trading_fee,
+       s.transaction_hash_raw, u.sid, c.sid
+FROM trade_staging s
+JOIN {USER_TABLE} u ON u.wallet_address = s.user_id
+JOIN {COIN_TABLE} c ON c.address = s.coin_id
+ON CONFLICT (transaction_hash, event_index, created_at) DO NOTHING
+RETURNING transaction_hash, event_index, user_id, coin_id, trade_type, coin_amount
+"""
+
+# Mints of staged trades whose coin has not been created yet
+MISSING_COINS = f"""
+SELECT DISTINCT s.coin_id
+FROM trade_staging s
+WHERE NOT EXISTS (SELECT 1 FROM {COIN_TABLE} c WHERE c.address = s.coin_id)
+"""
+
+# Latest trade per coin wins; never move a coin's price backwards in time
+UPDATE_COIN_PRICES = f"""
+UPDATE {COIN_TABLE} c
+SET current_price = p.current_price, updated = p.created_at
+FROM (
+    SELECT DISTINCT ON (s.coin_id) s.coin_id, s.current_price, s.created_at
+    FROM trade_staging s
+    JOIN {USER_TABLE} u ON u.wallet_address = s.user_id
+    ORDER BY s.coin_id, s.created_at DESC
+) p
+WHERE c.address = p.coin_id AND c.updated < p.created_at
+"""
+
+
+def _numbered(statement: tuple) -> tuple:
+    """asyncpg arguments of a (sql, params) statement written with DB-API %s placeholders"""
+    sql, params = statement
+    numbers = count(1)
+    return (re.sub(r'%s', lambda _: f'${next(numbers)}', sql), *params)
+
+
+def database_connect_kwargs() -> dict:
+    """asyncpg connection arguments for the default Django database"""
+    db = settings.DATABASES['default']
+    return {
+        'host': db.get('HOST') or None,
+        'port': int(db['PORT']) if db.get('PORT') else None,
+        'user': db.get('USER') or None,
+        'password': db.get('PASSWORD') or None,
+        'database': db.get('NAME'),
+    }
+
+
+class PostgresCopySink:
+    """
+    Writes listener batches straight to Postgres instead of going through Celery.
+
+    Each batch is binary COPYed into a session-local staging table and
+    merged with a single INSERT ... SELECT (plus one UPDATE for coin
+    prices). Holdings, coin totals, rolling market stats and candles of
+    the rows the merge actually inserted are applied in the same
+    transaction, with the statements the Celery path runs, so a replayed
+    batch never applies them twice or not at all.
+    """
+
+    def __init__(self, pool_size=4, **connect_kwargs):
+        """
+        Args:
+            pool_size: Maximum Postgres connections
+            connect_kwargs: asyncpg connection arguments (default: Django's database)
+        """
+        if asyncpg is None:
+            raise RuntimeError("The direct sink needs asyncpg (pip install asyncpg)")
+        self.pool_size = pool_size
+        self.connect_kwargs = connect_kwargs or database_connect_kwargs()
+        self.pool = None
+        self.stats = {'coins': 0, 'trades': 0, 'skipped': 0, 'batches': 0, 'write_time': 0.0}
+
+    async def start(self):
+        self.pool = await asyncpg.create_pool(
+            min_size=1, max_size=self.pool_size, init=self._init_connection, **self.connect_kwargs
+        )
+
+    async def close(self):
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+
+    @staticmethod
+    async def _init_connection(conn):
+        await conn.execute(STAGING_DDL)
+
+    async def write_creates(self, events: list) -> list:
+        """Insert coins for a batch of create events; returns the inserted addresses"""
+        records = [self._coin_record(e['event']) for e in events]
+        start = time.monotonic()
+        await sync_to_async(self._provision)([r[2] for r in records])
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.copy_records_to_table('coin_staging', records=records, columns=COIN_STAGING_COLUMNS)
+                rows = await conn.fetch(MERGE_COINS)
+        addresses = [row['address'] for row in rows]
+        self._record(len(events), len(addresses), time.monotonic() - start, 'coins')
+
+        # Coins merged by an earlier attempt of this batch still release
+        # the trades parked again when that attempt failed to write them
+        released = await sync_to_async(self._after_creates)(addresses, [r[0] for r in records])
+        if released:
+            try:
+                await self.write_trades(released)
+            except Exception:
+                await sync_to_async(requeue_parked)(released)
+                raise
+        return addresses
+
+    async def write_trades(self, events: list) -> list:
+        """Insert trades and update coin prices for a batch; returns the inserted (hash, event_index)"""
+        records = [self._trade_record(e['signature'], e.get('event_index', 0), e['event']) for e in events]
+        start = time.monotonic()
+        await sync_to_async(self._provision)([r[2] for r in records])
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.copy_records_to_table('trade_staging', records=records, columns=TRADE_STAGING_COLUMNS)
+                rows = await conn.fetch(MERGE_TRADES)
+                await conn.execute(UPDATE_COIN_PRICES)
+                missing = {row['coin_id'] for row in await conn.fetch(MISSING_COINS)}
+                inserted = {(row['transaction_hash'], row['event_index']) for row in rows}
+                trade_stats = [
+                    (r[3], r[7], r[6], r[9], bigint_to_float(e['event'].get('sol_raised', 0), 9))
+                    for r, e in zip(records, events) if r[:2] in inserted
+                ]
+                await self._apply_trades(conn, rows, trade_stats)
+        keys = [(row['transaction_hash'], row['event_index']) for row in rows]
+        self._record(len(events), len(keys), time.monotonic() - start, 'trades')
+
+        now = time.time()
+        COMMIT_LAG.observe_many([now - r[7].timestamp() for r in records if r[:2] in inserted], kind='trade')
+
+        if missing:
+            # Released by write_creates once the coin is merged
+            ready = await sync_to_async(park_trades)([e for e in events if e['event'].get('mint') in missing])
+            if ready:
+                try:
+                    keys += await self.write_trades(ready)
+                except Exception:
+                    await sync_to_async(requeue_parked)(ready)
+                    raise
+        return keys
+
+    def _record(self, staged: int, inserted: int, duration: float, kind: str):
+        self.stats[kind] += inserted
+        self.stats['skipped'] += staged - inserted
+        self.stats['batches'] += 1
+        self.stats['write_time'] += duration
+        logger.info(f"Direct sink wrote {inserted}/{staged} {kind} in {duration * 1000:.1f}ms")
+
+    @staticmethod
+    def _coin_record(logs: dict) -> tuple:
+        attributes = logs.get('attributes') or {}
+        return (
+            logs.get("mint"),
+            logs.get("name", ""),
+            logs.get("creator"),
+            Decimal(logs["total_supply"]),
+            logs.get("image", ""),
+            logs.get("symbol", ""),
+            logs.get("description"),
+            attributes.get("discord"),
+            attributes.get("website"),
+            attributes.get("twitter"),
+            9,
+            bigint_to_float(logs["start_mcap"], 9),
+            bigint_to_float(logs["start_mcap"], 9),
+            bigint_to_float(logs["target_sol"], 9),
+            logs.get("raydium_pool"),
+            Decimal(logs["initial_price_per_token"]),
+            raw_pubkey(logs.get("mint")),
+        )
+
+    @staticmethod
+    def _trade_record(signature: str, event_index: int, logs: dict) -> tuple:
+        transfer_type = '0' if logs.get("buyer") else '1'
+        return (
+            signature,
+            event_index,
+            logs.get("buyer") or logs.get("seller"),
+            logs.get("mint"),
+            get_transaction_type(transfer_type),
+            Decimal(logs.get("amount_purchased") or logs.get("amount_sold")),
+            bigint_to_float(logs.get("base_cost") or logs.get("base_proceeds"), 9),
+            datetime.fromtimestamp(logs['timestamp'], tz=dt_timezone.utc),
+            bigint_to_float(logs['trading_fee'], 9),
+            bigint_to_float(logs['current_price'], 9),
+            raw_signature(signature),
+        )
+
+    @staticmethod
+    def _provision(wallets: list):
+        ensure_connection()
+        provision_wallets(wallets)
+
+    @staticmethod
+    def _after_creates(addresses: list, mints: list) -> list:
+        """
+        Bookkeeping for new coins; returns the parked trades of every mint in
+        the batch, which the caller writes
+        """
+        ensure_connection()
+        released = []
+        if addresses:
+            handle_coin_post_create(list(Coin.objects.filter(address__in=addresses)), release_trades=released.extend)
+        released += take_parked(set(mints) - set(addresses))
+        return released
+
+    @staticmethod
+    async def _apply_trades(conn, rows: list, trade_stats: list):
+        """
+        Market stats, candles, holdings, coin totals and holder counts of the
+        merged trades, on the merge's connection and transaction (same order
+        as apply_trades_batch)
+        """
+        statements = market_stats_statements(trade_stats) + candle_statements(trade_stats)
+        for statement in statements:
+            await conn.execute(*_numbered(statement))
+
+        upsert = holdings_upsert_sql(holdings_deltas(
+            (row['user_id'], row['coin_id'], row['trade_type'], row['coin_amount']) for row in rows
+        ))
+        if upsert is None:
+            return
+        holdings = await conn.fetch(*_numbered(upsert))
+        coin_total_deltas, changes = holdings_changes(holdings)
+        for statement in (holdings_cleanup_sql(holdings), coin_totals_sql(coin_total_deltas), holders_counts_sql(changes)):
+            if statement:
+                await conn.execute(*_numbered(statement))
+
+
+class InlineTaskSink:
+    """
+    Runs the Celery batch tasks in this process (as the backfill does)
+    instead of publishing them, so a batch is committed by the time
+    write_*() returns. Lets replay_capture measure end-to-end latency
+    without workers.
+
+    Tasks the batches queue themselves (parked trades released when
+    their coin is created) run eagerly in-process too.
+    """
+
+    def __init__(self):
+        self.stats = {'creates': 0, 'trades': 0, 'batches': 0, 'write_time': 0.0}
+        self._always_eager = None
+
+    async def start(self):
+        conf = process_trades_batch.app.conf
+        self._always_eager = conf.task_always_eager
+        conf.task_always_eager = True
+
+    async def close(self):
+        if self._always_eager is not None:
+            process_trades_batch.app.conf.task_always_eager = self._always_eager
+            self._always_eager = None
+
+    async def write_creates(self, events: list):
+        await self._apply(process_creates_batch, events, 'creates')
+
+    async def write_trades(self, events: list):
+        await self._apply(process_trades_batch, events, 'trades')
+
+    async def _apply(self, task, events: list, kind: str):
+        start = time.monotonic()
+        await sync_to_async(task.apply, thread_sensitive=True)(args=[events], throw=True)
+        self.stats[kind] += len(events)
+        self.stats['batches'] += 1
+        self.stats['write_time'] += time.monotonic() - start
@@ -1,16 +1,29 @@
 # systems/tasks.py
 from celery import shared_task
+from django.conf import settings
 from django.db import transaction
 from decimal import Decimal
 from datetime import datetime, timezone as dt_timezone
-from systems.models import Coin, Trade, SolanaUser
+from systems.models import Coin, Trade
 import logging
 import time
 from celery_sys.utlis import ensure_connection, get_transaction_type, bigint_to_float
-from celery_sys.batched_signals import handle_coin_post_create, handle_trades_post_create
+from celery_sys.batched_signals import handle_coin_post_create, handle_trades_post_create, provision_wallets
+from celery_sys.trade_utils import (
+    insert_trades, bulk_update_coin_prices, bulk_update_market_stats, refresh_coin_market_stats, bulk_update_candles,
+)
+from systems.utils.batching import record_task_duration
+from systems.utils.keys import raw_pubkey, raw_signature
+from systems.utils.routing import split_by_partition, trade_queue_name
+from systems.utils.parking import park_trades, take_parked, release_or_requeue
+from systems.metrics import COMMIT_LAG
 
 logger = logging.getLogger(__name__)
 
+# In-place retries of a failed trade batch (see process_trades_batch)
+TRADE_BATCH_RETRIES = 3
+TRADE_BATCH_RETRY_DELAY = 5
+
 @shared_task(bind=True, max_retries=3, default_retry_delay=5)
 def process_creates_batch(self, events: list):
     """
@@ -30,13 +43,15 @@ def process_creates_batch(self, events: list):
         
         # Prepare bulk data
         coins_to_create = []
-        creators_cache = {}  # Cache creators to avoid multiple queries
         existing_mints = set(
             Coin.objects.filter(
                 address__in=[e['event']['mint'] for e in events]
             ).values_list('address', flat=True)
         )
         
+        # Creators who never connected a wallet get a user now
+        provision_wallets({e['event'].get("creator") for e in events})
+        
         for event_data in events:
             signature = event_data['signature']
             logs = event_data['event']
@@ -49,27 +64,18 @@ def process_creates_batch(self, events: list):
                 logger.debug(f"Coin {mint} already exists, skipping")
                 continue
             
-            # Get or cache creator
-            if creator_wallet not in creators_cache:
-                try:
-                    ensure_connection()
-                    creator = SolanaUser.objects.get(wallet_address=creator_wallet)
-                    creators_cache[creator_wallet] = creator
-                except SolanaUser.DoesNotExist:
-                    logger.warning(f"Creator not found: {creator_wallet}")
-                    creators_cache[creator_wallet] = None
-            
-            creator = creators_cache[creator_wallet]
-            if not creator:
+            if not creator_wallet:
+                logger.warning(f"Create event without creator: {signature}")
                 continue
             
             # Prepare coin object
             attributes = logs.get('attributes') or {}
             coin = Coin(
                 address=mint,
+                address_raw=raw_pubkey(mint),
                 name=logs.get("name", ""),
                 ticker=logs.get("symbol", ""),
-                creator=creator,
+                creator_id=creator_wallet,
                 total_supply=Decimal(str(logs["total_supply"])),
                 image_url=logs.get("image", ""),
                 current_price=Decimal(str(logs["initial_price_per_token"])),
@@ -102,6 +108,14 @@ def process_creates_batch(self, events: list):
         else:
             logger.info("No new coins to create")
         
+        # A retry finds the coins its first attempt created; release the
+        # trades parked again when that attempt failed to publish them
+        if existing_mints:
+            released = take_parked(existing_mints)
+            if released:
+                release_or_requeue(released, publish_trades_batch)
+        
+        record_task_duration('process_creates_batch', len(events), time.time() - start_time)
         return {
             'processed': len(events),
             'created': len(coins_to_create),
@@ -113,153 +127,226 @@ def process_creates_batch(self, events: list):
         # Retry the task
         raise self.retry(exc=e)
 
-@shared_task(bind=True, max_retries=3, default_retry_delay=5)
-def process_trades_batch(self, events: list):
+@shared_task
+def process_trades_batch(events: list):
     """
     Process a batch of trade events
     
+    Failures are retried in place instead of being re-queued with a
+    countdown: a partition queue has a single worker, so blocking it keeps
+    later batches for the same coins from overtaking this one.
+    
     Args:
         events: List of dicts with 'signature' and 'event' keys
     """
     if not events:
         return
     
+    for attempt in range(TRADE_BATCH_RETRIES + 1):
+        try:
+            return apply_trades_batch(events)
+        except Exception as e:
+            if attempt == TRADE_BATCH_RETRIES:
+                logger.error(f"Error processing trade batch, giving up: {e}", exc_info=True)
+                raise
+            logger.error(
+                f"Error processing trade batch, retrying in {TRADE_BATCH_RETRY_DELAY}s: {e}", exc_info=True
+            )
+            time.sleep(TRADE_BATCH_RETRY_DELAY)
+
+def apply_trades_batch(events: list) -> dict:
+    """Write one batch of trade events and everything derived from them"""
     start_time = time.time()
     logger.info(f"Processing batch of {len(events)} trade events")
     
-    try:
-        ensure_connection()
+    ensure_connection()
+    
+    # Prepare bulk data
+    trades_to_create = []
+    coins_to_update = {}  # mint -> (price, timestamp)
+    trade_stats = []  # (mint, timestamp, sol_amount, price, sol_raised), parallel to trades_to_create
+    seen_sigs = set()
+    
+    # Cache coins
+    coins_cache = {}
+    # Trades on coins whose create has not committed yet
+    parked = []
+    
+    # Collect all wallets and mints
+    wallets = set()
+    mints = set()
+    for event_data in events:
+        logs = event_data['event']
+        wallet = logs.get("buyer") or logs.get("seller")
+        mint = logs.get("mint")
+        if wallet:
+            wallets.add(wallet)
+        if mint:
+            mints.add(mint)
+    
+    # Traders who never connected a wallet get a user now
+    provision_wallets(wallets)
+    
+    coins = Coin.objects.filter(address__in=mints)
+    for coin in coins:
+        coins_cache[coin.address] = coin
+    
+    # Process events
+    for event_data in events:
+        signature = event_data['signature']
+        event_index = event_data.get('event_index', 0)
+        logs = event_data['event']
         
-        # Prepare bulk data
-        trades_to_create = []
-        coins_to_update = {}  # mint -> (price, timestamp)
+        # Trades already stored are skipped by the insert itself (ON CONFLICT DO NOTHING)
+        if (signature, event_index) in seen_sigs:
+            logger.debug(f"Trade {signature} #{event_index} repeated in batch, skipping")
+            continue
+        seen_sigs.add((signature, event_index))
         
-        # Get existing signatures to avoid duplicates
-        existing_sigs = set(
-            Trade.objects.filter(
-                transaction_hash__in=[e['signature'] for e in events]
-            ).values_list('transaction_hash', flat=True)
-        )
+        wallet = logs.get("buyer") or logs.get("seller")
+        transfer_type = '0' if logs.get("buyer") else '1'
         
-        # Cache users and coins
-        users_cache = {}
-        coins_cache = {}
+        # Get coin from cache
+        coin = coins_cache.get(logs.get("mint"))
         
-        # Collect all wallets and mints
-        wallets = set()
-        mints = set()
-        for event_data in events:
-            logs = event_data['event']
-            wallet = logs.get("buyer") or logs.get("seller")
-            mint = logs.get("mint")
-            if wallet:
-                wallets.add(wallet)
-            if mint:
-                mints.add(mint)
+        if not wallet:
+            logger.warning(f"Trade without buyer or seller: {signature}")
+            continue
         
-        # Bulk fetch users and coins
-        users = SolanaUser.objects.filter(wallet_address__in=wallets)
-        for user in users:
-            users_cache[user.wallet_address] = user
+        if not coin:
+            # Released by handle_coin_post_create once the coin exists
+            parked.append(event_data)
+            continue
         
-        coins = Coin.objects.filter(address__in=mints)
-        for coin in coins:
-            coins_cache[coin.address] = coin
+        # Prepare trade data
+        amount = logs.get("amount_purchased") or logs.get("amount_sold")
+        sol_cost = logs.get("base_cost") or logs.get("base_proceeds")
+        coin_amount = bigint_to_float(amount, coin.decimals)
+        sol_amount = bigint_to_float(sol_cost, 9)
+        timestamp = datetime.fromtimestamp(logs['timestamp'], tz=dt_timezone.utc)
         
-        # Process events
-        for event_data in events:
-            signature = event_data['signature']
-            logs = event_data['event']
-            
-            # Skip if already exists
-            if signature in existing_sigs:
-                logger.debug(f"Trade {signature} already exists, skipping")
-                continue
-            
-            wallet = logs.get("buyer") or logs.get("seller")
-            transfer_type = '0' if logs.get("buyer") else '1'
-            
-            # Get user and coin from cache
-            user = users_cache.get(wallet)
-            coin = coins_cache.get(logs.get("mint"))
-            
-            if not user:
-                logger.warning(f"User not found: {wallet}")
-                continue
-            
-            if not coin:
-                logger.warning(f"Coin not found: {logs.get('mint')}")
-                continue
-            
-            # Prepare trade data
-            amount = logs.get("amount_purchased") or logs.get("amount_sold")
-            sol_cost = logs.get("base_cost") or logs.get("base_proceeds")
-            coin_amount = bigint_to_float(amount, coin.decimals)
-            sol_amount = bigint_to_float(sol_cost, 9)
-            timestamp = datetime.fromtimestamp(logs['timestamp'], tz=dt_timezone.utc)
-            
-            # Track coin updates (keep the latest timestamp)
-            current_price = bigint_to_float(logs['current_price'], 9)
-            if coin.address not in coins_to_update:
+        # Track coin updates (keep the latest timestamp)
+        current_price = bigint_to_float(logs['current_price'], 9)
+        if coin.address not in coins_to_update:
+            coins_to_update[coin.address] = (current_price, timestamp)
+        else:
+            _, existing_ts = coins_to_update[coin.address]
+            if timestamp > existing_ts:
                 coins_to_update[coin.address] = (current_price, timestamp)
-            else:
-                _, existing_ts = coins_to_update[coin.address]
-                if timestamp > existing_ts:
-                    coins_to_update[coin.address] = (current_price, timestamp)
-            
-            # Create trade object
-            trade = Trade(
-                transaction_hash=signature,
-                user=user,
-                coin=coin,
-                trade_type=get_transaction_type(transfer_type),
-                coin_amount=coin_amount,
-                sol_amount=sol_amount,
-                created_at=timestamp,
-                trading_fee=bigint_to_float(logs['trading_fee'], 9),
-            )
-            trades_to_create.append(trade)
-        
-        # Bulk create trades and update coins in transaction
-        with transaction.atomic():
-            # Create trades
-            if trades_to_create:
-                created_trades = Trade.objects.bulk_create(
-                    trades_to_create,
-                    ignore_conflicts=True,
-                    batch_size=500
-                )
-            
-            # Update coin prices
-            if coins_to_update:
-                for mint, (price, timestamp) in coins_to_update.items():
-                    Coin.objects.filter(
-                        address=mint,
-                        updated__lt=timestamp
-                    ).update(
-                        current_price=price,
-                        updated=timestamp
-                    )
-        if created_trades:
-            handle_trades_post_create(created_trades)
         
-        logger.info(
-            f"Successfully created {len(trades_to_create)} trades "
-            f"and updated {len(coins_to_update)} coins "
-            f"in {time.time() - start_time:.2f}s"
+        # Create trade object
+        trade = Trade(
+            transaction_hash=signature,
+            transaction_hash_raw=raw_signature(signature),
+            event_index=event_index,
+            user_id=wallet,
+            coin=coin,
+            trade_type=get_transaction_type(transfer_type),
+            coin_amount=coin_amount,
+            sol_amount=sol_amount,
+            created_at=timestamp,
+            trading_fee=bigint_to_float(logs['trading_fee'], 9),
         )
+        trades_to_create.append(trade)
+        trade_stats.append((
+            coin.address, timestamp, sol_amount, current_price,
+            bigint_to_float(logs.get('sol_raised', 0), 9),
+        ))
+    
+    # Insert trades and apply everything derived from them in one transaction.
+    # Only rows the insert really added count, so a retried or re-delivered
+    # batch never applies holdings, totals or stats twice. The direct sink
+    # (PostgresCopySink.write_trades) runs the same statements in its merge
+    # transaction; keep the two in step.
+    created_trades = []
+    updated_coins = []
+    with transaction.atomic():
+        # Create trades
+        inserted = insert_trades(trades_to_create)
+        created_trades = [t for t in trades_to_create if (t.transaction_hash, t.event_index) in inserted]
+        created_stats = [
+            stats for t, stats in zip(trades_to_create, trade_stats)
+            if (t.transaction_hash, t.event_index) in inserted
+        ]
         
-        return {
-            'processed': len(events),
-            'created': len(trades_to_create),
-            'coins_updated': len(coins_to_update),
-            'duration': time.time() - start_time
-        }
+        # Update coin prices (one statement for every coin in the batch)
+        updated_coins = bulk_update_coin_prices(coins_to_update)
         
-    except Exception as e:
-        logger.error(f"Error processing trade batch: {e}", exc_info=True)
-        # Retry the task
-        raise self.retry(exc=e)
+        # Rolling volume/change/ATH/market cap from this batch's buckets
+        bulk_update_market_stats(created_stats)
+        
+        # Chart candles (1m/5m/1h/1d)
+        bulk_update_candles(created_stats)
+        
+        # Holdings, coin totals, holder counts
+        handle_trades_post_create(created_trades)
+    if created_trades:
+        now = time.time()
+        COMMIT_LAG.observe_many([now - t.created_at.timestamp() for t in created_trades], kind='trade')
+    
+    # Park after commit, so a retried batch cannot park the same trades twice
+    ready = park_trades(parked)
+    if ready:
+        release_or_requeue(ready, publish_trades_batch)
+    
+    logger.info(
+        f"Successfully created {len(created_trades)}/{len(trades_to_create)} trades "
+        f"and updated {len(updated_coins)} coins "
+        f"in {time.time() - start_time:.2f}s"
+    )
+    
+    record_task_duration('process_trades_batch', len(events), time.time() - start_time)
+    return {
+        'processed': len(events),
+        'created': len(created_trades),
+        'parked': len(parked) - len(ready),
+        'coins_updated': len(updated_coins),
+        'coin_prices': [
+            {'address': address, 'current_price': str(price), 'updated': updated.isoformat()}
+            for address, price, updated in updated_coins
+        ],
+        'duration': time.time() - start_time
+    }
+
+def publish_trades_batch(events: list):
+    """
+    Queue trade events split by mint, so all trades on a coin land on the
+    same partition queue. Each partition queue has a single worker, which
+    keeps holdings and price updates for a coin in order without locks.
+    """
+    partitions = settings.TRADE_PARTITIONS
+    if partitions <= 1:
+        process_trades_batch.delay(events)
+        return
+    for partition, group in split_by_partition(events, partitions).items():
+        process_trades_batch.apply_async(args=[group], queue=trade_queue_name(partition))
+
+@shared_task
+def refresh_market_stats():
+    """
+    Age the rolling coin stats (volume/trades/change windows) of coins
+    with no new trades; batches only refresh the coins they touch.
+    Run with Celery Beat every minute (CELERY_BEAT_SCHEDULE).
+    """
+    start_time = time.time()
+    ensure_connection()
+    refreshed = refresh_coin_market_stats()
+    logger.info(f"Refreshed market stats of {refreshed} coins in {time.time() - start_time:.2f}s")
+    return refreshed
+
+@shared_task
+def maintain_partitions():
+    """
+    Create the monthly Trade/history partitions ahead of time and archive
+    the ones older than PARTITION_RETENTION_MONTHS (see manage_partitions).
+    Run with Celery Beat once a day.
+    """
+    from systems.utils.partitioning import ensure_partitions, archive_cold_partitions
+    ensure_connection()
+    created = ensure_partitions()
+    archived = archive_cold_partitions()
+    logger.info(f"Created {len(created)} partitions, archived {len(archived)}")
+    return {'created': created, 'archived': [name for name, _, _ in archived]}
 
 @shared_task(bind=True)
 def recalc_trader_scores_task(self, trader_ids: list):
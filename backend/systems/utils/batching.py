@@ -0,0 +1,130 @@
+import math
+import time
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from core import celery_app
+from systems.utils.routing import trade_queue_name
+from systems.metrics import TASK_DURATION
+
+logger = logging.getLogger(__name__)
+
+TASK_DURATION_KEY = "batch_task_duration:{}"
+
+
+def record_task_duration(task_name: str, events: int, duration: float):
+    """Called by the batch tasks so listeners can see how long Celery takes per batch"""
+    cache.set(TASK_DURATION_KEY.format(task_name), {'events': events, 'duration': duration}, 300)
+    TASK_DURATION.observe(duration, task=task_name)
+
+
+def get_task_duration(task_name: str) -> dict | None:
+    return cache.get(TASK_DURATION_KEY.format(task_name))
+
+
+def get_celery_queue_depth(app=celery_app) -> int:
+    """Messages waiting in the default and trade partition queues (blocking broker call)"""
+    queues = [app.conf.task_default_queue]
+    queues += [trade_queue_name(i) for i in range(settings.TRADE_PARTITIONS)]
+    depth = 0
+    with app.connection_for_read() as conn:
+        channel = conn.default_channel
+        for queue in queues:
+            try:
+                depth += channel.queue_declare(queue=queue, passive=True).message_count
+            except Exception:
+                continue  # not declared yet, nothing waiting
+    return depth
+
+
+class AdaptiveBatchController:
+    """
+    Picks batch size and flush interval from downstream lag.
+
+    - Celery backlog above `high_watermark`, or tasks slower than the
+      flush interval can feed the workers: wait longer, send bigger
+      batches (fewer, cheaper tasks)
+    - backlog at or below `low_watermark`: flush sooner, batches sized
+      to what arrives in one interval (lower latency)
+    - otherwise hold
+
+    Everything stays within [min_batch_size, max_batch_size] and
+    [min_delay, max_delay]; max_delay is the latency bound.
+    """
+
+    def __init__(self, min_batch_size=10, max_batch_size=500, min_delay=0.05, max_delay=2.0,
+                 high_watermark=20, low_watermark=2, worker_concurrency=4, step=1.5):
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.worker_concurrency = worker_concurrency
+        self.step = step
+
+        self.batch_size = min_batch_size
+        self.batch_delay = min_delay
+
+        self.arrivals = 0
+        self.arrival_rate = 0.0
+        self._last_update = time.monotonic()
+        self.stats = {
+            'batch_size': self.batch_size,
+            'batch_delay': self.batch_delay,
+            'arrival_rate': 0.0,
+            'celery_queue_depth': 0,
+            'task_duration': 0.0,
+            'grows': 0,
+            'shrinks': 0,
+        }
+
+    def record_arrival(self, count: int = 1):
+        self.arrivals += count
+
+    def update(self, queue_depth: int, task_duration: float | None = None):
+        """
+        Re-evaluate batch size and delay.
+
+        Args:
+            queue_depth: Messages waiting in the Celery queue
+            task_duration: Seconds the most recent batch task took, if known
+        """
+        now = time.monotonic()
+        elapsed = max(now - self._last_update, 1e-6)
+        self._last_update = now
+        rate = self.arrivals / elapsed
+        self.arrivals = 0
+        # Smooth out bursts so one quiet tick doesn't collapse the batch size
+        self.arrival_rate = rate if not self.arrival_rate else 0.7 * self.arrival_rate + 0.3 * rate
+
+        slow_tasks = bool(task_duration) and task_duration > self.batch_delay * self.worker_concurrency
+        if queue_depth >= self.high_watermark or slow_tasks:
+            delay = min(self.batch_delay * self.step, self.max_delay)
+            size = max(self.batch_size * self.step, self.arrival_rate * delay)
+        elif queue_depth <= self.low_watermark:
+            delay = max(self.batch_delay / self.step, self.min_delay)
+            size = self.arrival_rate * delay
+        else:
+            delay, size = self.batch_delay, self.batch_size
+
+        size = min(max(math.ceil(size), self.min_batch_size), self.max_batch_size)
+        if size > self.batch_size or delay > self.batch_delay:
+            self.stats['grows'] += 1
+        elif size < self.batch_size or delay < self.batch_delay:
+            self.stats['shrinks'] += 1
+        if (size, delay) != (self.batch_size, self.batch_delay):
+            logger.debug(
+                f"Batch size {self.batch_size} -> {size}, delay {self.batch_delay:.2f}s -> {delay:.2f}s "
+                f"(celery depth {queue_depth}, {self.arrival_rate:.0f} events/s)"
+            )
+        self.batch_size, self.batch_delay = size, delay
+
+        self.stats.update({
+            'batch_size': size,
+            'batch_delay': delay,
+            'arrival_rate': self.arrival_rate,
+            'celery_queue_depth': queue_depth,
+            'task_duration': task_duration or 0.0,
+        })
+        return size, delay
@@ -12,6 +12,16 @@ def _broadcast(info: dict, group: str = "events"):
         }
     )
 
+async def broadcast_async(info: dict, group: str = "events"):
+    """_broadcast for code already running in an event loop (the listener)"""
+    await get_channel_layer().group_send(
+        group,
+        {
+            "type": "solana_event",
+            "data": info,
+        }
+    )
+
 def broadcast_coin_created(instance: Coin):
     coin_info = {
         "address": instance.address,
@@ -31,6 +41,7 @@ def broadcast_coin_created(instance: Coin):
 def broadcast_trade_created(instance: Trade):
     trade_info = {
         "transaction_hash": instance.transaction_hash,
+        "event_index": instance.event_index,
         "user": instance.user.wallet_address,
         "coin_address": instance.coin.address,
         "trade_type": instance.trade_type,
@@ -0,0 +1,95 @@
+import gzip
+import json
+import logging
+import os
+import time
+import zlib
+from types import SimpleNamespace
+
+logger = logging.getLogger(__name__)
+
+
+class TrafficRecorder:
+    """
+    Appends the notifications a listener receives to a gzip-compressed
+    JSONL capture, one object per notification:
+        {"ts": 1718000000.123, "slot": 270000000, "signature": "...", "logs": [...], "err": null}
+
+    `ts` is the wall-clock arrival time, so a replay can reproduce the
+    original traffic shape. Every open appends a new gzip member; a capture
+    cut short by a crash is readable up to its last flush.
+    """
+
+    def __init__(self, path, flush_interval=1.0):
+        """
+        Args:
+            path: Capture file (created with its directory if missing)
+            flush_interval: Seconds between flushes of the compressed stream
+        """
+        self.path = str(path)
+        self.flush_interval = flush_interval
+        self.recorded = 0
+        self._file = None
+        self._last_flush = 0
+
+    def open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = gzip.open(self.path, 'at', encoding='utf-8')
+        self._last_flush = time.monotonic()
+        logger.info(f"Recording listener traffic to {self.path}")
+
+    def record(self, value, slot=None):
+        """Append one notification (a logs value object or dict)"""
+        if self._file is None:
+            return
+        if isinstance(value, dict):
+            signature, logs, err = value.get('signature'), value.get('logs'), value.get('err')
+        else:
+            signature = getattr(value, 'signature', None)
+            logs = getattr(value, 'logs', None)
+            err = getattr(value, 'err', None)
+
+        self._file.write(json.dumps({
+            'ts': time.time(),
+            'slot': slot,
+            'signature': str(signature) if signature is not None else None,
+            'logs': list(logs or []),
+            'err': None if err is None else str(err),
+        }) + "\n")
+        self.recorded += 1
+
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_interval:
+            self._file.flush()
+            self._last_flush = now
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            logger.info(f"Recorded {self.recorded} notifications to {self.path}")
+
+
+def read_capture(path):
+    """
+    Yield (ts, slot, value) from a capture, in recorded order. `value`
+    has the signature/logs/err attributes EventHandler.process_event reads.
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn last line of a capture that was not closed cleanly
+                    logger.warning(f"Skipping unreadable capture line in {path}")
+                    continue
+                yield entry['ts'], entry.get('slot'), SimpleNamespace(
+                    signature=entry['signature'], logs=entry.get('logs') or [], err=entry.get('err'),
+                )
+        except (EOFError, gzip.BadGzipFile, zlib.error) as e:
+            logger.warning(f"Capture {path} ends early ({e}); replaying what was flushed")
@@ -0,0 +1,111 @@
+import logging
+from django.db import connection
+from systems.models import SolanaUser, Coin, Trade, UserCoinHoldings
+from systems.utils.keys import raw_pubkey, raw_signature
+
+logger = logging.getLogger(__name__)
+
+# Raw key columns of migration 0046: model -> (base58 column, raw column, encoder)
+RAW_KEYS = {
+    SolanaUser: ('wallet_address', 'wallet_address_raw', raw_pubkey),
+    Coin: ('address', 'address_raw', raw_pubkey),
+    Trade: ('transaction_hash', 'transaction_hash_raw', raw_signature),
+}
+
+# Tables carrying SolanaUser.sid / Coin.sid next to their text foreign keys
+SID_MODELS = (Trade, UserCoinHoldings)
+
+
+def backfill_raw_keys(model, batch_size: int = 5000) -> tuple:
+    """
+    Fill `model`'s raw key column where it is NULL, `batch_size` rows per
+    UPDATE, in primary key order. Keys that are not valid base58 stay NULL.
+
+    Returns:
+      (rows filled, rows left NULL because their key does not decode)
+    """
+    text_column, raw_column, encode = RAW_KEYS[model]
+    table = connection.ops.quote_name(model._meta.db_table)
+    pk = model._meta.pk.column
+    filled = undecodable = 0
+    last = None
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT {pk}, {text_column} FROM {table}
+                WHERE {raw_column} IS NULL {f"AND {pk} > %s" if last is not None else ""}
+                ORDER BY {pk} LIMIT %s
+                """,
+                ([last] if last is not None else []) + [batch_size],
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                return filled, undecodable
+            last = rows[-1][0]
+
+            values = [(key, encode(text)) for key, text in rows]
+            values = [(key, raw) for key, raw in values if raw is not None]
+            undecodable += len(rows) - len(values)
+            if values:
+                cursor.execute(
+                    f"""
+                    UPDATE {table} AS t SET {raw_column} = v.raw
+                    FROM (VALUES {", ".join(["(%s, %s::bytea)"] * len(values))}) AS v(key, raw)
+                    WHERE t.{pk} = v.key
+                    """,
+                    [value for row in values for value in row],
+                )
+                filled += cursor.rowcount
+
+
+def backfill_sids(model, batch_size: int = 5000) -> int:
+    """
+    Fill user_sid / coin_sid of `model` rows where either is NULL from the
+    user and coin, `batch_size` rows per UPDATE, in id order.
+
+    Returns:
+      rows updated
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    user_table = connection.ops.quote_name(SolanaUser._meta.db_table)
+    coin_table = connection.ops.quote_name(Coin._meta.db_table)
+    updated = 0
+    last = 0
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT id FROM {table}
+                WHERE (user_sid IS NULL OR coin_sid IS NULL) AND id > %s
+                ORDER BY id LIMIT %s
+                """,
+                [last, batch_size],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                return updated
+            last = ids[-1]
+
+            cursor.execute(
+                f"""
+                UPDATE {table} AS t SET user_sid = u.sid, coin_sid = c.sid
+                FROM {user_table} u, {coin_table} c
+                WHERE t.id = ANY(%s) AND u.wallet_address = t.user_id AND c.address = t.coin_id
+                """,
+                [ids],
+            )
+            updated += cursor.rowcount
+
+
+def missing_compact_keys() -> dict:
+    """{(table, column): rows still NULL} for every compact key column"""
+    columns = [(model, raw_column) for model, (_, raw_column, _) in RAW_KEYS.items()]
+    columns += [(model, column) for model in SID_MODELS for column in ('user_sid', 'coin_sid')]
+    missing = {}
+    with connection.cursor() as cursor:
+        for model, column in columns:
+            table = model._meta.db_table
+            cursor.execute(f"SELECT count(*) FROM {connection.ops.quote_name(table)} WHERE {column} IS NULL")
+            missing[(table, column)] = cursor.fetchone()[0]
+    return missing
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+import aiohttp
+from django.core.cache import cache
+from systems.metrics import IPFS_FETCH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GATEWAYS = [
+    "https://ipfs.io/ipfs/",
+    "https://cloudflare-ipfs.com/ipfs/",
+    "https://gateway.pinata.cloud/ipfs/",
+]
+
+
+class IpfsMetadataFetcher:
+    """
+    Fetches token metadata JSON from IPFS gateways.
+
+    - hedged: the next gateway is started after `hedge_delay` (or at once
+      when the previous one fails) and the first 200 wins
+    - at most `max_in_flight` requests per gateway
+    - in-process LRU in front of the Redis `ipfs_metadata:` cache
+    - failed CIDs are remembered for `negative_ttl` seconds (the newest
+      `lru_size` in process, all of them in Redis)
+    - concurrent fetches of the same CID share one Redis lookup and
+      request, which keep running if the caller that started them is
+      cancelled
+    - Redis is read and written in a worker thread, off the event loop
+    """
+
+    def __init__(self, gateways=None, hedge_delay=0.5, request_timeout=10,
+                 max_in_flight=8, lru_size=1024, cache_ttl=3600, negative_ttl=60):
+        self.gateways = gateways or DEFAULT_GATEWAYS
+        self.hedge_delay = hedge_delay
+        self.request_timeout = request_timeout
+        self.cache_ttl = cache_ttl
+        self.negative_ttl = negative_ttl
+        self.lru_size = lru_size
+
+        self.session = None
+        self.semaphores = {gateway: asyncio.Semaphore(max_in_flight) for gateway in self.gateways}
+        self._lru = OrderedDict()
+        self._failures = OrderedDict()  # ipfs_hash -> monotonic expiry, oldest first
+        self._in_flight = {}  # ipfs_hash -> Task
+        self.stats = {
+            gateway: {'wins': 0, 'errors': 0, 'latency_total': 0.0}
+            for gateway in self.gateways
+        }
+
+    async def get_session(self):
+        if self.session is None or self.session.closed:
+            timeout = aiohttp.ClientTimeout(total=self.request_timeout)
+            self.session = aiohttp.ClientSession(timeout=timeout)
+        return self.session
+
+    async def close(self):
+        for task in list(self._in_flight.values()):
+            task.cancel()
+        if self.session and not self.session.closed:
+            await self.session.close()
+
+    async def fetch(self, ipfs_hash: str) -> dict | None:
+        """Metadata for `ipfs_hash`, or None if no gateway could serve it"""
+        if ipfs_hash in self._lru:
+            self._lru.move_to_end(ipfs_hash)
+            return self._lru[ipfs_hash]
+
+        if self._is_negative(ipfs_hash):
+            return None
+
+        task = self._in_flight.get(ipfs_hash)
+        if task is None:
+            task = asyncio.create_task(self._fetch_and_cache(ipfs_hash))
+            self._in_flight[ipfs_hash] = task
+            task.add_done_callback(lambda done: self._fetch_done(ipfs_hash, done))
+        # Shielded: a cancelled caller leaves the shared fetch running for the others
+        return await asyncio.shield(task)
+
+    async def _fetch_and_cache(self, ipfs_hash: str) -> dict | None:
+        key, miss_key = f"ipfs_metadata:{ipfs_hash}", f"ipfs_metadata_miss:{ipfs_hash}"
+        cached = await asyncio.to_thread(cache.get_many, [key, miss_key])
+        if cached.get(miss_key):
+            return None
+        if cached.get(key):
+            self._remember(ipfs_hash, cached[key])
+            return cached[key]
+
+        content = await self._fetch_hedged(ipfs_hash)
+        if content is None:
+            await self._record_failure(ipfs_hash)
+        else:
+            self._remember(ipfs_hash, content)
+            await asyncio.to_thread(cache.set, key, content, self.cache_ttl)
+        return content
+
+    def _fetch_done(self, ipfs_hash: str, task: asyncio.Task):
+        self._in_flight.pop(ipfs_hash, None)
+        if not task.cancelled():
+            task.exception()  # mark retrieved when every caller was cancelled
+
+    async def _fetch_hedged(self, ipfs_hash: str) -> dict | None:
+        pending = set()
+        remaining = list(self.gateways)
+        try:
+            while remaining or pending:
+                if remaining:
+                    pending.add(asyncio.create_task(self._fetch_one(remaining.pop(0), ipfs_hash)))
+
+                # Wait for a result, but hedge to the next gateway after hedge_delay
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=self.hedge_delay if remaining else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    content = task.result()
+                    if content is not None:
+                        return content
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _fetch_one(self, gateway: str, ipfs_hash: str) -> dict | None:
+        url = f"{gateway}{ipfs_hash}"
+        stats = self.stats[gateway]
+        session = await self.get_session()
+        async with self.semaphores[gateway]:
+            start = time.monotonic()
+            try:
+                async with session.get(url) as response:
+                    if response.status != 200:
+                        logger.debug(f"IPFS fetch failed: {response.status} - {url}")
+                        stats['errors'] += 1
+                        IPFS_FETCH_SECONDS.observe(time.monotonic() - start, gateway=gateway, result='error')
+                        return None
+                    content = await response.json(content_type=None)
+                    if not isinstance(content, dict):
+                        stats['errors'] += 1
+                        IPFS_FETCH_SECONDS.observe(time.monotonic() - start, gateway=gateway, result='error')
+                        return None
+                    stats['wins'] += 1
+                    stats['latency_total'] += time.monotonic() - start
+                    IPFS_FETCH_SECONDS.observe(time.monotonic() - start, gateway=gateway, result='ok')
+                    return content
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.debug(f"Error fetching from {url}: {e}")
+                stats['errors'] += 1
+                IPFS_FETCH_SECONDS.observe(time.monotonic() - start, gateway=gateway, result='error')
+                return None
+
+    def _remember(self, ipfs_hash: str, content: dict):
+        self._lru[ipfs_hash] = content
+        self._lru.move_to_end(ipfs_hash)
+        if len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def _is_negative(self, ipfs_hash: str) -> bool:
+        """Failed recently in this process (Redis is checked by _fetch_and_cache)"""
+        expiry = self._failures.get(ipfs_hash)
+        if expiry is not None:
+            if expiry > time.monotonic():
+                return True
+            del self._failures[ipfs_hash]
+        return False
+
+    async def _record_failure(self, ipfs_hash: str):
+        logger.warning(f"No gateway could serve {ipfs_hash}, not retrying for {self.negative_ttl}s")
+        self._failures[ipfs_hash] = time.monotonic() + self.negative_ttl
+        self._failures.move_to_end(ipfs_hash)
+        if len(self._failures) > self.lru_size:
+            self._failures.popitem(last=False)
+        await asyncio.to_thread(cache.set, f"ipfs_metadata_miss:{ipfs_hash}", True, self.negative_ttl)
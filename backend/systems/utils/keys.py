@@ -0,0 +1,51 @@
+from typing import Optional
+from solders.pubkey import Pubkey
+from solders.signature import Signature
+from systems.parser import pubkey_to_str
+
+# Raw widths of the base58 pubkeys (44 chars) and signatures (88 chars) used as keys.
+# The *_raw columns of migration 0046 store these bytes next to the base58 text;
+# ingest and the wallet-connect views fill them, backfill_compact_keys the rest.
+PUBKEY_BYTES = 32
+SIGNATURE_BYTES = 64
+
+
+def pubkey_to_bytes(address: str) -> bytes:
+    """Decode a base58 wallet / mint address into its 32 raw bytes"""
+    try:
+        return bytes(Pubkey.from_string(address))
+    except ValueError:
+        raise ValueError(f"Invalid base58 pubkey: {address!r}")
+
+
+def signature_to_bytes(signature: str) -> bytes:
+    """Decode a base58 transaction signature into its 64 raw bytes"""
+    try:
+        return bytes(Signature.from_string(signature))
+    except ValueError:
+        raise ValueError(f"Invalid base58 signature: {signature!r}")
+
+
+def bytes_to_pubkey(raw: bytes) -> str:
+    return pubkey_to_str(bytes(raw))
+
+
+def bytes_to_signature(raw: bytes) -> str:
+    """Base58 encode a 64-byte transaction signature (Trade.transaction_hash)"""
+    return str(Signature.from_bytes(bytes(raw)))
+
+
+def raw_pubkey(address: Optional[str]) -> Optional[bytes]:
+    """pubkey_to_bytes for the *_raw columns: None (stored as NULL) when `address` is not a pubkey"""
+    try:
+        return pubkey_to_bytes(address) if address else None
+    except ValueError:
+        return None
+
+
+def raw_signature(signature: Optional[str]) -> Optional[bytes]:
+    """signature_to_bytes for Trade.transaction_hash_raw: None when `signature` is not a signature"""
+    try:
+        return signature_to_bytes(signature) if signature else None
+    except ValueError:
+        return None
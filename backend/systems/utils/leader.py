@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import time
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Only the owner may extend or drop the lease
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisLease:
+    """
+    A named lease held by at most one owner: SET NX PX to take it, an
+    owner-checked PEXPIRE to keep it, an owner-checked DEL to hand it over.
+    Falls back to cache.add()/touch() when the cache is not Redis.
+    """
+
+    def __init__(self, key: str, owner: str, ttl: float = 5.0, cache_backend=cache):
+        """
+        Args:
+            key: Lease name
+            owner: Unique id of this replica
+            ttl: Seconds the lease survives without renewal (failover time after a crash)
+        """
+        self.key = key
+        self.owner = owner
+        self.ttl = ttl
+        self.cache = cache_backend
+
+    def _redis(self):
+        client = getattr(self.cache, 'client', None)
+        if client is None or not hasattr(client, 'get_client'):
+            return None
+        return client.get_client(write=True)
+
+    def acquire(self) -> bool:
+        """Take the lease if nobody holds it, or keep it if we do"""
+        redis = self._redis()
+        if redis is None:
+            if self.cache.add(self.key, self.owner, self.ttl):
+                return True
+            return self.renew()
+        if redis.set(self.cache.make_key(self.key), self.owner, nx=True, px=int(self.ttl * 1000)):
+            return True
+        return self.renew()
+
+    def renew(self) -> bool:
+        redis = self._redis()
+        if redis is None:
+            return self.cache.get(self.key) == self.owner and self.cache.touch(self.key, self.ttl)
+        return bool(redis.eval(RENEW_SCRIPT, 1, self.cache.make_key(self.key), self.owner, int(self.ttl * 1000)))
+
+    def release(self):
+        redis = self._redis()
+        if redis is None:
+            if self.cache.get(self.key) == self.owner:
+                self.cache.delete(self.key)
+            return
+        redis.eval(RELEASE_SCRIPT, 1, self.cache.make_key(self.key), self.owner)
+
+    def holder(self):
+        redis = self._redis()
+        if redis is None:
+            return self.cache.get(self.key)
+        value = redis.get(self.cache.make_key(self.key))
+        return value.decode() if value is not None else None
+
+
+class LeaderElector:
+    """
+    Keeps trying to hold a RedisLease. is_leader is only True while the
+    last successful renewal is younger than the lease TTL, so a replica
+    cut off from Redis steps down before anyone else can take over.
+    """
+
+    def __init__(self, lease: RedisLease, renew_interval: float | None = None):
+        self.lease = lease
+        self.renew_interval = renew_interval or lease.ttl / 3
+        self._held_since = None
+        self._renewed_at = None
+        self.stats = {'elections_won': 0, 'leases_lost': 0, 'renew_errors': 0}
+
+    @property
+    def is_leader(self) -> bool:
+        return self._renewed_at is not None and time.monotonic() - self._renewed_at < self.lease.ttl
+
+    async def step(self):
+        """One acquire/renew attempt"""
+        attempt_at = time.monotonic()
+        try:
+            held = await asyncio.to_thread(self.lease.acquire)
+        except Exception as e:
+            self.stats['renew_errors'] += 1
+            logger.warning(f"Leader lease check failed: {e}")
+            held = None  # unknown; is_leader lapses on its own after the TTL
+
+        if held:
+            if self._held_since is None:
+                self._held_since = attempt_at
+                self.stats['elections_won'] += 1
+                logger.info(f"Replica {self.lease.owner} is now the leader ({self.lease.key})")
+            self._renewed_at = attempt_at
+        elif held is False and self._held_since is not None:
+            self._lost()
+
+    def _lost(self):
+        self.stats['leases_lost'] += 1
+        logger.warning(f"Replica {self.lease.owner} lost the leader lease, standing by")
+        self._held_since = None
+        self._renewed_at = None
+
+    async def run(self):
+        while True:
+            await self.step()
+            if self._held_since is not None and not self.is_leader:
+                self._lost()
+            await asyncio.sleep(self.renew_interval)
+
+    async def resign(self):
+        """Hand the lease over right away (graceful shutdown)"""
+        if self._held_since is None:
+            return
+        self._held_since = None
+        self._renewed_at = None
+        try:
+            await asyncio.to_thread(self.lease.release)
+        except Exception as e:
+            logger.warning(f"Could not release leader lease: {e}")
@@ -0,0 +1,126 @@
+import json
+import logging
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from systems.models import Coin
+from systems.metrics import PARKED_TRADES
+
+logger = logging.getLogger(__name__)
+
+PARKED_KEY = "parked_trades:{}"
+
+
+def _redis():
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except Exception:
+        return None
+
+
+def _group_by_mint(events: list) -> OrderedDict:
+    groups = OrderedDict()
+    for event_data in events:
+        groups.setdefault(event_data['event'].get('mint'), []).append(event_data)
+    return groups
+
+
+def park_trades(events: list) -> list:
+    """
+    Hold trade events whose coin does not exist yet, keyed by mint, in
+    arrival order. They are released by take_parked() when the coin's
+    create commits (handle_coin_post_create); a mint that never shows up
+    expires after PARKED_TRADE_TTL.
+
+    Returns:
+        Events whose coin committed while they were being parked; the
+        caller processes these now instead
+    """
+    if not events:
+        return []
+    groups = _group_by_mint(events)
+    ttl = settings.PARKED_TRADE_TTL
+    client = _redis()
+    if client is None:
+        for mint, group in groups.items():
+            key = PARKED_KEY.format(mint)
+            cache.set(key, cache.get(key, []) + group, ttl)
+    else:
+        pipe = client.pipeline(transaction=False)
+        for mint, group in groups.items():
+            key = PARKED_KEY.format(mint)
+            pipe.rpush(key, *[json.dumps(event_data) for event_data in group])
+            pipe.expire(key, ttl)
+        pipe.execute()
+    PARKED_TRADES.inc(len(events), result='parked')
+    logger.info(f"Parked {len(events)} trades for {len(groups)} coins not created yet")
+
+    # The create may have committed (and released) between the caller's
+    # coin lookup and the push above; nothing else would pick these up
+    arrived = list(Coin.objects.filter(address__in=list(groups)).values_list('address', flat=True))
+    return take_parked(arrived)
+
+
+def take_parked(mints) -> list:
+    """
+    Remove and return the parked trades of `mints`, in the order they were
+    parked. Hand them on with release_or_requeue(), so a failed publish
+    does not lose them.
+    """
+    mints = [mint for mint in mints if mint]
+    if not mints:
+        return []
+    keys = [PARKED_KEY.format(mint) for mint in mints]
+    client = _redis()
+    if client is None:
+        lists = [cache.get(key) or [] for key in keys]
+        cache.delete_many(keys)
+        events = [event_data for group in lists for event_data in group]
+    else:
+        pipe = client.pipeline(transaction=True)  # read and delete atomically
+        for key in keys:
+            pipe.lrange(key, 0, -1)
+            pipe.delete(key)
+        results = pipe.execute()
+        events = [json.loads(item) for items in results[0::2] for item in items]
+
+    if events:
+        PARKED_TRADES.inc(len(events), result='released')
+        logger.info(f"Released {len(events)} parked trades")
+    return events
+
+
+def requeue_parked(events: list):
+    """Put taken trades back at the head of their coin's list, ahead of any parked since"""
+    if not events:
+        return
+    groups = _group_by_mint(events)
+    ttl = settings.PARKED_TRADE_TTL
+    client = _redis()
+    if client is None:
+        for mint, group in groups.items():
+            key = PARKED_KEY.format(mint)
+            cache.set(key, group + cache.get(key, []), ttl)
+    else:
+        pipe = client.pipeline(transaction=False)
+        for mint, group in groups.items():
+            key = PARKED_KEY.format(mint)
+            # LPUSH prepends one by one, so push the newest first
+            pipe.lpush(key, *[json.dumps(event_data) for event_data in reversed(group)])
+            pipe.expire(key, ttl)
+        pipe.execute()
+    PARKED_TRADES.inc(len(events), result='requeued')
+    logger.warning(f"Requeued {len(events)} parked trades after a failed release")
+
+
+def release_or_requeue(events: list, release):
+    """
+    Hand taken trades to `release`; if it raises they are parked again and
+    the error propagates, so whoever retries releases them once more.
+    """
+    try:
+        release(events)
+    except Exception:
+        requeue_parked(events)
+        raise
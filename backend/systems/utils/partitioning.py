@@ -0,0 +1,198 @@
+import csv
+import gzip
+import logging
+import os
+from datetime import date, datetime, timezone as dt_timezone
+from django.conf import settings
+from django.db import connection, transaction
+from systems.models import Trade, TraderHistory, CoinHistory
+
+logger = logging.getLogger(__name__)
+
+# Tables range-partitioned by month (migration 0044) -> partition key
+PARTITIONED_MODELS = {
+    Trade: 'created_at',
+    TraderHistory: 'created_at',
+    CoinHistory: 'created_at',
+}
+
+
+def month_start(day: date, offset: int = 0) -> date:
+    """First day of the month `offset` months after `day`'s"""
+    months = day.year * 12 + day.month - 1 + offset
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+def list_partitions(model) -> list:
+    """
+    [(name, lower, upper, estimated rows), ...] of the monthly partitions
+    attached to `model`'s table, oldest first (the default partition is left out)
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass
+            """,
+            [table],
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound, estimate in rows:
+        if bound == 'DEFAULT':
+            continue
+        # FOR VALUES FROM ('2025-01-01 00:00:00+00') TO ('2025-02-01 00:00:00+00')
+        lower, upper = [part.split("'")[1] for part in bound.split(' TO ')]
+        partitions.append((
+            name,
+            datetime.fromisoformat(lower).date(),
+            datetime.fromisoformat(upper).date(),
+            max(estimate, 0),
+        ))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def create_month_partition(model, month: date) -> bool:
+    """
+    Add the partition for `month` unless it exists. Rows that already
+    landed in the default partition for that month are moved into it, so
+    a late run never fails on them. Returns True if it was created.
+    """
+    table = model._meta.db_table
+    key = PARTITIONED_MODELS[model]
+    name = partition_name(table, month)
+    lower, upper = month_start(month), month_start(month, 1)
+    if any(p[0] == name for p in list_partitions(model)):
+        return False
+
+    qn = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {qn(name)} (LIKE {qn(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {qn(default_partition_name(table))}
+                WHERE {qn(key)} >= %s AND {qn(key)} < %s
+                RETURNING *
+            )
+            INSERT INTO {qn(name)} SELECT * FROM moved
+            """,
+            [lower, upper],
+        )
+        if cursor.rowcount:
+            logger.warning(f"Moved {cursor.rowcount} rows of {table} from the default partition into {name}")
+        cursor.execute(
+            f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} FOR VALUES FROM (%s) TO (%s)",
+            [lower, upper],
+        )
+    logger.info(f"Created partition {name}")
+    return True
+
+
+def ensure_partitions(months_ahead: int = None, today: date = None) -> list:
+    """Pre-create this month's and the next `months_ahead` months' partitions of every partitioned table"""
+    months_ahead = settings.PARTITION_PREMAKE_MONTHS if months_ahead is None else months_ahead
+    today = today or datetime.now(dt_timezone.utc).date()
+    created = []
+    for model in PARTITIONED_MODELS:
+        for offset in range(months_ahead + 1):
+            month = month_start(today, offset)
+            if create_month_partition(model, month):
+                created.append(partition_name(model._meta.db_table, month))
+    return created
+
+
+def adopt_default_rows(model, before: date) -> list:
+    """
+    Give rows that fell into the default partition before `before` their
+    own month partitions, so the archival policy reaches them too
+    """
+    table = model._meta.db_table
+    key = PARTITIONED_MODELS[model]
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT DISTINCT date_trunc('month', {qn(key)} AT TIME ZONE 'UTC')::date
+            FROM {qn(default_partition_name(table))} WHERE {qn(key)} < %s
+            """,
+            [before],
+        )
+        months = sorted(row[0] for row in cursor.fetchall())
+    return [partition_name(table, month) for month in months if create_month_partition(model, month)]
+
+
+def cold_partitions(model, keep_months: int, today: date = None) -> list:
+    """Partitions entirely older than the current month minus `keep_months`"""
+    today = today or datetime.now(dt_timezone.utc).date()
+    cutoff = month_start(today, -keep_months)
+    return [p for p in list_partitions(model) if p[2] <= cutoff]
+
+
+def archive_partition(model, name: str, archive_dir: str) -> tuple:
+    """
+    Detach a partition, export it to <archive_dir>/<table>/<partition>.csv.gz
+    (CSV with header, as COPY writes it) and drop it. The table is only
+    dropped once the file holds every row; on failure it stays detached.
+
+    Returns:
+      (path, rows)
+    """
+    table = model._meta.db_table
+    qn = connection.ops.quote_name
+    directory = os.path.join(archive_dir, table)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.csv.gz")
+
+    with connection.cursor() as cursor:
+        # Queries on the parent stop seeing it from here on
+        cursor.execute(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}")
+        cursor.execute(f"SELECT count(*) FROM {qn(name)}")
+        rows = cursor.fetchone()[0]
+
+        partial = f"{path}.part"
+        with gzip.open(partial, 'wb') as f:
+            cursor.cursor.copy_expert(f"COPY {qn(name)} TO STDOUT WITH (FORMAT csv, HEADER)", f)
+        with gzip.open(partial, 'rt', newline='') as f:
+            exported = sum(1 for _ in csv.reader(f)) - 1
+        if exported != rows:
+            raise RuntimeError(f"Exported {exported} of {rows} rows of {name}; partition kept (detached)")
+        os.replace(partial, path)
+        cursor.execute(f"DROP TABLE {qn(name)}")
+
+    logger.info(f"Archived {rows} rows of {name} to {path}")
+    return path, rows
+
+
+def archive_cold_partitions(keep_months: int = None, archive_dir: str = None, today: date = None) -> list:
+    """
+    Archival policy: every partition older than `keep_months` full months
+    is exported and dropped (0 keeps everything).
+
+    Returns:
+      [(partition, path, rows), ...]
+    """
+    keep_months = settings.PARTITION_RETENTION_MONTHS if keep_months is None else keep_months
+    archive_dir = archive_dir or settings.PARTITION_ARCHIVE_DIR
+    if keep_months <= 0:
+        return []
+    today = today or datetime.now(dt_timezone.utc).date()
+    archived = []
+    for model in PARTITIONED_MODELS:
+        adopt_default_rows(model, month_start(today, -keep_months))
+        for name, _, _, _ in cold_partitions(model, keep_months, today):
+            path, rows = archive_partition(model, name, archive_dir)
+            archived.append((name, path, rows))
+    return archived
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from systems.celery_sys.utlis import bigint_to_float
+from systems.metrics import PROMOTION_SECONDS
+from systems.utils.broadcast import broadcast_async
+
+logger = logging.getLogger(__name__)
+
+
+def _amount(value: int) -> str:
+    """Lamport-style integer as a plain decimal string (no exponent), like the Decimal fields"""
+    return f"{bigint_to_float(value, 9):f}"
+
+
+class ProvisionalLedger:
+    """
+    Events seen at `processed` commitment, broadcast straight away as
+    provisional and held until their `confirmed` notification arrives.
+
+    - add(): a processed notification; broadcasts status "provisional"
+    - confirm(): the confirmed notification; broadcasts status "confirmed"
+    - expire(): anything unconfirmed after `timeout` is broadcast as
+      "rolled_back" (dropped fork or failed transaction)
+
+    Nothing here writes to the database: Trade and UserCoinHoldings only
+    change through the confirmed pipeline, so a rollback never has to
+    undo a balance.
+    """
+
+    def __init__(self, timeout=60, publish=broadcast_async, history_size=20000, outbox_size=10000):
+        """
+        Args:
+            timeout: Seconds a provisional event may wait for confirmation before rollback
+            publish: Coroutine function sending one message to clients
+            history_size: Recently confirmed / rolled back signatures remembered
+            outbox_size: Messages buffered for the broadcaster before new ones are dropped
+        """
+        self.timeout = timeout
+        self.publish = publish
+        self.history_size = history_size
+        self.pending = OrderedDict()  # signature -> (seen_at, [info, ...]), oldest first
+        self.confirmed = OrderedDict()  # confirmed signatures, so a late processed copy is ignored
+        self.rolled_back = OrderedDict()  # signature -> [info, ...], re-announced if confirmed late
+        self.outbox = asyncio.Queue(maxsize=outbox_size)
+        self.stats = {
+            'pending': 0,
+            'provisional': 0,
+            'promoted': 0,
+            'rolled_back': 0,
+            'confirmed_late': 0,
+            'dropped_broadcasts': 0,
+        }
+
+    def add(self, signature: str, events: list):
+        """Record the decoded (event_type, event) pairs of a processed notification"""
+        if signature in self.pending or signature in self.confirmed:
+            return
+        infos = []
+        trade_index = 0
+        for event_type, event in events:
+            if event_type == "CreateToken":
+                infos.append(self.coin_info(event))
+            else:
+                infos.append(self.trade_info(signature, trade_index, event_type, event))
+                trade_index += 1
+        if not infos:
+            return
+
+        self.pending[signature] = (time.monotonic(), infos)
+        self.stats['provisional'] += len(infos)
+        for info in infos:
+            self._send({**info, 'status': 'provisional'})
+
+    def confirm(self, signature: str):
+        """Promote a provisional signature once its confirmed notification arrives"""
+        self._remember(self.confirmed, signature, None)
+        entry = self.pending.pop(signature, None)
+        if entry is not None:
+            seen_at, infos = entry
+            PROMOTION_SECONDS.observe(time.monotonic() - seen_at)
+            self.stats['promoted'] += len(infos)
+            for info in infos:
+                self._send({**self._identity(info), 'status': 'confirmed'})
+            return
+
+        infos = self.rolled_back.pop(signature, None)
+        if infos:
+            # Rolled back too early; clients dropped it, so send it in full
+            self.stats['confirmed_late'] += len(infos)
+            for info in infos:
+                self._send({**info, 'status': 'confirmed'})
+
+    def expire(self) -> int:
+        """Roll back provisional events older than the timeout; returns how many"""
+        deadline = time.monotonic() - self.timeout
+        expired = 0
+        while self.pending:
+            signature, (seen_at, infos) = next(iter(self.pending.items()))
+            if seen_at > deadline:
+                break
+            del self.pending[signature]
+            self._remember(self.rolled_back, signature, infos)
+            for info in infos:
+                self._send({**self._identity(info), 'status': 'rolled_back'})
+            expired += len(infos)
+        if expired:
+            self.stats['rolled_back'] += expired
+            logger.info(f"Rolled back {expired} provisional events never confirmed within {self.timeout}s")
+        return expired
+
+    async def run_broadcaster(self):
+        """Send queued messages; a slow channel layer never blocks the reader"""
+        while True:
+            message = await self.outbox.get()
+            try:
+                await self.publish(message)
+            except Exception as e:
+                logger.warning(f"Provisional broadcast failed: {e}")
+
+    async def run_sweeper(self, interval: float = 1.0):
+        while True:
+            await asyncio.sleep(interval)
+            self.expire()
+            self.stats['pending'] = len(self.pending)
+
+    def _send(self, message: dict):
+        try:
+            self.outbox.put_nowait(message)
+        except asyncio.QueueFull:
+            self.stats['dropped_broadcasts'] += 1
+
+    def _remember(self, history: OrderedDict, signature: str, value):
+        history[signature] = value
+        history.move_to_end(signature)
+        if len(history) > self.history_size:
+            history.popitem(last=False)
+
+    @staticmethod
+    def _identity(info: dict) -> dict:
+        """Fields clients need to match a status change to the provisional message"""
+        if info['event'] == 'coin':
+            return {'event': 'coin', 'address': info['address']}
+        return {
+            'event': 'trade', 'transaction_hash': info['transaction_hash'],
+            'event_index': info['event_index'], 'coin_address': info['coin_address'],
+        }
+
+    @staticmethod
+    def coin_info(event: dict) -> dict:
+        return {
+            'event': 'coin',
+            'address': event.get('mint'),
+            'creator': event.get('creator'),
+            'total_supply': str(event.get('total_supply')),
+            'current_price': _amount(event['initial_price_per_token']),
+        }
+
+    @staticmethod
+    def trade_info(signature: str, event_index: int, event_type: str, event: dict) -> dict:
+        buy = event_type == "PurchaseToken"
+        return {
+            'event': 'trade',
+            'transaction_hash': signature,
+            'event_index': event_index,
+            'user': event.get('buyer') if buy else event.get('seller'),
+            'coin_address': event.get('mint'),
+            'trade_type': 'BUY' if buy else 'SELL',
+            'coin_amount': _amount(event.get('amount_purchased') if buy else event.get('amount_sold')),
+            'sol_amount': _amount(event.get('base_cost') if buy else event.get('base_proceeds')),
+            'current_price': _amount(event['current_price']),
+            'timestamp': event.get('timestamp'),
+        }
@@ -0,0 +1,41 @@
+import hashlib
+from collections import defaultdict
+
+TRADE_QUEUE_PREFIX = "trades."
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """
+    Jump consistent hash (Lamping & Veach): going from N to N+1 buckets
+    only moves 1/(N+1) of the keys.
+    """
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return b
+
+
+def mint_partition(mint: str, partitions: int) -> int:
+    """Stable partition for a mint (Python's hash() is salted per process)"""
+    digest = hashlib.blake2b(mint.encode(), digest_size=8).digest()
+    return jump_hash(int.from_bytes(digest, "little"), partitions)
+
+
+def trade_queue_name(partition: int) -> str:
+    return f"{TRADE_QUEUE_PREFIX}{partition}"
+
+
+def split_by_partition(events: list, partitions: int) -> dict:
+    """
+    Group trade events by their mint's partition, keeping arrival order
+    within each group.
+
+    Returns:
+        {partition: [event_data, ...]}
+    """
+    groups = defaultdict(list)
+    for event_data in events:
+        groups[mint_partition(event_data['event'].get('mint') or '', partitions)].append(event_data)
+    return dict(groups)
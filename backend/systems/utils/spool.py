@@ -0,0 +1,224 @@
+import asyncio
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class EventSpool:
+    """
+    Append-only, segmented on-disk log of decoded events waiting for Celery.
+
+    Appends are buffered in memory and made durable in groups by sync(),
+    one write + fsync for everything appended since the previous sync.
+    Once a batch is published its entries are acked; segments whose
+    entries are all acked are deleted. Whatever is still unacked on
+    startup is returned by open() so it can be published again.
+
+    Delivery is at-least-once: acks are written by the next sync(), so
+    entries published just before a crash come back from open() and are
+    published again. Consumers must tolerate duplicates, as the Redis
+    claims and the ON CONFLICT inserts do.
+
+    Segment format: one JSON object per line, either
+        {"seq": 12, "kind": "trade", "data": {...}}
+    or an ack record, always in the segment holding those entries
+        {"ack": [10, 11, 12]}
+    """
+
+    def __init__(self, directory, segment_size=10000):
+        """
+        Args:
+            directory: Where segment files live (created if missing)
+            segment_size: Entries per segment before rolling to a new file
+        """
+        self.directory = str(directory)
+        self.segment_size = segment_size
+        self.next_seq = 0
+
+        self._buffer = []
+        self._buffer_seqs = []
+        self._file = None
+        self._segment = None
+        self._segment_entries = 0
+        self._pending = {}  # segment path -> set of unacked seqs
+        self._acks = {}  # segment path -> acked seqs not yet written to it
+        self._lock = asyncio.Lock()
+
+    def _segment_path(self, first_seq: int) -> str:
+        return os.path.join(self.directory, f"{first_seq:020d}.log")
+
+    def open(self) -> list:
+        """
+        Recover existing segments and start a fresh one.
+
+        Returns:
+            Unacked entries as (seq, kind, data), oldest first
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        entries = {}
+        acked = set()
+        segments = sorted(f for f in os.listdir(self.directory) if f.endswith(".log"))
+
+        for name in segments:
+            path = os.path.join(self.directory, name)
+            self._pending[path] = set()
+            with open(path, encoding="utf8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn tail from a crash mid-write; nothing after it was synced
+                        logger.warning(f"Skipping partial record in spool segment {name}")
+                        break
+                    if "ack" in record:
+                        acked.update(record["ack"])
+                    else:
+                        entries[record["seq"]] = (record["kind"], record["data"], path)
+                        self.next_seq = max(self.next_seq, record["seq"] + 1)
+
+        pending = []
+        for seq in sorted(entries):
+            if seq in acked:
+                continue
+            kind, data, path = entries[seq]
+            self._pending[path].add(seq)
+            pending.append((seq, kind, data))
+
+        for path in list(self._pending):
+            self._maybe_remove(path)
+
+        self._roll()
+        if pending:
+            logger.info(f"Recovered {len(pending)} unpublished events from spool {self.directory}")
+        return pending
+
+    def append(self, kind: str, data: dict) -> int:
+        """Buffer an event; it is durable after the next sync()"""
+        seq = self.next_seq
+        self.next_seq += 1
+        self._buffer.append(json.dumps({"seq": seq, "kind": kind, "data": data}, separators=(",", ":")))
+        self._buffer_seqs.append(seq)
+        return seq
+
+    def pending_count(self) -> int:
+        """Entries written but not yet acked"""
+        return sum(len(pending) for pending in self._pending.values()) + len(self._buffer_seqs)
+
+    def ack(self, seqs: list):
+        """
+        Mark published entries; the ack is recorded in each entry's own
+        segment by the next sync(), and fully acked segments are deleted
+        """
+        if not seqs:
+            return
+        seqs = set(seqs)
+        if seqs.intersection(self._buffer_seqs):
+            # Never written, so there is nothing to ack on disk
+            kept = [(line, seq) for line, seq in zip(self._buffer, self._buffer_seqs) if seq not in seqs]
+            self._buffer = [line for line, _ in kept]
+            self._buffer_seqs = [seq for _, seq in kept]
+        for path, pending in list(self._pending.items()):
+            done = pending & seqs
+            if done:
+                pending -= done
+                self._acks.setdefault(path, []).extend(sorted(done))
+                self._maybe_remove(path)
+
+    async def sync(self):
+        """Group commit: write and fsync everything buffered so far"""
+        async with self._lock:
+            if not self._buffer and not self._acks:
+                return
+            lines, self._buffer = self._buffer, []
+            seqs, self._buffer_seqs = self._buffer_seqs, []
+            acks, self._acks = self._acks, {}
+            # Tracked before the write so a failed or cancelled sync never
+            # lets the segment be deleted under entries it might contain
+            self._pending[self._segment].update(seqs)
+
+            current = list(lines)
+            if self._segment in acks:
+                current.append(self._ack_record(acks[self._segment]))
+            older = {
+                path: self._ack_record(done) for path, done in acks.items()
+                if path != self._segment and path in self._pending
+            }
+            write = asyncio.ensure_future(asyncio.to_thread(self._write, current, older))
+            try:
+                await asyncio.shield(write)
+            except asyncio.CancelledError:
+                await write  # finish the fsync so the file is never written concurrently
+                raise
+            except Exception:
+                # Retried on the next sync; a duplicated line is harmless on replay
+                self._buffer[:0] = lines
+                self._buffer_seqs[:0] = seqs
+                for path, done in acks.items():
+                    self._acks.setdefault(path, [])[:0] = done
+                raise
+
+            self._segment_entries += len(seqs)
+            if self._segment_entries >= self.segment_size:
+                self._roll()
+
+    async def run_committer(self, interval: float = 0.05):
+        """Background group commit so durability lag stays bounded between publishes"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Spool sync failed: {e}")
+
+    async def close(self):
+        await self.sync()
+        if self._file:
+            self._file.close()
+            self._file = None
+        self._maybe_remove(self._segment)
+
+    @staticmethod
+    def _ack_record(seqs: list) -> str:
+        return json.dumps({"ack": seqs}, separators=(",", ":"))
+
+    def _write(self, lines: list, older: dict):
+        if lines:
+            self._file.write("\n".join(lines) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        for path, record in older.items():
+            try:
+                # No O_CREAT: a segment deleted meanwhile needs no ack
+                fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+            except FileNotFoundError:
+                continue
+            try:
+                os.write(fd, (record + "\n").encode("utf8"))
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _roll(self):
+        previous = self._segment
+        if self._file:
+            self._file.close()
+        self._segment = self._segment_path(self.next_seq)
+        self._file = open(self._segment, "a", encoding="utf8")
+        self._pending.setdefault(self._segment, set())
+        self._segment_entries = 0
+        if previous:
+            self._maybe_remove(previous)
+
+    def _maybe_remove(self, path):
+        # The segment being written to stays until it is rolled
+        if path is None or path == self._segment and self._file:
+            return
+        if not self._pending.get(path):
+            self._pending.pop(path, None)
+            self._acks.pop(path, None)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.db.models import F, ExpressionWrapper, FloatField, DecimalField#, Prefetch
+from datetime import datetime, timezone as dt_timezone
+import time
 
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
@@ -12,7 +14,7 @@ from rest_framework.exceptions import ValidationError
 
 from .models import (
     Coin, UserCoinHoldings, Trade, SolanaUser,
-    PriceApi, CoinHistory, TraderHistory,
+    PriceApi, CoinHistory, TraderHistory, CoinCandle,
 )
 from .serializers import (
     ConnectWalletSerializer, CoinHistorySerializer,
@@ -149,6 +151,57 @@ class CoinViewSet(RestrictedViewset):
         serializer = TradeSerializer(trades, many=True)
         return Response(serializer.data)
 
+    CANDLE_LIMIT = 1000
+
+    @action(detail=True, methods=['get'])
+    def candles(self, request, address=None):
+        """
+        OHLCV candles for charts, oldest first.
+        ?resolution=1m|5m|1h|1d (default 1m)
+        &from=<unix seconds>&to=<unix seconds> (default: the last 300 candles)
+        &limit=<n> (max 1000; the newest candles in the range are kept)
+        """
+        resolution = request.query_params.get("resolution", "1m")
+        width = CoinCandle.RESOLUTIONS.get(resolution)
+        if width is None:
+            raise ValidationError({"resolution": f"One of {', '.join(CoinCandle.RESOLUTIONS)}"})
+        try:
+            end = int(request.query_params.get("to", time.time()))
+            start = int(request.query_params.get("from", end - 300 * width))
+            limit = max(1, min(int(request.query_params.get("limit", self.CANDLE_LIMIT)), self.CANDLE_LIMIT))
+        except ValueError:
+            raise ValidationError({"detail": "from, to and limit must be integers"})
+        if start > end:
+            raise ValidationError({"detail": "from must not be after to"})
+        try:
+            range_start = datetime.fromtimestamp(start - start % width, tz=dt_timezone.utc)
+            range_end = datetime.fromtimestamp(end, tz=dt_timezone.utc)
+        except (ValueError, OverflowError, OSError):
+            raise ValidationError({"detail": "from and to must be valid unix timestamps"})
+
+        # Backward range scan on the (coin, resolution, bucket) unique index,
+        # so a range wider than `limit` keeps its newest candles
+        rows = CoinCandle.objects.filter(
+            coin_id=address,
+            resolution=resolution,
+            bucket__gte=range_start,
+            bucket__lte=range_end,
+        ).order_by("-bucket").values_list(
+            "bucket", "open_price", "high_price", "low_price", "close_price", "volume", "trades"
+        )[:limit]
+        rows = list(rows)[::-1]  # oldest first
+        candles = [
+            {
+                "time": int(bucket.timestamp()),
+                "open": open_price, "high": high_price, "low": low_price, "close": close_price,
+                "volume": volume, "trades": trades,
+            }
+            for bucket, open_price, high_price, low_price, close_price, volume, trades in rows
+        ]
+        if not candles and not Coin.objects.filter(address=address).exists():
+            return Response({"detail": "Coin not found"}, status=404)
+        return Response({"address": address, "resolution": resolution, "candles": candles})
+
 class UserHolding(APIView):
     def get_data(self, user):
         coinset = Coin.objects.filter(creator=user)